@@ -0,0 +1,65 @@
+#!/bin/bash
+
+# ====================================================================
+#  ParkMate IoT System - MULTI-PROCESS LAUNCHER (Linux)
+#  Starts several ingest processes (lots split between them) and
+#  several API workers on one machine. Socket.IO events travel between
+#  them over the local Mosquitto broker, so no Redis is needed.
+#
+#  Usage: ./LAUNCH_CLUSTER.sh [ingest processes] [api workers]
+# ====================================================================
+
+INGEST_COUNT=${1:-2}
+API_COUNT=${2:-2}
+INGEST_BASE_PORT=5100
+API_BASE_PORT=5000
+LOG_DIR=logs
+
+GREEN='\033[0;32m'
+CYAN='\033[0;36m'
+RED='\033[0;31m'
+NC='\033[0m' # No Color
+
+if command -v python3 &> /dev/null; then
+    PYTHON_CMD=python3
+else
+    PYTHON_CMD=python
+fi
+
+for service in mongod mosquitto; do
+    if ! pgrep -x "$service" > /dev/null; then
+        echo -e "${RED}✗ $service is NOT running - start it first${NC}"
+        exit 1
+    fi
+done
+
+mkdir -p "$LOG_DIR"
+export PARKMATE_MESSAGE_QUEUE=mqtt://localhost:1883
+export PARKMATE_INGEST_PROCESSES=$INGEST_COUNT
+PIDS=()
+
+# Stop every process on Ctrl+C
+trap 'echo ""; echo "Stopping..."; kill "${PIDS[@]}" 2>/dev/null; wait; exit 0' INT TERM
+
+for ((i = 0; i < INGEST_COUNT; i++)); do
+    port=$((INGEST_BASE_PORT + i))
+    PARKMATE_ROLE=ingest PARKMATE_INGEST_PROCESS_INDEX=$i PARKMATE_PORT=$port \
+        $PYTHON_CMD app.py > "$LOG_DIR/ingest_$i.log" 2>&1 &
+    PIDS+=($!)
+    echo -e "${GREEN}✓ Ingest process $i/$INGEST_COUNT${NC} - metrics on http://localhost:$port/metrics"
+done
+
+for ((i = 0; i < API_COUNT; i++)); do
+    port=$((API_BASE_PORT + i))
+    PARKMATE_ROLE=api PARKMATE_PORT=$port \
+        $PYTHON_CMD app.py > "$LOG_DIR/api_$i.log" 2>&1 &
+    PIDS+=($!)
+    echo -e "${GREEN}✓ API worker $i${NC} - http://localhost:$port"
+done
+
+echo ""
+echo -e "${CYAN}Logs in $LOG_DIR/. Put the API workers behind a load balancer with"
+echo -e "sticky sessions (Socket.IO). Initialize data on an ingest process:"
+echo -e "  curl -X POST http://localhost:$INGEST_BASE_PORT/api/init${NC}"
+echo "Press Ctrl+C to stop all processes."
+wait
@@ -1,123 +1,371 @@
-from flask import Flask, jsonify, request, send_from_directory
+# Blocking sockets, locks and threads must be replaced by green ones before
+# anything that uses them is imported
+from config import SOCKETIO_ASYNC_MODE
+if SOCKETIO_ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+
+from flask import Flask, abort, g, jsonify, request, send_from_directory
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from pymongo import MongoClient
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import wraps
 import paho.mqtt.client as mqtt
+import atexit
+import hmac
 import json
 import os
 import random
+import signal
+import sys
+import threading
+import time
+
+from config import (
+    LOT_STATE_FLUSH_INTERVAL, WRITE_BUFFER_MAX_BATCH, WRITE_BUFFER_MAX_AGE, WRITE_BUFFER_MAX_PENDING,
+    INGEST_WORKERS, INGEST_QUEUE_SIZE, INGEST_DROP_POLICY, INGEST_BLOCK_TIMEOUT,
+    SPOT_UPDATE_WINDOW, LED_LEGACY_TOPIC, ROLLUP_FLUSH_INTERVAL, ROLLUP_MAX_POINTS, TRANSPORT,
+    STORAGE, MEMORY_STORE_MAX_RECORDS, RESPONSE_CACHE_SIZE, CHANGELOG_MAX_CHANGES, ADMIN_TOKEN,
+    PROFILE_MAX_SECONDS, PROFILE_SAMPLE_INTERVAL, SLOW_HANDLER_MS, SLOW_REQUEST_MS, SLOW_LOG_SIZE,
+    OCCUPIED_THRESHOLD, SPOT_FILTER_HYSTERESIS, SPOT_FILTER_DWELL, SPOT_FILTER_WINDOW, SPOT_FILTER_SWEEP_INTERVAL,
+    ROLE, SOCKETIO_MESSAGE_QUEUE, FLASK_PORT, INGEST_PROCESSES, INGEST_PROCESS_INDEX,
+    SEED_CHUNK_SIZE, SEED_MAX_SPOTS, SEED_PAUSE_TIMEOUT, ALERT_RULES, ALERT_RENOTIFY_INTERVAL, ALERT_STALE_AFTER, ALERT_FLUSH_INTERVAL
+)
+from parkmate.alerts import AlertTracker
+from parkmate.changelog import SpotChangeLog
+from parkmate.codec import decode_spot_status, is_binary
+from parkmate.indexes import index_report, verify_query_plans
+from parkmate.ingest_queue import IngestPartition, IngestQueue
+from parkmate.lot_state import LotStateEngine
+from parkmate.metrics import MetricsRegistry, MongoCommandMetrics
+from parkmate.profiling import SamplingProfiler, SlowOperationLog
+from parkmate.pubsub import MQTTPubSubManager
+from parkmate.repository import MemoryRepository, MongoRepository
+from parkmate.response_cache import LotVersions, ResponseCache
+from parkmate.rollups import EnvironmentRollup, OccupancyRollup, choose_resolution, parse_resolution, parse_timestamp
+from parkmate.rooms import LotRoomRegistry, lot_room
+from parkmate.seeding import DEFAULT_CENTER, seed_store
+from parkmate.spot_emitter import SpotUpdateCoalescer
+from parkmate.spot_filter import SpotSignalFilter
+from parkmate.transport import InMemoryBroker, RecordingEmitter, SocketIOEmitter
+from parkmate.write_buffer import WriteBehindBuffer
 
 app = Flask(__name__, static_folder='static')
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
-
-# MongoDB Setup
-mongo_client = MongoClient('mongodb://localhost:27017/')
-db = mongo_client['parkmate_db']
-parking_spots = db['parking_spots']
-parking_lots = db['parking_lots']
-parking_history = db['parking_history']
-users = db['users']
-environment_data = db['environment_data']
-button_events = db['button_events']
-alerts = db['alerts']
+if SOCKETIO_MESSAGE_QUEUE and SOCKETIO_MESSAGE_QUEUE.startswith('mqtt://'):
+    socketio_queue = {'client_manager': MQTTPubSubManager(SOCKETIO_MESSAGE_QUEUE)}
+else:
+    socketio_queue = {'message_queue': SOCKETIO_MESSAGE_QUEUE}
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=SOCKETIO_ASYNC_MODE, **socketio_queue)
+
+# Role of this process, set by create_app()
+role = None
+
+# Prometheus metrics (/metrics)
+metrics = MetricsRegistry()
+mqtt_messages = metrics.counter('parkmate_mqtt_messages_total', 'MQTT messages received', ['topic'])
+payload_decode_seconds = metrics.histogram('parkmate_payload_decode_seconds', 'MQTT payload decode time', ['format'])
+handler_seconds = metrics.histogram('parkmate_handler_seconds', 'MQTT handler latency', ['handler'])
+mongo_seconds = metrics.histogram('parkmate_mongo_command_seconds', 'MongoDB command latency', ['collection', 'op'])
+mongo_failures = metrics.counter('parkmate_mongo_command_failures_total', 'Failed MongoDB commands', ['collection', 'op'])
+mqtt_published = metrics.counter('parkmate_mqtt_published_total', 'MQTT messages published', ['topic'])
+socketio_emits = metrics.counter('parkmate_socketio_emits_total', 'Socket.IO events emitted', ['event'])
+http_seconds = metrics.histogram('parkmate_http_request_seconds', 'REST request latency', ['method', 'route'])
+http_requests = metrics.counter('parkmate_http_requests_total', 'REST requests', ['method', 'route', 'status'])
+
+# On-demand profiler and slow handler/request log (/api/admin/...)
+profiler = SamplingProfiler(interval=PROFILE_SAMPLE_INTERVAL, max_seconds=PROFILE_MAX_SECONDS)
+slow_ops = SlowOperationLog({'mqtt': SLOW_HANDLER_MS, 'http': SLOW_REQUEST_MS}, max_entries=SLOW_LOG_SIZE)
+
+# Socket.IO events go through a pluggable emitter (recorded in memory mode)
+if TRANSPORT == 'memory':
+    event_emitter = RecordingEmitter(forward=SocketIOEmitter(socketio))
+else:
+    event_emitter = SocketIOEmitter(socketio)
+
+# Clients subscribe to one lot room at a time
+lot_rooms = LotRoomRegistry()
+
+def emit_to_lot(event, data, lot_id):
+    """Emit an event to the clients viewing a lot (broadcast if the lot is unknown)"""
+    socketio_emits.inc(event=event)
+    with slow_ops.stage('emit'):
+        event_emitter.emit(event, data, to=lot_room(lot_id) if lot_id else None)
+
+# Per-lot change sequence of spot mutations (/api/lots/<lot_id>/changes)
+spot_changes = SpotChangeLog(max_changes=CHANGELOG_MAX_CHANGES)
+
+# Spot changes are batched per lot into 'spot_updates' events
+spot_updates = SpotUpdateCoalescer(emit_to_lot, window=SPOT_UPDATE_WINDOW, epoch=spot_changes.epoch)
+
+# Storage Setup (all reads and writes go through the repository)
+if STORAGE == 'memory':
+    store = MemoryRepository(max_records=MEMORY_STORE_MAX_RECORDS)
+else:
+    def connect_mongo():
+        mongo_client = MongoClient(
+            'mongodb://localhost:27017/',
+            event_listeners=[MongoCommandMetrics(mongo_seconds, mongo_failures)]
+        )
+        return mongo_client['parkmate_db']
+
+    # Connects on first use in each process (see create_app)
+    store = MongoRepository(connect=connect_mongo)
+
+# Minute/hour/day environment and occupancy buckets
+environment_rollup = EnvironmentRollup(store, 'environment_rollups')
+occupancy_rollup = OccupancyRollup(store, 'occupancy_rollups')
+
+# In-memory lot occupancy counters (seeded from the store at startup)
+# Lots this process owns when several ingest processes share the MQTT streams
+ingest_partition = IngestPartition(INGEST_PROCESS_INDEX, INGEST_PROCESSES)
+
+def lot_change_fields(lot_id):
+    """Change sequence and epoch stored on lot documents for processes that do not write spots"""
+    return {'change_seq': spot_changes.current(lot_id), 'change_epoch': spot_changes.epoch()}
+
+lot_state = LotStateEngine(store, on_change=occupancy_rollup.record, owns=ingest_partition.owns,
+                           flush_fields=lot_change_fields)
+
+# Debounce/hysteresis of sensor readings (only real transitions are applied)
+spot_filter = SpotSignalFilter(
+    OCCUPIED_THRESHOLD,
+    hysteresis=SPOT_FILTER_HYSTERESIS,
+    dwell=SPOT_FILTER_DWELL,
+    window=SPOT_FILTER_WINDOW,
+    current=lot_state.is_occupied
+)
+
+# One alerts document per incident instead of one per repeated sensor alert
+alert_tracker = AlertTracker(
+    store,
+    rules=ALERT_RULES,
+    renotify_interval=ALERT_RENOTIFY_INTERVAL,
+    stale_after=ALERT_STALE_AFTER,
+    owns=ingest_partition.owns
+)
+
+# Lot/spot endpoint ETags (bumped after every spot or lot mutation)
+lot_versions = LotVersions()
+response_cache = ResponseCache(max_entries=RESPONSE_CACHE_SIZE)
+
+# Batched writer for append-only collections
+write_buffer = WriteBehindBuffer(store, max_batch=WRITE_BUFFER_MAX_BATCH, max_age=WRITE_BUFFER_MAX_AGE,
+                                 max_pending=WRITE_BUFFER_MAX_PENDING)
 
 # MQTT Setup
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
-mqtt_client = mqtt.Client()
+if TRANSPORT == 'memory':
+    # Emulators in the same process connect with mqtt_broker.client()
+    mqtt_broker = InMemoryBroker()
+    mqtt_client = mqtt_broker.client("parkmate_backend")
+else:
+    mqtt_broker = None
+    mqtt_client = mqtt.Client()
 
 # MQTT Topics
 TOPIC_SPOT_STATUS = "parkmate/spot/status"
-TOPIC_LED_COMMAND = "parkmate/led/command"
+TOPIC_LED_COMMAND = "parkmate/led/command"  # legacy flat topic (LED_LEGACY_TOPIC)
+TOPIC_LED_SPOT = "parkmate/{lot_id}/led/{spot_id}"
 TOPIC_RELAY_COMMAND = "parkmate/relay/command"
 TOPIC_PAYMENT = "parkmate/payment"
 TOPIC_ENVIRONMENT = "parkmate/environment"
 TOPIC_BUTTON_PRESS = "parkmate/button/press"
 TOPIC_KNOB_ADJUST = "parkmate/knob/adjust"
 TOPIC_ALERTS = "parkmate/alerts"
+TOPIC_OVERRIDE = "parkmate/override"  # manual overrides forwarded by API workers to the ingest process
+TOPIC_RESEED = "parkmate/control/reseed"  # sent by /api/init and seeding so every ingest process reloads its lots
+TOPIC_SPOT_DWELL = "parkmate/internal/spot/dwell"  # never published; dwell sweeps queued to the lot's ingest worker
 
 def on_mqtt_connect(client, userdata, flags, rc):
     print(f"Connected to MQTT Broker with result code {rc}")
+    if role == 'api':
+        # API workers only publish (LED commands, forwarded overrides)
+        return
     client.subscribe(TOPIC_SPOT_STATUS)
     client.subscribe(TOPIC_PAYMENT)
     client.subscribe(TOPIC_ENVIRONMENT)
     client.subscribe(TOPIC_BUTTON_PRESS)
     client.subscribe(TOPIC_KNOB_ADJUST)
     client.subscribe(TOPIC_ALERTS)
+    client.subscribe(TOPIC_OVERRIDE)
+    client.subscribe(TOPIC_RESEED)
     print("Subscribed to all MQTT topics")
 
 def on_mqtt_message(client, userdata, msg):
+    # Runs on the MQTT network loop - only hand the message to the workers
     try:
-        payload = json.loads(msg.payload.decode())
-
-        if msg.topic == TOPIC_SPOT_STATUS:
-            handle_spot_status(payload)
-        elif msg.topic == TOPIC_PAYMENT:
-            handle_payment(payload)
-        elif msg.topic == TOPIC_ENVIRONMENT:
-            handle_environment_data(payload)
-        elif msg.topic == TOPIC_BUTTON_PRESS:
-            handle_button_press(payload)
-        elif msg.topic == TOPIC_KNOB_ADJUST:
-            handle_knob_adjust(payload)
-        elif msg.topic == TOPIC_ALERTS:
-            handle_alert(payload)
-
+        mqtt_messages.inc(topic=msg.topic)
+        if msg.topic == TOPIC_RESEED:
+            # Every ingest process pauses while spots are replaced and reloads after,
+            # whichever lots it owns
+            control = json.loads(msg.payload or b'{}')
+            if control.get('phase') == 'start':
+                if control.get('partition') != ingest_partition.index:
+                    socketio.start_background_task(pause_for_reseed)
+            else:
+                socketio.start_background_task(reload_after_reseed)
+            return
+        if not ingest_partition.accepts(msg.topic, msg.payload):
+            return
+        ingest_queue.submit(msg.topic, msg.payload)
     except Exception as e:
-        print(f"Error processing MQTT message: {e}")
+        # An exception here would stop the MQTT network loop
+        print(f"Error receiving MQTT message on {msg.topic}: {e}")
+
+def dispatch_message(topic, raw_payload):
+    """Parse an MQTT message and run its handler (ingest worker thread)"""
+    if topic == TOPIC_SPOT_STATUS:
+        handler = handle_spot_status
+    elif topic == TOPIC_PAYMENT:
+        handler = handle_payment
+    elif topic == TOPIC_ENVIRONMENT:
+        handler = handle_environment_data
+    elif topic == TOPIC_BUTTON_PRESS:
+        handler = handle_button_press
+    elif topic == TOPIC_KNOB_ADJUST:
+        handler = handle_knob_adjust
+    elif topic == TOPIC_ALERTS:
+        handler = handle_alert
+    elif topic == TOPIC_OVERRIDE:
+        handler = handle_override
+    elif topic == TOPIC_SPOT_DWELL:
+        handler = handle_spot_dwell
+    else:
+        return
+
+    slow_ops.begin('mqtt', handler.__name__)
+    try:
+        with slow_ops.stage('parse'):
+            if is_binary(topic, raw_payload):
+                with payload_decode_seconds.time(format='binary'):
+                    payload = decode_spot_status(raw_payload)
+            else:
+                with payload_decode_seconds.time(format='json'):
+                    payload = json.loads(raw_payload.decode())
+
+        with handler_seconds.time(handler=handler.__name__):
+            handler(payload)
+    finally:
+        slow_ops.end()
+
+ingest_queue = IngestQueue(
+    dispatch_message,
+    workers=INGEST_WORKERS,
+    maxsize=INGEST_QUEUE_SIZE,
+    policy=INGEST_DROP_POLICY,
+    block_timeout=INGEST_BLOCK_TIMEOUT
+)
 
 def handle_spot_status(data):
     """Handle parking spot status updates from sensors"""
     spot_id = data.get('spot_id')
     lot_id = data.get('lot_id')
-    occupied = data.get('occupied')
     distance = data.get('distance')
 
-    # Update spot in database
-    parking_spots.update_one(
-        {'spot_id': spot_id, 'lot_id': lot_id},
-        {
-            '$set': {
-                'occupied': occupied,
-                'distance': distance,
-                'last_update': datetime.now()
-            }
-        },
-        upsert=True
-    )
+    # Repeats of the current state and transitions still in their dwell time stop here
+    with slow_ops.stage('filter'):
+        occupied = spot_filter.update(lot_id, spot_id, distance, data.get('occupied'))
+    if occupied is None:
+        return
 
-    # Log to history
-    parking_history.insert_one({
-        'spot_id': spot_id,
-        'lot_id': lot_id,
+    apply_spot_status(lot_id, spot_id, occupied, distance, data.get('timestamp'))
+
+def handle_spot_dwell(data):
+    """Apply a transition that outlasted the dwell time, unless a newer reading changed it"""
+    lot_id = data.get('lot_id')
+    spot_id = data.get('spot_id')
+    occupied = spot_filter.settle(lot_id, spot_id)
+    if occupied is None:
+        return
+
+    apply_spot_status(lot_id, spot_id, occupied, data.get('distance'))
+
+def apply_spot_status(lot_id, spot_id, occupied, distance, sensor_timestamp=None):
+    """Write, count, light and broadcast a spot transition accepted by the filter"""
+    # Update spot in database and lot availability count
+    seq = write_spot(lot_id, spot_id, {
         'occupied': occupied,
-        'timestamp': datetime.now()
-    })
+        'distance': distance,
+        'last_update': datetime.now()
+    }, upsert=True)
 
-    # Update lot availability count
-    update_lot_availability(lot_id)
+    with slow_ops.stage('db_write'):
+        # Log to history
+        write_buffer.add('parking_history', {
+            'spot_id': spot_id,
+            'lot_id': lot_id,
+            'occupied': occupied,
+            'timestamp': datetime.now()
+        })
 
     # Send LED command
     led_color = "red" if occupied else "green"
-    mqtt_client.publish(TOPIC_LED_COMMAND, json.dumps({
-        'spot_id': spot_id,
-        'lot_id': lot_id,
-        'color': led_color
-    }))
+    publish_led_command(lot_id, spot_id, led_color)
 
     # Notify connected clients via WebSocket
-    socketio.emit('spot_update', {
+    with slow_ops.stage('emit'):
+        spot_updates.push(lot_id, {
+            'spot_id': spot_id,
+            'lot_id': lot_id,
+            'occupied': occupied,
+            'distance': distance,
+            'last_update': datetime.now().isoformat(),
+            'sensor_timestamp': sensor_timestamp,
+            'seq': seq
+        })
+
+def owns_lot_state(lot_id):
+    """Whether this process writes the lot's spots (and so holds its change log)"""
+    return role != 'api' and ingest_partition.owns(lot_id)
+
+class SpotNotFound(LookupError):
+    pass
+
+def write_spot(lot_id, spot_id, fields, upsert=False):
+    """
+    Write a spot change stamped with the lot's next change sequence, update
+    the lot's availability count, then bump the lot's ETag version (only once
+    the count is current, so no response is cached under the new ETag with
+    the old count)
+
+    Returns:
+        The change sequence, or None if no spot matched (without upsert)
+    """
+    try:
+        with slow_ops.stage('db_write'), spot_changes.change(lot_id, spot_id) as seq:
+            fields = {**fields, 'change_seq': seq}
+            if upsert:
+                store.upsert_spot(lot_id, spot_id, fields)
+            elif not store.update_spot(spot_id, fields, lot_id=lot_id):
+                raise SpotNotFound(spot_id)
+    except SpotNotFound:
+        return None
+    if 'occupied' in fields:
+        with slow_ops.stage('availability'):
+            lot_state.set_spot(lot_id, spot_id, fields['occupied'])
+    lot_versions.bump(lot_id)
+    return seq
+
+def publish_led_command(lot_id, spot_id, color):
+    """Send an LED command on the spot's own topic (and the legacy flat topic if enabled)"""
+    payload = json.dumps({
         'spot_id': spot_id,
         'lot_id': lot_id,
-        'occupied': occupied,
-        'distance': distance
+        'color': color
     })
+    with slow_ops.stage('publish'):
+        mqtt_client.publish(TOPIC_LED_SPOT.format(lot_id=lot_id, spot_id=spot_id), payload)
+        mqtt_published.inc(topic=TOPIC_LED_SPOT)
+        if LED_LEGACY_TOPIC:
+            mqtt_client.publish(TOPIC_LED_COMMAND, payload)
+            mqtt_published.inc(topic=TOPIC_LED_COMMAND)
 
 def handle_payment(data):
     """Handle payment notifications"""
-    socketio.emit('payment_notification', data)
+    emit_to_lot('payment_notification', data, data.get('lot_id'))
 
 def handle_environment_data(data):
     """Handle environmental sensor data (DHT sensor)"""
@@ -126,37 +374,40 @@ def handle_environment_data(data):
     temperature = data.get('temperature')
     humidity = data.get('humidity')
     heat_index = data.get('heat_index')
+    now = datetime.now()
 
-    # Store in database
-    environment_data.insert_one({
-        'sensor_id': sensor_id,
-        'lot_id': lot_id,
-        'temperature': temperature,
-        'humidity': humidity,
-        'heat_index': heat_index,
-        'timestamp': datetime.now()
-    })
-
-    # Update lot with latest environmental data
-    parking_lots.update_one(
-        {'lot_id': lot_id},
-        {
-            '$set': {
-                'temperature': temperature,
-                'humidity': humidity,
-                'heat_index': heat_index,
-                'env_last_update': datetime.now()
-            }
-        }
-    )
+    with slow_ops.stage('db_write'):
+        # Store in database
+        write_buffer.add('environment_data', {
+            'sensor_id': sensor_id,
+            'lot_id': lot_id,
+            'temperature': temperature,
+            'humidity': humidity,
+            'heat_index': heat_index,
+            'timestamp': now
+        })
+        environment_rollup.add(lot_id, sensor_id, data, now)
+
+        # Update lot with latest environmental data
+        store.update_lot(lot_id, {
+            'temperature': temperature,
+            'humidity': humidity,
+            'heat_index': heat_index,
+            'env_last_update': datetime.now()
+        })
+    lot_versions.bump(lot_id)
 
     # Broadcast to connected clients
-    socketio.emit('environment_update', {
+    emit_to_lot('environment_update', {
         'lot_id': lot_id,
         'temperature': temperature,
         'humidity': humidity,
-        'heat_index': heat_index
-    })
+        'heat_index': heat_index,
+        'sensor_timestamp': data.get('timestamp')
+    }, lot_id)
+
+    for incident in alert_tracker.observe(lot_id, sensor_id, data):
+        emit_alert_resolved(incident)
 
     print(f"Environment update: Lot {lot_id} - Temp: {temperature}°C, Humidity: {humidity}%")
 
@@ -165,9 +416,18 @@ def handle_button_press(data):
     button_id = data.get('button_id')
     spot_id = data.get('spot_id')
     action = data.get('action')
+    lot_id = data.get('lot_id')
+
+    # Buttons send no lot_id, so with several ingest processes the press lands
+    # on the owner of the spot_id's hash; hand it to the owner of the spot's lot
+    if lot_id is None and ingest_partition.count > 1:
+        spot = store.find_spot(spot_id)
+        if spot and not ingest_partition.owns(spot.get('lot_id')):
+            mqtt_client.publish(TOPIC_BUTTON_PRESS, json.dumps({**data, 'lot_id': spot.get('lot_id')}))
+            return
 
     # Store button event
-    button_events.insert_one({
+    write_buffer.add('button_events', {
         'button_id': button_id,
         'spot_id': spot_id,
         'action': action,
@@ -177,85 +437,79 @@ def handle_button_press(data):
     # Execute action based on button press
     if action == 'toggle':
         # Toggle spot status
-        spot = parking_spots.find_one({'spot_id': spot_id})
+        spot = store.find_spot(spot_id, lot_id)
         if spot:
             new_status = not spot.get('occupied', False)
             # Update distance based on new status
             new_distance = random.randint(30, 50) if new_status else random.randint(180, 220)
-            parking_spots.update_one(
-                {'spot_id': spot_id},
-                {'$set': {'occupied': new_status, 'distance': new_distance, 'last_update': datetime.now()}}
-            )
             lot_id = spot.get('lot_id')
-            update_lot_availability(lot_id)
+            seq = write_spot(lot_id, spot_id, {
+                'occupied': new_status,
+                'distance': new_distance,
+                'last_update': datetime.now()
+            })
 
             # Send LED command
             led_color = "red" if new_status else "green"
-            mqtt_client.publish(TOPIC_LED_COMMAND, json.dumps({
-                'spot_id': spot_id,
-                'lot_id': lot_id,
-                'color': led_color
-            }))
+            publish_led_command(lot_id, spot_id, led_color)
 
             # Notify clients
-            socketio.emit('spot_update', {
+            spot_updates.push(lot_id, {
                 'spot_id': spot_id,
                 'lot_id': lot_id,
                 'occupied': new_status,
                 'distance': new_distance,
-                'source': 'button'
+                'last_update': datetime.now().isoformat(),
+                'source': 'button',
+                'seq': seq
             })
 
     elif action == 'occupy':
-        spot = parking_spots.find_one({'spot_id': spot_id})
+        spot = store.find_spot(spot_id, lot_id)
         if spot:
             # Simulate car present - distance should be 30-50cm
             new_distance = random.randint(30, 50)
-            parking_spots.update_one(
-                {'spot_id': spot_id},
-                {'$set': {'occupied': True, 'distance': new_distance, 'last_update': datetime.now()}}
-            )
             lot_id = spot.get('lot_id')
-            update_lot_availability(lot_id)
-            mqtt_client.publish(TOPIC_LED_COMMAND, json.dumps({
-                'spot_id': spot_id,
-                'lot_id': lot_id,
-                'color': 'red'
-            }))
-            socketio.emit('spot_update', {
+            seq = write_spot(lot_id, spot_id, {
+                'occupied': True,
+                'distance': new_distance,
+                'last_update': datetime.now()
+            })
+            publish_led_command(lot_id, spot_id, 'red')
+            spot_updates.push(lot_id, {
                 'spot_id': spot_id,
                 'lot_id': lot_id,
                 'occupied': True,
                 'distance': new_distance,
-                'source': 'button'
+                'last_update': datetime.now().isoformat(),
+                'source': 'button',
+                'seq': seq
             })
 
     elif action == 'free':
-        spot = parking_spots.find_one({'spot_id': spot_id})
+        spot = store.find_spot(spot_id, lot_id)
         if spot:
             # Simulate empty spot - distance should be ~200cm (floor)
             new_distance = random.randint(180, 220)
-            parking_spots.update_one(
-                {'spot_id': spot_id},
-                {'$set': {'occupied': False, 'distance': new_distance, 'last_update': datetime.now()}}
-            )
             lot_id = spot.get('lot_id')
-            update_lot_availability(lot_id)
-            mqtt_client.publish(TOPIC_LED_COMMAND, json.dumps({
-                'spot_id': spot_id,
-                'lot_id': lot_id,
-                'color': 'green'
-            }))
-            socketio.emit('spot_update', {
+            seq = write_spot(lot_id, spot_id, {
+                'occupied': False,
+                'distance': new_distance,
+                'last_update': datetime.now()
+            })
+            publish_led_command(lot_id, spot_id, 'green')
+            spot_updates.push(lot_id, {
                 'spot_id': spot_id,
                 'lot_id': lot_id,
                 'occupied': False,
                 'distance': new_distance,
-                'source': 'button'
+                'last_update': datetime.now().isoformat(),
+                'source': 'button',
+                'seq': seq
             })
 
     # Broadcast button event to clients
-    socketio.emit('button_event', data)
+    emit_to_lot('button_event', data, lot_id)
 
     print(f"Button press: {button_id} - Spot {spot_id} - Action: {action}")
 
@@ -266,66 +520,266 @@ def handle_knob_adjust(data):
     value = data.get('value')
 
     # Broadcast knob adjustment to clients
-    socketio.emit('knob_adjust', data)
+    emit_to_lot('knob_adjust', data, data.get('lot_id'))
 
     print(f"Knob adjust: {knob_id} - {function}: {value}%")
 
 def handle_alert(data):
-    """Handle environmental alerts"""
+    """Handle environmental alerts (repeats of an open incident are only counted)"""
     sensor_id = data.get('sensor_id')
     lot_id = data.get('lot_id')
     alert = data.get('alert')
 
-    # Store alert
-    alerts.insert_one({
-        'sensor_id': sensor_id,
-        'lot_id': lot_id,
-        'alert_type': alert.get('type'),
-        'severity': alert.get('severity'),
-        'message': alert.get('message'),
-        'recommendation': alert.get('recommendation'),
-        'timestamp': datetime.now()
-    })
+    incident = alert_tracker.report(lot_id, sensor_id, alert)
+    if incident is None:
+        return
 
-    # Broadcast alert to clients
-    socketio.emit('alert', {
+    # Broadcast alert to clients (new incidents, then every ALERT_RENOTIFY_INTERVAL)
+    emit_to_lot('alert', {
         'lot_id': lot_id,
-        'alert': alert
-    })
+        'alert': alert,
+        'incident_id': incident['incident_id'],
+        'state': incident['state'],
+        'occurrences': incident['occurrences']
+    }, lot_id)
+
+    print(f"Alert: {lot_id} - {alert.get('type')} - {alert.get('message')} ({incident['state']})")
+
+def emit_alert_resolved(incident):
+    emit_to_lot('alert_resolved', {
+        'lot_id': incident['lot_id'],
+        'incident_id': incident['incident_id'],
+        'alert_type': incident['alert_type'],
+        'occurrences': incident['occurrences']
+    }, incident['lot_id'])
+    print(f"Alert resolved: {incident['lot_id']} - {incident['alert_type']} after {incident['occurrences']} occurrences")
+
+def spot_update_flush_loop():
+    """Emit coalesced spot changes every SPOT_UPDATE_WINDOW"""
+    while True:
+        socketio.sleep(SPOT_UPDATE_WINDOW)
+        spot_updates.flush()
+
+def write_buffer_flush_loop():
+    """Flush buffered records that reached WRITE_BUFFER_MAX_AGE"""
+    while True:
+        socketio.sleep(WRITE_BUFFER_MAX_AGE / 2)
+        if not flushes_paused.is_set():
+            write_buffer.flush()
+
+def rollup_flush_loop():
+    """Persist rollup buckets every ROLLUP_FLUSH_INTERVAL"""
+    while True:
+        socketio.sleep(ROLLUP_FLUSH_INTERVAL)
+        environment_rollup.flush()
+        occupancy_rollup.flush()
+
+def alert_flush_loop():
+    """Resolve stale alert incidents and write changed ones every ALERT_FLUSH_INTERVAL"""
+    while True:
+        socketio.sleep(ALERT_FLUSH_INTERVAL)
+        for incident in alert_tracker.expire():
+            emit_alert_resolved(incident)
+        alert_tracker.flush()
+
+def spot_filter_sweep_loop():
+    """Queue transitions that outlasted the dwell time without another reading to their lot's ingest worker"""
+    while True:
+        socketio.sleep(SPOT_FILTER_SWEEP_INTERVAL)
+        for lot_id, spot_id, occupied, distance in spot_filter.due():
+            payload = json.dumps({'lot_id': lot_id, 'spot_id': spot_id, 'distance': distance}).encode()
+            if not ingest_queue.submit(TOPIC_SPOT_DWELL, payload):
+                spot_filter.release(lot_id, spot_id)
+
+def lot_state_flush_loop():
+    """Periodically persist in-memory lot counters to parking_lots"""
+    while True:
+        socketio.sleep(LOT_STATE_FLUSH_INTERVAL)
+        if not flushes_paused.is_set():
+            lot_state.flush()
+
+def lot_state_refresh_loop():
+    """
+    Follow the lots this process does not own through their parking_lots
+    documents (one per lot, rewritten by the owner's flush whenever a spot
+    changes) instead of rescanning every spot
+    """
+    known_lots = {}
+    while True:
+        try:
+            lots = {lot['lot_id']: lot for lot in store.list_lots() if not owns_lot_state(lot['lot_id'])}
+            changed = {lot_id for lot_id in set(lots) | set(known_lots) if lots.get(lot_id) != known_lots.get(lot_id)}
+            known_lots = lots
+            # Bitmaps of changed lots are loaded again when next requested
+            lot_state.forget(changed)
+            for lot_id in changed:
+                lot_versions.bump(lot_id)
+        except Exception as e:
+            print(f"Error refreshing lot state: {e}")
+        socketio.sleep(LOT_STATE_FLUSH_INTERVAL)
 
-    print(f"Alert: {lot_id} - {alert.get('type')} - {alert.get('message')}")
-
-def update_lot_availability(lot_id):
-    """Update the available spots count for a parking lot"""
-    total_spots = parking_spots.count_documents({'lot_id': lot_id})
-    occupied_spots = parking_spots.count_documents({'lot_id': lot_id, 'occupied': True})
-    available_spots = total_spots - occupied_spots
-
-    parking_lots.update_one(
-        {'lot_id': lot_id},
-        {
-            '$set': {
-                'total_spots': total_spots,
-                'occupied_spots': occupied_spots,
-                'available_spots': available_spots,
-                'last_update': datetime.now()
-            }
-        },
-        upsert=True
-    )
-
-# Initialize MQTT
 mqtt_client.on_connect = on_mqtt_connect
 mqtt_client.on_message = on_mqtt_message
 
-try:
-    mqtt_client.connect(MQTT_BROKER, MQTT_PORT, 60)
-    mqtt_client.loop_start()
-except Exception as e:
-    print(f"Could not connect to MQTT broker: {e}")
+def mqtt_network_loop(connect=False):
+    """
+    Run the MQTT client as a background task of the async mode instead of
+    paho's own thread, so under eventlet its socket I/O and callbacks share
+    the event loop with Socket.IO (loop_forever also handles reconnects)
+    """
+    if connect:
+        try:
+            mqtt_client.connect(MQTT_BROKER, MQTT_PORT, 60)
+        except Exception as e:
+            print(f"Could not connect to MQTT broker: {e}")
+            return
+    mqtt_client.loop_forever()
+
+def create_app(role_name=ROLE):
+    """
+    Open this process's connections and start its background work
+
+    Importing app.py connects to nothing; every process (including each
+    forked web worker) calls create_app() once:
+        combined - ingest MQTT and serve the API (development, small sites)
+        ingest   - the only process consuming MQTT and writing spot state
+        api      - serve REST/Socket.IO; starts without waiting on MongoDB or
+                   MQTT and reloads spot state written by the ingest process
+    """
+    global role
+    if role is not None:
+        return app
+    if role_name not in ('combined', 'ingest', 'api'):
+        raise ValueError(f"unknown role {role_name!r}")
+    role = role_name
+
+    if role == 'api':
+        # Counters and rollups are written by the ingest processes
+        lot_state.on_change = None
+        socketio.start_background_task(lot_state_refresh_loop)
+        socketio.start_background_task(mqtt_network_loop, True)
+        return app
+
+    # Ensure MongoDB indexes
+    try:
+        for index_error in store.ensure_indexes():
+            print(f"Could not create index {index_error['collection']}.{index_error['index']}: {index_error['error']}")
+    except Exception as e:
+        print(f"Could not ensure MongoDB indexes: {e}")
+
+    # Initialize lot state (before any message is handled)
+    try:
+        lot_state.seed()
+        spot_changes.reset(store.change_seqs())
+    except Exception as e:
+        print(f"Could not seed lot state from MongoDB: {e}")
+    try:
+        alert_tracker.seed()
+    except Exception as e:
+        print(f"Could not load open alert incidents from MongoDB: {e}")
+
+    # Initialize MQTT
+    ingest_queue.start()
+    install_stop_signals()
+    try:
+        mqtt_client.connect(MQTT_BROKER, MQTT_PORT, 60)
+        socketio.start_background_task(mqtt_network_loop)
+    except Exception as e:
+        print(f"Could not connect to MQTT broker: {e}")
+
+    socketio.start_background_task(lot_state_flush_loop)
+    socketio.start_background_task(write_buffer_flush_loop)
+    socketio.start_background_task(spot_update_flush_loop)
+    socketio.start_background_task(rollup_flush_loop)
+    socketio.start_background_task(spot_filter_sweep_loop)
+    socketio.start_background_task(alert_flush_loop)
+    if ingest_partition.count > 1:
+        socketio.start_background_task(lot_state_refresh_loop)
+    return app
+
+shutdown_done = False
+
+def shutdown():
+    """Stop taking MQTT messages, drain the ingest workers and write everything still buffered"""
+    global shutdown_done
+    if shutdown_done:
+        return
+    shutdown_done = True
+
+    print("Shutting down: draining ingest queue and flushing buffers...")
+    try:
+        mqtt_client.disconnect()
+    except Exception as e:
+        print(f"Error disconnecting from MQTT broker: {e}")
+    ingest_queue.stop()
+    for flush in (alert_tracker.flush, occupancy_rollup.flush, environment_rollup.flush,
+                  lot_state.flush, write_buffer.close):
+        try:
+            flush()
+        except Exception as e:
+            print(f"Error during shutdown ({flush.__qualname__}): {e}")
+
+def install_stop_signals():
+    """
+    Exit through SystemExit on SIGTERM (and SIGINT), so atexit runs shutdown();
+    the default SIGTERM action kills the process without running atexit
+    """
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(signum)
+        if getattr(previous, '__name__', None) == 'handle_stop_signal':
+            continue
+
+        def handle_stop_signal(signum, frame, previous=previous):
+            # Only unwind here: under eventlet this runs on the hub, where
+            # draining the ingest workers (blocking) is not allowed
+            if callable(previous):
+                previous(signum, frame)
+            else:
+                sys.exit(0)
+
+        try:
+            signal.signal(signum, handle_stop_signal)
+        except ValueError:
+            # Not the main thread - the embedding server owns signal handling
+            return
+
+atexit.register(shutdown)
+
+# Scrape-time gauges
+metrics.gauge('parkmate_ingest_queue_depth', 'Messages waiting for an ingest worker',
+              lambda: ingest_queue.stats()['depth'])
+metrics.gauge('parkmate_write_buffer_depth', 'Records waiting to be written',
+              lambda: write_buffer.stats()['depth'])
+metrics.gauge('parkmate_spot_updates_pending', 'Spot updates waiting to be emitted',
+              lambda: spot_updates.stats()['pending'])
 
 # REST API Endpoints
 
+@app.before_request
+def start_request_timer():
+    g.started_at = time.perf_counter()
+    rule = request.url_rule.rule if request.url_rule is not None else request.path
+    slow_ops.begin('http', f"{request.method} {rule}")
+
+@app.teardown_request
+def end_request_trace(error=None):
+    slow_ops.end()
+
+@app.after_request
+def record_request_metrics(response):
+    # Label by route template (/api/lots/<lot_id>) so lot ids don't multiply series
+    started_at = g.get('started_at')
+    if started_at is not None and request.url_rule is not None:
+        route = request.url_rule.rule
+        http_seconds.observe(time.perf_counter() - started_at, method=request.method, route=route)
+        http_requests.inc(method=request.method, route=route, status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus text exposition of all metrics"""
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def index():
     return send_from_directory('static', 'index.html')
@@ -334,57 +788,177 @@ def index():
 def owner_dashboard():
     return send_from_directory('static', 'owner.html')
 
+def conditional_json(etag, build):
+    """
+    JSON response for a GET with an ETag
+
+    Answers 304 when the client already has this version, otherwise serves
+    the body cached for this URL and version (building it on a miss)
+    """
+    if etag in request.if_none_match:
+        response_cache.record_not_modified()
+        response = app.response_class(status=304)
+    else:
+        body = response_cache.get(request.full_path, etag)
+        if body is None:
+            result = build()
+            if not isinstance(result, (dict, list)):
+                return result
+            body = app.json.dumps(result)
+            response_cache.put(request.full_path, etag, body)
+        response = app.response_class(body, mimetype='application/json')
+
+    response.set_etag(etag)
+    # Cached copies must be revalidated (cheap 304) before every use
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/api/lots', methods=['GET'])
 def get_parking_lots():
     """Get all parking lots with availability"""
-    lots = list(parking_lots.find({}, {'_id': 0}))
-    return jsonify(lots)
+    return conditional_json(
+        lot_versions.etag(),
+        lambda: [lot_state.overlay(lot) for lot in store.list_lots()]
+    )
 
 @app.route('/api/lots/<lot_id>', methods=['GET'])
 def get_parking_lot(lot_id):
     """Get specific parking lot details"""
-    lot = parking_lots.find_one({'lot_id': lot_id}, {'_id': 0})
-    if not lot:
-        return jsonify({'error': 'Lot not found'}), 404
+    def build():
+        lot = lot_state.overlay(store.find_lot(lot_id))
+        if not lot:
+            return jsonify({'error': 'Lot not found'}), 404
+
+        # Get all spots for this lot (sequence read first: spots are at least this recent).
+        # Other processes use the change_seq/change_epoch the owner flushed to the lot
+        if owns_lot_state(lot_id):
+            lot.update(lot_change_fields(lot_id))
+        lot['spots'] = store.list_spots(lot_id)
+        return lot
+
+    return conditional_json(lot_versions.etag(lot_id), build)
+
+@app.route('/api/lots/<lot_id>/changes', methods=['GET'])
+def get_lot_changes(lot_id):
+    """Get the spots changed since a change sequence
+
+    Pass the seq and epoch of the last snapshot or event seen; returns a full
+    snapshot (full=true) when the epoch differs or the client is too far behind
+    """
+    since = request.args.get('since', type=int)
+    owner = owns_lot_state(lot_id)
+    if owner:
+        epoch, seq = spot_changes.epoch(), spot_changes.current(lot_id)
+        counts = lot_state.counts(lot_id)
+    else:
+        # Written by the owning ingest process; the lot is read before its spots
+        lot = store.find_lot(lot_id) or {}
+        epoch, seq = lot.get('change_epoch'), lot.get('change_seq', 0)
+        counts = {field: lot.get(field, 0) for field in ('total_spots', 'occupied_spots', 'available_spots')}
+
+    spots = None
+    if since is not None and since >= 0 and epoch and request.args.get('epoch') == epoch:
+        if owner:
+            changed = spot_changes.since(lot_id, since)
+            if changed is not None:
+                spots = store.find_spots(lot_id, changed) if changed else []
+        else:
+            # Spots carry the sequence of their last change
+            spots = store.spots_changed_since(lot_id, since)
+            seq = max(seq, since)
+
+    full = spots is None
+    if full:
+        spots = store.list_spots(lot_id)
 
-    # Get all spots for this lot
-    spots = list(parking_spots.find({'lot_id': lot_id}, {'_id': 0}))
-    lot['spots'] = spots
+    return jsonify({
+        'lot_id': lot_id,
+        'epoch': epoch,
+        'seq': seq,
+        'full': full,
+        'spots': spots,
+        **counts
+    })
 
-    return jsonify(lot)
+@app.route('/api/lots/<lot_id>/bitmap', methods=['GET'])
+def get_lot_bitmap(lot_id):
+    """Get the packed occupancy bitmap of a lot (for dashboards and signage)
+
+    ?spot_ids=1 adds the spot_id of every bit position, ?free=<n> the first n free spots
+    """
+    include_spot_ids = request.args.get('spot_ids') in ('1', 'true')
+    free = request.args.get('free', type=int)
+
+    def build():
+        if owns_lot_state(lot_id):
+            change = lot_change_fields(lot_id)
+        else:
+            lot = store.find_lot(lot_id) or {}
+            change = {'change_seq': lot.get('change_seq', 0), 'change_epoch': lot.get('change_epoch')}
+            if not lot_state.knows(lot_id):
+                lot_state.load(lot_id)
+        snapshot = lot_state.snapshot(lot_id, include_spot_ids)
+        if snapshot is None:
+            return jsonify({'error': 'Lot not found'}), 404
+        snapshot.update(change)
+        if free:
+            snapshot['first_free'] = lot_state.first_free(lot_id, free)
+        return snapshot
+
+    return conditional_json(lot_versions.etag(lot_id), build)
 
 @app.route('/api/spots', methods=['GET'])
 def get_all_spots():
     """Get all parking spots"""
     lot_id = request.args.get('lot_id')
-    query = {'lot_id': lot_id} if lot_id else {}
-    spots = list(parking_spots.find(query, {'_id': 0}))
-    return jsonify(spots)
+    return conditional_json(lot_versions.etag(lot_id), lambda: store.list_spots(lot_id))
 
 @app.route('/api/spots/<spot_id>', methods=['GET'])
 def get_spot(spot_id):
     """Get specific spot details"""
-    spot = parking_spots.find_one({'spot_id': spot_id}, {'_id': 0})
+    spot = store.find_spot(spot_id)
     if not spot:
         return jsonify({'error': 'Spot not found'}), 404
     return jsonify(spot)
 
+def parse_time_range(default_span):
+    """Read from/to (ISO 8601) and resolution query parameters"""
+    end = parse_timestamp(request.args['to'], 'to') if request.args.get('to') else datetime.now()
+    start = parse_timestamp(request.args['from'], 'from') if request.args.get('from') else end - default_span
+    if start >= end:
+        raise ValueError("'from' must be before 'to'")
+    return start, end, parse_resolution(request.args.get('resolution'))
+
 @app.route('/api/stats/<lot_id>', methods=['GET'])
 def get_lot_stats(lot_id):
-    """Get statistics for a parking lot"""
+    """Get statistics for a parking lot
+
+    The occupancy series (occupied, peak, avg, turnover per bucket) covers the
+    last hour by default; use from/to/resolution to chart longer ranges
+    """
+    try:
+        start, end, requested = parse_time_range(timedelta(hours=1))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     # Occupancy over time
-    history = list(parking_history.find(
-        {'lot_id': lot_id},
-        {'_id': 0}
-    ).sort('timestamp', -1).limit(100))
+    stored, step = choose_resolution(start, end, requested, ROLLUP_MAX_POINTS)
+    series = occupancy_rollup.query(lot_id, start, end, stored, step)
 
     # Current status
-    lot = parking_lots.find_one({'lot_id': lot_id}, {'_id': 0})
+    lot = lot_state.overlay(store.find_lot(lot_id))
 
-    return jsonify({
+    stats = {
         'current': lot,
-        'history': history
-    })
+        'resolution': step,
+        'series': series
+    }
+
+    # Raw recent events (only for plain requests, kept for older clients)
+    if not any(request.args.get(param) for param in ('from', 'to', 'resolution')):
+        stats['history'] = store.recent_records('parking_history', lot_id, limit=100)
+
+    return jsonify(stats)
 
 @app.route('/api/lots/<lot_id>/override', methods=['POST'])
 def manual_override(lot_id):
@@ -393,53 +967,75 @@ def manual_override(lot_id):
     spot_id = data.get('spot_id')
     occupied = data.get('occupied')
 
+    if role == 'api':
+        if not store.find_spot(spot_id, lot_id):
+            return jsonify({'error': 'Spot not found'}), 404
+        # Spot state has a single writer: hand the override to the ingest process
+        mqtt_client.publish(TOPIC_OVERRIDE, json.dumps({
+            'lot_id': lot_id,
+            'spot_id': spot_id,
+            'occupied': occupied
+        }))
+        return jsonify({'success': True})
+
+    if not apply_override(lot_id, spot_id, occupied):
+        return jsonify({'error': 'Spot not found'}), 404
+    return jsonify({'success': True})
+
+def handle_override(data):
+    """Handle manual overrides forwarded by API workers"""
+    apply_override(data.get('lot_id'), data.get('spot_id'), data.get('occupied'))
+
+def apply_override(lot_id, spot_id, occupied):
+    """
+    Set a spot's status by hand and notify LEDs and clients
+
+    Returns:
+        False (with nothing published) if no spot matched
+    """
     # Update distance based on occupied status
     # Occupied = car present (30-50cm), Available = empty (180-220cm)
     new_distance = random.randint(30, 50) if occupied else random.randint(180, 220)
 
-    parking_spots.update_one(
-        {'spot_id': spot_id, 'lot_id': lot_id},
-        {
-            '$set': {
-                'occupied': occupied,
-                'distance': new_distance,
-                'manual_override': True,
-                'last_update': datetime.now()
-            }
-        }
-    )
+    seq = write_spot(lot_id, spot_id, {
+        'occupied': occupied,
+        'distance': new_distance,
+        'manual_override': True,
+        'last_update': datetime.now()
+    })
 
-    update_lot_availability(lot_id)
+    if seq is None:
+        return False
 
     # Send LED command
     led_color = "red" if occupied else "green"
-    mqtt_client.publish(TOPIC_LED_COMMAND, json.dumps({
-        'spot_id': spot_id,
-        'lot_id': lot_id,
-        'color': led_color
-    }))
+    publish_led_command(lot_id, spot_id, led_color)
 
     # Broadcast update to clients
-    socketio.emit('spot_update', {
+    spot_updates.push(lot_id, {
         'spot_id': spot_id,
         'lot_id': lot_id,
         'occupied': occupied,
         'distance': new_distance,
-        'source': 'manual_override'
+        'last_update': datetime.now().isoformat(),
+        'source': 'manual_override',
+        'seq': seq
     })
-
-    return jsonify({'success': True})
+    return True
 
 @app.route('/api/init', methods=['POST'])
 def initialize_data():
     """Initialize sample parking lot data"""
+    if role == 'api':
+        # The ingest process would keep its in-memory state of the old data
+        return jsonify({'error': 'Initialize data on the ingest process'}), 409
+
     # Clear existing data
-    parking_spots.delete_many({})
-    parking_lots.delete_many({})
+    store.clear_lots()
 
     # Create sample parking lot
     lot_id = "LOT001"
-    parking_lots.insert_one({
+    store.insert_lot({
         'lot_id': lot_id,
         'name': 'Central Parking Tower',
         'address': '123 Main Street',
@@ -451,67 +1047,311 @@ def initialize_data():
     })
 
     # Create 20 parking spots
-    for i in range(1, 21):
-        spot_id = f"SPOT{i:03d}"
-        parking_spots.insert_one({
-            'spot_id': spot_id,
-            'lot_id': lot_id,
-            'occupied': False,
-            'distance': 200,
-            'last_update': datetime.now()
-        })
+    store.insert_spots([{
+        'spot_id': f"SPOT{i:03d}",
+        'lot_id': lot_id,
+        'occupied': False,
+        'distance': 200,
+        'last_update': datetime.now()
+    } for i in range(1, 21)])
+
+    reset_ingest_state()
+    if ingest_partition.count > 1:
+        mqtt_client.publish(TOPIC_RESEED, json.dumps({'source': role}))
 
     return jsonify({'success': True, 'message': 'Data initialized'})
 
+def reset_ingest_state():
+    """Reload the in-memory state of this process's lots after all spots were replaced"""
+    lot_state.seed()
+    spot_changes.reset(store.change_seqs())
+    spot_filter.reset()
+    lot_versions.bump()
+
+# Set while lots and spots are being replaced: ingest workers are held and
+# the lot counter and write buffer loops skip their flushes
+flushes_paused = threading.Event()
+reseed_pause = {}   # 'token' of the pause_for_reseed() waiting for the seeding process
+
+def pause_ingest():
+    """Hold spot writes and flushes; False if a handler was still running after the wait"""
+    flushes_paused.set()
+    return ingest_queue.pause()
+
+def resume_ingest():
+    flushes_paused.clear()
+    ingest_queue.resume()
+
+def pause_for_reseed():
+    """Pause while another ingest process seeds (until its reseed message or SEED_PAUSE_TIMEOUT)"""
+    token = reseed_pause['token'] = object()
+    pause_ingest()
+    socketio.sleep(SEED_PAUSE_TIMEOUT)
+    if reseed_pause.get('token') is token:
+        print(f"No reseed message within {SEED_PAUSE_TIMEOUT}s, resuming ingest")
+        reseed_pause.clear()
+        resume_ingest()
+
+def reload_after_reseed():
+    """Reload after another process replaced the spots (resuming a pause_for_reseed)"""
+    try:
+        reset_ingest_state()
+    finally:
+        if reseed_pause.pop('token', None) is not None:
+            resume_ingest()
+
 @app.route('/api/environment/<lot_id>', methods=['GET'])
 def get_environment_data(lot_id):
-    """Get latest environmental data for a parking lot"""
+    """Get latest environmental data for a parking lot
+
+    With from/to/resolution parameters, returns a min/max/avg series served
+    from the coarsest rollup bucket that fits the requested resolution
+    """
     # Get latest reading
-    latest = environment_data.find_one(
-        {'lot_id': lot_id},
-        {'_id': 0},
-        sort=[('timestamp', -1)]
-    )
+    latest = store.latest_record('environment_data', lot_id)
+
+    if not any(request.args.get(param) for param in ('from', 'to', 'resolution')):
+        # Get recent history
+        history = store.recent_records('environment_data', lot_id, limit=20)
 
-    # Get recent history
-    history = list(environment_data.find(
-        {'lot_id': lot_id},
-        {'_id': 0}
-    ).sort('timestamp', -1).limit(20))
+        return jsonify({
+            'latest': latest,
+            'history': history
+        })
+
+    try:
+        start, end, requested = parse_time_range(timedelta(days=1))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    stored, step = choose_resolution(start, end, requested, ROLLUP_MAX_POINTS)
+    series = environment_rollup.query(lot_id, start, end, stored, step, request.args.get('sensor_id'))
 
     return jsonify({
         'latest': latest,
-        'history': history
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'resolution': step,
+        'source_resolution': stored,
+        'series': series
     })
 
 @app.route('/api/alerts/<lot_id>', methods=['GET'])
 def get_alerts(lot_id):
-    """Get recent alerts for a parking lot"""
-    recent_alerts = list(alerts.find(
-        {'lot_id': lot_id},
-        {'_id': 0}
-    ).sort('timestamp', -1).limit(10))
+    """Get recent alert incidents for a parking lot (one per incident, with occurrences)"""
+    recent_alerts = store.recent_records('alerts', lot_id, limit=10)
 
     return jsonify(recent_alerts)
 
 @app.route('/api/button_events', methods=['GET'])
 def get_button_events():
     """Get recent button events"""
-    events = list(button_events.find({}, {'_id': 0}).sort('timestamp', -1).limit(20))
+    events = store.recent_records('button_events', limit=20)
     return jsonify(events)
 
+@app.route('/api/system/status', methods=['GET'])
+def get_system_status():
+    """Get ingestion pipeline counters"""
+    return jsonify({
+        'ingest_queue': ingest_queue.stats(),
+        'spot_updates': spot_updates.stats(),
+        'spot_filter': spot_filter.stats(),
+        'alerts': alert_tracker.stats(),
+        'room_subscribers': lot_rooms.subscriber_counts(),
+        'write_buffer': write_buffer.stats(),
+        'response_cache': response_cache.stats(),
+        'role': role,
+        'ingest_partition': {'index': ingest_partition.index, 'count': ingest_partition.count},
+        'transport': {
+            'mode': TRANSPORT,
+            'broker': mqtt_broker.stats() if mqtt_broker else None
+        }
+    })
+
+@app.route('/api/system/indexes', methods=['GET'])
+def get_index_status():
+    """Report missing/unused indexes and the query plans of the history routes"""
+    if store.db is None:
+        return jsonify({'error': 'Indexes are only available with MongoDB storage'}), 400
+
+    lot_id = request.args.get('lot_id', 'LOT001')
+    return jsonify({
+        'indexes': index_report(store.db),
+        'query_plans': verify_query_plans(store.db, lot_id)
+    })
+
+# Admin Endpoints
+
+def admin_required(view):
+    """Reject requests without the admin token (all requests if no token is configured)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = request.headers.get('X-Admin-Token', '')
+        if not ADMIN_TOKEN or not hmac.compare_digest(token, ADMIN_TOKEN):
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/api/admin/profile', methods=['POST'])
+@admin_required
+def start_profile():
+    """Start sampling every thread for ?seconds= (default 10)"""
+    try:
+        seconds = float(request.args.get('seconds', 10))
+    except ValueError:
+        return jsonify({'error': 'seconds must be a number'}), 400
+    if seconds <= 0:
+        return jsonify({'error': 'seconds must be positive'}), 400
+
+    try:
+        profiler.start(seconds)
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify(profiler.report()), 202
+
+@app.route('/api/admin/profile', methods=['GET'])
+@admin_required
+def get_profile():
+    """Top functions of the current or last profiling run"""
+    return jsonify(profiler.report(limit=request.args.get('limit', 25, type=int)))
+
+@app.route('/api/admin/profile/stop', methods=['POST'])
+@admin_required
+def stop_profile():
+    profiler.stop()
+    return jsonify(profiler.report(limit=request.args.get('limit', 25, type=int)))
+
+@app.route('/api/admin/slow', methods=['GET'])
+@admin_required
+def get_slow_operations():
+    """Recent MQTT handlers and REST requests over their threshold, with stage timings"""
+    return jsonify({
+        'thresholds_ms': slow_ops.thresholds,
+        'slow_count': slow_ops.slow_count,
+        'operations': slow_ops.recent()
+    })
+
+# Progress of the last /api/admin/seed run (state: idle, running, done or failed)
+seed_job = {'state': 'idle'}
+seed_job_lock = threading.Lock()
+
+def run_seed_job(options):
+    """Seed the store and reload this process's lots (background task)"""
+    def progress(stage, done, total):
+        seed_job.update(stage=stage, done=done, total=total)
+        # Let requests and MQTT messages run between chunks
+        socketio.sleep(0)
+
+    # Nothing else may write lots or spots while the collections and their
+    # unique indexes are dropped and rebuilt
+    seed_job['stage'] = 'pause'
+    if ingest_partition.count > 1:
+        mqtt_client.publish(TOPIC_RESEED, json.dumps({'source': role, 'phase': 'start',
+                                                      'partition': ingest_partition.index}))
+    try:
+        if not pause_ingest():
+            raise RuntimeError("ingest workers did not pause")
+        result = seed_store(store, progress=progress, **options)
+
+        seed_job['stage'] = 'reload'
+        start = time.perf_counter()
+        reset_ingest_state()
+        result['seconds']['reload'] = round(time.perf_counter() - start, 2)
+        if result['index_errors']:
+            failed = ', '.join(f"{error['collection']}.{error['index']}" for error in result['index_errors'])
+            seed_job.update(state='failed', error=f"Could not create indexes: {failed}", result=result)
+        else:
+            seed_job.update(state='done', result=result)
+    except Exception as e:
+        print(f"Error seeding data: {e}")
+        seed_job.update(state='failed', error=str(e))
+    finally:
+        resume_ingest()
+        if ingest_partition.count > 1:
+            mqtt_client.publish(TOPIC_RESEED, json.dumps({'source': role, 'phase': 'done'}))
+    seed_job['finished'] = datetime.now().isoformat()
+
+@app.route('/api/admin/seed', methods=['GET'])
+@admin_required
+def get_seed_progress():
+    """Progress of the running (or last) seed"""
+    return jsonify(dict(seed_job))
+
+@app.route('/api/admin/seed', methods=['POST'])
+@admin_required
+def seed_data():
+    """Start replacing every lot and spot with generated ones (JSON body, see parkmate.seeding)
+
+    Seeding runs as a background task; poll GET /api/admin/seed for progress
+    """
+    if role == 'api':
+        return jsonify({'error': 'Seed data on the ingest process'}), 409
+
+    options = request.get_json(silent=True) or {}
+    try:
+        lots = int(options.get('lots', 10))
+        spots = int(options.get('spots', 20))
+        floors = int(options.get('floors', 1))
+        zones = int(options.get('zones', 1))
+        price_range = (float(options.get('price_min', 2.0)), float(options.get('price_max', options.get('price_min', 2.0))))
+        center = (float(options.get('lat', DEFAULT_CENTER[0])), float(options.get('lng', DEFAULT_CENTER[1])))
+        radius_km = float(options.get('radius_km', 5.0))
+        occupancy = float(options.get('occupancy', 0.0))
+        chunk_size = int(options.get('chunk_size', SEED_CHUNK_SIZE))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Seed options must be numbers'}), 400
+    if min(lots, spots, floors, zones, chunk_size) < 1 or not 0 <= occupancy <= 1:
+        return jsonify({'error': 'lots, spots, floors, zones and chunk_size must be positive, occupancy 0..1'}), 400
+    if lots * spots > SEED_MAX_SPOTS:
+        return jsonify({'error': f'At most {SEED_MAX_SPOTS} spots per seed'}), 400
+
+    with seed_job_lock:
+        if seed_job['state'] == 'running':
+            return jsonify({'error': 'A seed is already running', **seed_job}), 409
+        seed_job.clear()
+        seed_job.update(state='running', stage='clear', done=0, total=lots * spots,
+                        started=datetime.now().isoformat())
+
+    socketio.start_background_task(run_seed_job, {
+        'lots': lots, 'spots_per_lot': spots, 'floors': floors, 'zones': zones,
+        'price_range': price_range, 'center': center, 'radius_km': radius_km,
+        'occupancy': occupancy, 'chunk_size': chunk_size, 'seed': options.get('seed')
+    })
+
+    return jsonify({'success': True, **seed_job}), 202
+
 # WebSocket Events
 @socketio.on('connect')
 def handle_connect():
     print('Client connected')
     emit('connected', {'data': 'Connected to ParkMate'})
 
+    # Clients may pick their lot in the connection query (?lot_id=LOT001)
+    lot_id = request.args.get('lot_id')
+    if lot_id:
+        handle_join_lot({'lot_id': lot_id})
+
+@socketio.on('join_lot')
+def handle_join_lot(data):
+    """Subscribe the client to a lot's room (leaving its previous lot)"""
+    lot_id = (data or {}).get('lot_id')
+    if not lot_id:
+        return
+
+    previous = lot_rooms.join(request.sid, lot_id)
+    if previous and previous != lot_id:
+        leave_room(lot_room(previous))
+    join_room(lot_room(lot_id))
+    emit('joined_lot', {'lot_id': lot_id})
+
 @socketio.on('disconnect')
 def handle_disconnect():
+    lot_rooms.leave(request.sid)
     print('Client disconnected')
 
 if __name__ == '__main__':
-    print("Starting ParkMate Backend Server...")
+    print(f"Starting ParkMate Backend Server ({ROLE})...")
     print("Make sure MongoDB is running on localhost:27017")
     print("Make sure MQTT broker (mosquitto) is running on localhost:1883")
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
+    # No reloader: its watcher process would open a second set of connections
+    socketio.run(create_app(), debug=True, use_reloader=False, host='0.0.0.0', port=FLASK_PORT)
@@ -0,0 +1,334 @@
+"""
+ParkMate Ingestion Benchmark
+Drives spot status, environment and button messages into the backend at a
+configurable rate and measures throughput and end-to-end latency, from the
+'timestamp' the emulators put in every payload to the Socket.IO event that
+reports it (spot_updates, environment_update, button_event).
+
+Modes:
+    inprocess - import app.py with the in-memory transport (config.TRANSPORT)
+                and publish through its in-process broker; Socket.IO events
+                are recorded in-process and a fleet emulator on the same broker
+                receives the LED commands (MongoDB must be running unless
+                --storage memory)
+    broker    - publish through the MQTT broker to a running app.py and
+                listen to its Socket.IO events as a dashboard would (run it
+                without PARKMATE_SPOT_FILTER_DWELL, or latencies include the
+                dwell time)
+
+Results are printed and can be written as JSON (--output) and compared with
+a previous run (--compare) to catch regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'emulators'))
+
+from parkmate.codec import encode_spot_status
+
+TOPIC_SPOT_STATUS = "parkmate/spot/status"
+TOPIC_ENVIRONMENT = "parkmate/environment"
+TOPIC_BUTTON_PRESS = "parkmate/button/press"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def parse_timestamp(value):
+    """Sensor timestamp (ISO string) as epoch seconds"""
+    if value is None:
+        return None
+    return datetime.fromisoformat(value).timestamp()
+
+
+class LatencyRecorder:
+    """Collects end-to-end latencies per event type from received events"""
+
+    def __init__(self):
+        self.latencies = {}   # event -> list of ms
+        self.lock = threading.Lock()
+
+    def observe(self, event, data):
+        received = time.time()
+        if event == 'spot_updates':
+            sent = [update.get('sensor_timestamp') for update in data.get('updates', [])]
+        elif event == 'environment_update':
+            sent = [data.get('sensor_timestamp')]
+        elif event == 'button_event':
+            sent = [data.get('timestamp')]
+        else:
+            return
+
+        with self.lock:
+            samples = self.latencies.setdefault(event, [])
+            for timestamp in sent:
+                start = parse_timestamp(timestamp)
+                if start is not None:
+                    samples.append((received - start) * 1000)
+
+    def summary(self, duration):
+        with self.lock:
+            result = {}
+            for event, samples in self.latencies.items():
+                result[event] = {
+                    'count': len(samples),
+                    'throughput_per_s': round(len(samples) / duration, 1) if duration else 0,
+                    'p50_ms': round(percentile(samples, 50), 2),
+                    'p95_ms': round(percentile(samples, 95), 2),
+                    'p99_ms': round(percentile(samples, 99), 2),
+                    'max_ms': round(max(samples), 2)
+                }
+            return result
+
+
+class MessageGenerator:
+    """Builds emulator-shaped payloads for a weighted topic mix"""
+
+    def __init__(self, lots, spots, mix, binary=False):
+        self.binary = binary
+        self.lot_ids = [f"LOT{i:03d}" for i in range(1, lots + 1)]
+        self.spot_ids = [f"SPOT{i:03d}" for i in range(1, spots + 1)]
+        self.occupied = {}
+        self.topics = [topic for topic, weight in mix.items() for _ in range(weight)]
+
+    def next(self):
+        topic = random.choice(self.topics)
+        lot_id = random.choice(self.lot_ids)
+        spot_id = random.choice(self.spot_ids)
+        timestamp = datetime.now().isoformat()
+
+        if topic == TOPIC_SPOT_STATUS:
+            # Flip the spot so every message is a real transition
+            occupied = not self.occupied.get((lot_id, spot_id), False)
+            self.occupied[(lot_id, spot_id)] = occupied
+            distance = random.randint(10, 50) if occupied else random.randint(180, 220)
+            if self.binary:
+                return topic, encode_spot_status(lot_id, spot_id, occupied, distance, time.time())
+            payload = {
+                'spot_id': spot_id,
+                'lot_id': lot_id,
+                'occupied': occupied,
+                'distance': distance,
+                'timestamp': timestamp
+            }
+        elif topic == TOPIC_ENVIRONMENT:
+            temperature = round(random.uniform(15, 30), 1)
+            payload = {
+                'sensor_id': f"DHT_{lot_id}",
+                'lot_id': lot_id,
+                'temperature': temperature,
+                'humidity': round(random.uniform(30, 70), 1),
+                'heat_index': temperature,
+                'timestamp': timestamp
+            }
+        else:
+            payload = {
+                'button_id': 'BENCH',
+                'spot_id': spot_id,
+                'action': 'toggle',
+                'pressed': True,
+                'timestamp': timestamp
+            }
+        return topic, json.dumps(payload).encode()
+
+
+def drive(send, generator, rate, duration):
+    """Send messages at a fixed rate; returns (sent, elapsed seconds)"""
+    interval = 1.0 / rate
+    sent = 0
+    start = time.monotonic()
+    next_time = start
+    while True:
+        now = time.monotonic()
+        if now - start >= duration:
+            break
+        if next_time > now:
+            time.sleep(next_time - now)
+        send(*generator.next())
+        sent += 1
+        next_time += interval
+    return sent, time.monotonic() - start
+
+
+def run_inprocess(args, recorder):
+    os.environ['PARKMATE_TRANSPORT'] = 'memory'
+    os.environ['PARKMATE_STORAGE'] = args.storage
+    # No server loop runs here, so use OS threads rather than green threads
+    os.environ['PARKMATE_ASYNC_MODE'] = 'threading'
+    # Every generated reading is a transition; measure the pipeline, not the dwell time
+    os.environ['PARKMATE_SPOT_FILTER_DWELL'] = '0'
+    import app as backend
+    from fleet_emulator import SensorFleet
+    backend.create_app('combined')
+
+    backend.event_emitter.on('*', lambda event, data, to: recorder.observe(event, data))
+
+    # Sensor side of the loop: receives LED commands over the in-process broker
+    lot_ids = [f"LOT{i:03d}" for i in range(1, args.lots + 1)]
+    fleet = SensorFleet(lot_ids, args.spots, client=backend.mqtt_broker.client("ingest_benchmark_fleet"))
+    fleet.connect()
+
+    # No Socket.IO server loop runs here, so drive the coalescing window ourselves
+    def pump():
+        while True:
+            time.sleep(backend.SPOT_UPDATE_WINDOW)
+            backend.spot_updates.flush()
+
+    threading.Thread(target=pump, daemon=True).start()
+
+    generator = MessageGenerator(args.lots, args.spots, args.mix, args.binary)
+    if args.direct:
+        sent, elapsed = drive(backend.dispatch_message, generator, args.rate, args.duration)
+    else:
+        publisher = backend.mqtt_broker.client("ingest_benchmark")
+        publisher.connect()
+        sent, elapsed = drive(publisher.publish, generator, args.rate, args.duration)
+
+    # Let queued messages and the coalescing window drain
+    deadline = time.monotonic() + args.drain
+    while backend.ingest_queue.depth() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(backend.SPOT_UPDATE_WINDOW * 2)
+    print(f"LED commands received by the fleet emulator: {fleet.led_commands}")
+    fleet.disconnect()
+    return sent, elapsed, backend.ingest_queue.stats()
+
+
+def run_broker(args, recorder):
+    import paho.mqtt.client as mqtt
+    import socketio
+
+    lot_ids = [f"LOT{i:03d}" for i in range(1, args.lots + 1)]
+    clients = []
+    for lot_id in lot_ids:
+        client = socketio.Client()
+        for event in ('spot_updates', 'environment_update', 'button_event'):
+            client.on(event, lambda data, event=event: recorder.observe(event, data))
+        client.connect(args.server)
+        client.emit('join_lot', {'lot_id': lot_id})
+        clients.append(client)
+
+    publisher = mqtt.Client(client_id=f"ingest_benchmark_{os.getpid()}")
+    publisher.max_queued_messages_set(0)
+    publisher.connect(args.broker, args.port, 60)
+    publisher.loop_start()
+
+    generator = MessageGenerator(args.lots, args.spots, args.mix, args.binary)
+    sent, elapsed = drive(publisher.publish, generator, args.rate, args.duration)
+    time.sleep(args.drain)
+
+    publisher.loop_stop()
+    publisher.disconnect()
+    server_stats = None
+    try:
+        import urllib.request
+        with urllib.request.urlopen(f"{args.server}/api/system/status") as response:
+            server_stats = json.loads(response.read()).get('ingest_queue')
+    except Exception as e:
+        print(f"Could not read server status: {e}")
+    for client in clients:
+        client.disconnect()
+    return sent, elapsed, server_stats
+
+
+def compare(result, baseline_path, tolerance):
+    """Print p99/throughput changes against a baseline; returns False on regression"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    ok = True
+    print(f"\nComparison with {baseline_path} (tolerance {tolerance:.0%}):")
+    for event, current in result['events'].items():
+        previous = baseline.get('events', {}).get(event)
+        if not previous:
+            continue
+        p99_change = (current['p99_ms'] - previous['p99_ms']) / previous['p99_ms'] if previous['p99_ms'] else 0
+        rate_change = ((current['throughput_per_s'] - previous['throughput_per_s']) / previous['throughput_per_s']
+                       if previous['throughput_per_s'] else 0)
+        regressed = p99_change > tolerance or rate_change < -tolerance
+        ok = ok and not regressed
+        print(f"  {event:20s} p99 {previous['p99_ms']:8.2f} -> {current['p99_ms']:8.2f} ms ({p99_change:+.0%}) | "
+              f"throughput {previous['throughput_per_s']:8.1f} -> {current['throughput_per_s']:8.1f}/s "
+              f"({rate_change:+.0%}){'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ParkMate Ingestion Benchmark')
+    parser.add_argument('--mode', choices=('inprocess', 'broker'), default='inprocess')
+    parser.add_argument('--rate', type=float, default=500, help='Messages per second (default: 500)')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds to send for (default: 10)')
+    parser.add_argument('--drain', type=float, default=5, help='Seconds to wait for in-flight events (default: 5)')
+    parser.add_argument('--lots', type=int, default=1, help='Number of lots (default: 1)')
+    parser.add_argument('--spots', type=int, default=20, help='Spots per lot (default: 20)')
+    parser.add_argument('--mix', type=str, default='status=8,environment=1,button=1',
+                        help='Topic weights (default: status=8,environment=1,button=1)')
+    parser.add_argument('--binary', action='store_true',
+                        help='Send spot status as binary payloads (parkmate/codec.py) instead of JSON')
+    parser.add_argument('--direct', action='store_true',
+                        help='inprocess: call the handlers directly instead of publishing through the broker and ingest queue')
+    parser.add_argument('--storage', choices=('mongodb', 'memory'), default='mongodb',
+                        help='inprocess: backend storage; memory isolates handler cost from MongoDB')
+    parser.add_argument('--broker', type=str, default='localhost', help='broker: MQTT host')
+    parser.add_argument('--port', type=int, default=1883, help='broker: MQTT port')
+    parser.add_argument('--server', type=str, default='http://localhost:5000', help='broker: backend URL')
+    parser.add_argument('--output', type=str, help='Write results as JSON to this file')
+    parser.add_argument('--compare', type=str, help='Baseline JSON file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed regression (default: 0.10)')
+    args = parser.parse_args()
+
+    topics = {'status': TOPIC_SPOT_STATUS, 'environment': TOPIC_ENVIRONMENT, 'button': TOPIC_BUTTON_PRESS}
+    args.mix = {topics[name]: int(weight)
+                for name, weight in (item.split('=') for item in args.mix.split(','))}
+
+    recorder = LatencyRecorder()
+    runner = run_inprocess if args.mode == 'inprocess' else run_broker
+    sent, elapsed, queue_stats = runner(args, recorder)
+
+    result = {
+        'timestamp': datetime.now().isoformat(),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'config': {
+            'mode': args.mode,
+            'rate': args.rate,
+            'duration': args.duration,
+            'lots': args.lots,
+            'spots': args.spots,
+            'mix': {topic: weight for topic, weight in args.mix.items()},
+            'direct': args.direct,
+            'storage': args.storage,
+            'binary': args.binary
+        },
+        'sent': sent,
+        'send_rate_per_s': round(sent / elapsed, 1),
+        'ingest_queue': queue_stats,
+        'events': recorder.summary(elapsed)
+    }
+
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare and not compare(result, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
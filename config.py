@@ -2,6 +2,7 @@
 ParkMate Configuration File
 Customize these settings for your deployment
 """
+import os
 
 # MongoDB Configuration
 MONGODB_HOST = 'localhost'
@@ -20,7 +21,7 @@ TOPIC_PAYMENT = 'parkmate/payment'
 
 # Flask Configuration
 FLASK_HOST = '0.0.0.0'
-FLASK_PORT = 5000
+FLASK_PORT = int(os.environ.get('PARKMATE_PORT', 5000))  # give each process of a split deployment its own port
 FLASK_DEBUG = True
 
 # Sensor Emulator Configuration
@@ -39,6 +40,113 @@ EMPTY_DISTANCE = 200      # cm - typical distance to floor
 MIN_CAR_DISTANCE = 10     # cm - minimum distance when car present
 MAX_CAR_DISTANCE = 50     # cm - maximum distance when car present
 
+# Spot Signal Filter
+# A spot changes state only when the distance crosses OCCUPIED_THRESHOLD by
+# more than the hysteresis and the new state holds for the dwell time;
+# readings that repeat the current state are not written or broadcast.
+# The dwell time is opt-in: set PARKMATE_SPOT_FILTER_DWELL (e.g. 2) for
+# sensors whose readings flap while a car is manoeuvring.
+SPOT_FILTER_HYSTERESIS = 15       # cm either side of OCCUPIED_THRESHOLD
+SPOT_FILTER_DWELL = float(os.environ.get('PARKMATE_SPOT_FILTER_DWELL', 0))  # seconds a new state must hold (0 accepts at once)
+SPOT_FILTER_WINDOW = 1            # distances in the median filter (1 = no median; sensors publishing only on change need 1)
+SPOT_FILTER_SWEEP_INTERVAL = 0.5  # seconds between checks for transitions that outlasted the dwell time
+
 # System Settings
 CORS_ENABLED = True
-SOCKETIO_ASYNC_MODE = 'eventlet'
+# 'eventlet' monkey patches the standard library so MQTT, MongoDB, the ingest
+# workers and Socket.IO all run as green threads on one event loop;
+# 'threading' uses OS threads (in-process benchmarks and debugging)
+SOCKETIO_ASYNC_MODE = os.environ.get('PARKMATE_ASYNC_MODE', 'eventlet')
+
+# Process Roles (create_app(role) / PARKMATE_ROLE)
+#   combined - one process ingests MQTT and serves the API (default)
+#   ingest   - the single process consuming MQTT and writing spot state
+#   api      - REST/Socket.IO workers; start as many as needed
+# With separate roles, Socket.IO events from the ingest process reach the API
+# workers' clients through a message queue: mqtt://localhost:1883 reuses the
+# MQTT broker, redis://localhost:6379/0 or any Kombu URL also work
+ROLE = os.environ.get('PARKMATE_ROLE', 'combined')
+SOCKETIO_MESSAGE_QUEUE = os.environ.get('PARKMATE_MESSAGE_QUEUE')
+
+# Ingest processes: run INGEST_PROCESSES ingest (or combined) processes with
+# INGEST_PROCESS_INDEX 0..n-1; each receives every message and handles only
+# the lots that hash to it, so every lot's in-memory state has one owner
+INGEST_PROCESSES = int(os.environ.get('PARKMATE_INGEST_PROCESSES', 1))
+INGEST_PROCESS_INDEX = int(os.environ.get('PARKMATE_INGEST_PROCESS_INDEX', 0))
+
+# Lot State Engine
+LOT_STATE_FLUSH_INTERVAL = 2.0  # seconds between parking_lots counter writes
+
+# Write-Behind Buffer (parking_history, environment_data, button_events)
+WRITE_BUFFER_MAX_BATCH = 500  # records per insert_many
+WRITE_BUFFER_MAX_AGE = 1.0    # seconds a record may wait before being flushed
+WRITE_BUFFER_MAX_PENDING = 50000  # records kept per collection while MongoDB is unreachable
+
+# MQTT Ingest Queue
+INGEST_WORKERS = 4             # handler threads (messages are partitioned by lot_id)
+INGEST_QUEUE_SIZE = 10000      # capacity of each worker queue
+INGEST_DROP_POLICY = 'block'   # 'block', 'drop_newest' or 'drop_oldest'
+INGEST_BLOCK_TIMEOUT = 5.0     # seconds to wait on a full queue under 'block'
+
+# Socket.IO spot update coalescing
+SPOT_UPDATE_WINDOW = 0.15  # seconds of spot changes batched into one 'spot_updates' event
+
+# LED Command Topics
+# Commands go to parkmate/{lot_id}/led/{spot_id}; enable the legacy flag to
+# also publish on the flat TOPIC_LED_COMMAND for older devices
+LED_LEGACY_TOPIC = False
+
+# Time-Series Rollups
+ROLLUP_FLUSH_INTERVAL = 5.0  # seconds between rollup bucket writes
+ROLLUP_MAX_POINTS = 500      # points returned when no resolution is requested
+
+# Transports
+# 'mqtt' talks to the MQTT broker and Socket.IO clients; 'memory' runs MQTT
+# through an in-process broker and records Socket.IO events, so the backend,
+# emulators and benchmarks can run in one process without Mosquitto.
+TRANSPORT = os.environ.get('PARKMATE_TRANSPORT', 'mqtt')
+
+# Storage
+# 'mongodb' persists to MongoDB; 'memory' keeps every collection in process
+# (edge gateways, benchmarks) and loses it on restart.
+# Override with the PARKMATE_STORAGE environment variable.
+STORAGE = os.environ.get('PARKMATE_STORAGE', 'mongodb')
+MEMORY_STORE_MAX_RECORDS = 10000  # records kept per lot in each history collection (memory storage)
+
+# Conditional GET (/api/lots, /api/lots/<lot_id>, /api/spots)
+RESPONSE_CACHE_SIZE = 256  # serialized responses kept (one per URL)
+
+# Delta Sync (/api/lots/<lot_id>/changes)
+CHANGELOG_MAX_CHANGES = 1000  # spot changes remembered per lot before clients get a full snapshot
+
+# Admin endpoints (/api/admin/...)
+# Disabled unless PARKMATE_ADMIN_TOKEN is set; clients send it in X-Admin-Token
+ADMIN_TOKEN = os.environ.get('PARKMATE_ADMIN_TOKEN')
+
+# Profiling
+PROFILE_MAX_SECONDS = 60         # longest sampling run
+PROFILE_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+SLOW_HANDLER_MS = 50             # MQTT handlers slower than this are logged with stage timings
+SLOW_REQUEST_MS = 200            # REST requests slower than this are logged
+SLOW_LOG_SIZE = 100              # slow operations kept for /api/admin/slow
+
+# Bulk Seeding (POST /api/admin/seed, python -m parkmate.seeding)
+SEED_CHUNK_SIZE = 10000    # documents per insert_many
+SEED_MAX_SPOTS = 2000000   # largest lots x spots /api/admin/seed accepts
+SEED_PAUSE_TIMEOUT = 600   # seconds ingest stays paused for another process's seed without hearing it finish
+
+# Alert Lifecycle
+# One alerts document per incident of (lot_id, sensor_id, alert_type): repeated
+# sensor alerts only count occurrences. An incident resolves once a reading is
+# back past its threshold by the band, or after ALERT_STALE_AFTER seconds
+# without alerts or readings. Thresholds match the DHT sensors.
+ALERT_RULES = {
+    'HIGH_TEMPERATURE': {'field': 'temperature', 'above': 35.0, 'band': 1.0},
+    'LOW_TEMPERATURE': {'field': 'temperature', 'below': 0.0, 'band': 1.0},
+    'HIGH_HUMIDITY': {'field': 'humidity', 'above': 80.0, 'band': 5.0},
+    'LOW_HUMIDITY': {'field': 'humidity', 'below': 20.0, 'band': 5.0},
+    'HIGH_HEAT_INDEX': {'field': 'heat_index', 'above': 32.0, 'band': 1.0},
+}
+ALERT_RENOTIFY_INTERVAL = 900  # seconds between repeated 'alert' events of an ongoing incident
+ALERT_STALE_AFTER = 300        # seconds without alerts or readings before an incident resolves
+ALERT_FLUSH_INTERVAL = 5.0     # seconds between incident writes
@@ -29,14 +29,14 @@ class Colors:
     BOLD = '\033[1m'
 
 class ButtonKnobEmulator:
-    def __init__(self, device_id="BTN001"):
+    def __init__(self, device_id="BTN001", client=None):
         self.device_id = device_id
         self.knob_value = 50  # Initial knob position (0-100)
         self.button_press_count = 0
         self.knob_adjust_count = 0
 
         # MQTT Client
-        self.client = mqtt.Client(client_id=f"button_knob_{device_id}")
+        self.client = client or mqtt.Client(client_id=f"button_knob_{device_id}")
         self.client.on_connect = self.on_connect
         self.running = True
 
@@ -28,7 +28,7 @@ class Colors:
     BOLD = '\033[1m'
 
 class DHTSensorEmulator:
-    def __init__(self, sensor_id, lot_id):
+    def __init__(self, sensor_id, lot_id, client=None):
         self.sensor_id = sensor_id
         self.lot_id = lot_id
 
@@ -44,7 +44,7 @@ class DHTSensorEmulator:
         self.humidity_low_threshold = 20.0   # Very dry
 
         # MQTT Client
-        self.client = mqtt.Client(client_id=f"dht_{sensor_id}")
+        self.client = client or mqtt.Client(client_id=f"dht_{sensor_id}")
         self.client.on_connect = self.on_connect
 
     def on_connect(self, client, userdata, flags, rc):
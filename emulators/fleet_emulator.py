@@ -0,0 +1,278 @@
+"""
+IoT Parking Sensor Fleet Emulator
+Simulates thousands of ultrasonic sensors over a single MQTT connection per
+process, for load testing the backend at garage-network scale.
+
+Spot state is kept in compact arrays (one byte for occupancy, two bytes for
+distance, one byte for LED color per spot) instead of one object and one MQTT
+client per spot. Large fleets can be split by lot across several processes.
+"""
+import paho.mqtt.client as mqtt
+import json
+import time
+import random
+import multiprocessing
+import os
+import sys
+from array import array
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parkmate.codec import encode_spot_status
+
+# MQTT Configuration
+MQTT_BROKER = "localhost"
+MQTT_PORT = 1883
+TOPIC_SPOT_STATUS = "parkmate/spot/status"
+TOPIC_LED_SPOT = "parkmate/{lot_id}/led/{spot_id}"
+
+LED_GREEN = 0
+LED_RED = 1
+
+
+def spot_id_for(index):
+    """Spot identifier of a 0-based spot index (SPOT001, SPOT002, ...)"""
+    return f"SPOT{index + 1:03d}"
+
+
+class SensorFleet:
+    def __init__(self, lot_ids, spots_per_lot, fleet_id="fleet", binary=False, client=None):
+        self.lot_ids = list(lot_ids)
+        self.spots_per_lot = spots_per_lot
+        self.lot_offsets = {lot_id: i * spots_per_lot for i, lot_id in enumerate(self.lot_ids)}
+        self.spot_ids = [spot_id_for(i) for i in range(spots_per_lot)]
+
+        size = len(self.lot_ids) * spots_per_lot
+        self.occupied = array('B', bytes(size))
+        self.distance = array('H', [200]) * size  # cm - empty spot distance
+        self.led = array('B', bytes(size))
+        self.binary = binary
+
+        # Counters
+        self.published = 0
+        self.led_commands = 0
+
+        # One MQTT connection for the whole fleet
+        self.client = client or mqtt.Client(client_id=f"sensor_fleet_{fleet_id}_{os.getpid()}")
+        self.client.max_queued_messages_set(0)
+        self.client.on_connect = self.on_connect
+        self.client.on_message = self.on_message
+
+    def on_connect(self, client, userdata, flags, rc):
+        print(f"Fleet {self.lot_ids[0]}..{self.lot_ids[-1]} connected to MQTT broker with code {rc}")
+        # One wildcard subscription per lot instead of one per spot
+        for lot_id in self.lot_ids:
+            self.client.subscribe(TOPIC_LED_SPOT.format(lot_id=lot_id, spot_id='+'))
+
+    def on_message(self, client, userdata, msg):
+        try:
+            # parkmate/{lot_id}/led/{spot_id}
+            _, lot_id, _, spot_id = msg.topic.split('/')
+            index = self.lot_offsets[lot_id] + int(spot_id[4:]) - 1
+            color = json.loads(msg.payload.decode()).get('color', 'green')
+            self.led[index] = LED_RED if color == 'red' else LED_GREEN
+            self.led_commands += 1
+        except (ValueError, KeyError) as e:
+            print(f"Ignoring LED command on {msg.topic}: {e}")
+
+    def measure_distance(self, index):
+        """Simulate ultrasonic distance measurement"""
+        if self.occupied[index]:
+            # Car present: distance between 10-50cm
+            self.distance[index] = random.randint(10, 50)
+        else:
+            # Empty spot: distance around 200cm (floor)
+            self.distance[index] = random.randint(180, 220)
+
+    def publish_status(self, index):
+        """Publish the status of one spot"""
+        lot_index, spot_index = divmod(index, self.spots_per_lot)
+        payload = None
+        if self.binary:
+            # None if the ids are not LOTnnn/SPOTnnn (sent as JSON instead)
+            payload = encode_spot_status(self.lot_ids[lot_index], self.spot_ids[spot_index],
+                                         self.occupied[index], self.distance[index], time.time())
+        if payload is None:
+            payload = json.dumps({
+                'spot_id': self.spot_ids[spot_index],
+                'lot_id': self.lot_ids[lot_index],
+                'occupied': bool(self.occupied[index]),
+                'distance': self.distance[index],
+                'timestamp': datetime.now().isoformat()
+            })
+        self.client.publish(TOPIC_SPOT_STATUS, payload)
+        self.published += 1
+
+    def simulate_events(self, change_rate):
+        """
+        Flip a random share of spots (cars parking/leaving)
+
+        Returns:
+            Indexes of the spots that changed
+        """
+        size = len(self.occupied)
+        count = min(size, int(size * change_rate + random.random()))
+        changed = random.sample(range(size), count)
+        for index in changed:
+            self.occupied[index] ^= 1
+            self.measure_distance(index)
+        return changed
+
+    def connect(self):
+        """Connect to MQTT broker"""
+        try:
+            self.client.connect(MQTT_BROKER, MQTT_PORT, 60)
+            self.client.loop_start()
+            return True
+        except Exception as e:
+            print(f"Connection error for fleet: {e}")
+            return False
+
+    def disconnect(self):
+        """Disconnect from MQTT broker"""
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+class RateLimiter:
+    """Spread publishes evenly so at most max_rate messages go out per second"""
+
+    def __init__(self, max_rate):
+        self.interval = 1.0 / max_rate if max_rate else 0.0
+        self.next_time = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        self.next_time = max(self.next_time + self.interval, time.monotonic() - 1.0)
+        delay = self.next_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def run_fleet(lot_ids, spots_per_lot, update_interval=5, change_rate=0.1, max_rate=0, fleet_id="fleet",
+              binary=False):
+    """
+    Run one fleet (one MQTT connection) for a set of lots
+
+    Args:
+        lot_ids: Parking lots simulated by this fleet
+        spots_per_lot: Number of spots per lot
+        update_interval: Seconds between simulation cycles
+        change_rate: Share of spots changing state per cycle (0.1 = 10%)
+        max_rate: Maximum publishes per second (0 = unlimited)
+        fleet_id: Name used in the MQTT client id
+        binary: Publish status in the compact binary layout instead of JSON
+    """
+    fleet = SensorFleet(lot_ids, spots_per_lot, fleet_id, binary)
+    if not fleet.connect():
+        return
+
+    limiter = RateLimiter(max_rate)
+    size = len(fleet.occupied)
+    started = time.monotonic()
+
+    try:
+        # Initial status publish
+        for index in range(size):
+            fleet.measure_distance(index)
+            fleet.publish_status(index)
+            limiter.wait()
+        print(f"Fleet {fleet_id}: {size} spots online in {time.monotonic() - started:.2f}s")
+
+        # Main simulation loop
+        while True:
+            cycle_start = time.monotonic()
+            for index in fleet.simulate_events(change_rate):
+                fleet.publish_status(index)
+                limiter.wait()
+
+            elapsed = time.monotonic() - started
+            print(f"Fleet {fleet_id}: {fleet.published} published "
+                  f"({fleet.published / elapsed:.0f}/s), {fleet.led_commands} LED commands")
+            time.sleep(max(0.0, update_interval - (time.monotonic() - cycle_start)))
+
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fleet.disconnect()
+
+
+def run_simulation(num_lots=1, spots_per_lot=1000, processes=1, update_interval=5,
+                   change_rate=0.1, max_rate=0, first_lot=1, binary=False):
+    """
+    Run the sensor fleet simulation, split by lot across processes
+
+    Args:
+        num_lots: Number of parking lots (LOT001, LOT002, ...)
+        spots_per_lot: Number of spots per lot
+        processes: Number of fleet processes (each with one MQTT connection)
+        update_interval: Seconds between simulation cycles
+        change_rate: Share of spots changing state per cycle
+        max_rate: Maximum publishes per second across all processes (0 = unlimited)
+        first_lot: Number of the first lot
+        binary: Publish status in the compact binary layout instead of JSON
+    """
+    lot_ids = [f"LOT{i:03d}" for i in range(first_lot, first_lot + num_lots)]
+    processes = max(1, min(processes, len(lot_ids)))
+    per_process_rate = max_rate / processes if max_rate else 0
+
+    print("Starting ParkMate Sensor Fleet Emulator")
+    print(f"Simulating {num_lots} lots x {spots_per_lot} spots = {num_lots * spots_per_lot} sensors")
+    print(f"Processes: {processes} | Update interval: {update_interval}s | Change rate: {change_rate:.0%}")
+    print(f"Connecting to MQTT broker at {MQTT_BROKER}:{MQTT_PORT}")
+    print("-" * 60)
+
+    if processes == 1:
+        run_fleet(lot_ids, spots_per_lot, update_interval, change_rate, per_process_rate, binary=binary)
+        return
+
+    workers = []
+    for index in range(processes):
+        worker = multiprocessing.Process(
+            target=run_fleet,
+            args=(lot_ids[index::processes], spots_per_lot, update_interval,
+                  change_rate, per_process_rate, f"fleet{index}", binary)
+        )
+        worker.start()
+        workers.append(worker)
+
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        print("\n\nStopping fleet simulation...")
+        for worker in workers:
+            worker.join()
+        print("All fleets disconnected. Goodbye!")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='ParkMate IoT Sensor Fleet Emulator')
+    parser.add_argument('--lots', type=int, default=1, help='Number of parking lots (default: 1)')
+    parser.add_argument('--spots', type=int, default=1000, help='Spots per lot (default: 1000)')
+    parser.add_argument('--processes', type=int, default=1, help='Fleet processes, split by lot (default: 1)')
+    parser.add_argument('--interval', type=float, default=5, help='Update interval in seconds (default: 5)')
+    parser.add_argument('--change-rate', type=float, default=0.1,
+                        help='Share of spots changing state per cycle (default: 0.1)')
+    parser.add_argument('--max-rate', type=float, default=0,
+                        help='Maximum publishes per second, 0 = unlimited (default: 0)')
+    parser.add_argument('--first-lot', type=int, default=1, help='Number of the first lot (default: 1)')
+    parser.add_argument('--binary', action='store_true',
+                        help='Publish status as 14-byte binary payloads instead of JSON')
+
+    args = parser.parse_args()
+
+    run_simulation(
+        num_lots=args.lots,
+        spots_per_lot=args.spots,
+        processes=args.processes,
+        update_interval=args.interval,
+        change_rate=args.change_rate,
+        max_rate=args.max_rate,
+        first_lot=args.first_lot,
+        binary=args.binary
+    )
@@ -13,7 +13,8 @@ import sys
 # MQTT Configuration
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
-TOPIC_LED_COMMAND = "parkmate/led/command"
+TOPIC_LED_COMMAND = "parkmate/led/command"  # legacy flat topic
+TOPIC_LED_SPOT = "parkmate/{lot_id}/led/{spot_id}"
 TOPIC_RELAY_COMMAND = "parkmate/relay/command"
 
 # Color codes for terminal output
@@ -29,13 +30,16 @@ class Colors:
     BOLD = '\033[1m'
 
 class LEDActuator:
-    def __init__(self, actuator_id):
+    def __init__(self, actuator_id, lot_id='+', legacy_led_topic=False, client=None):
         self.actuator_id = actuator_id
+        # Wildcard subscription: every spot of one lot (or of all lots with '+')
+        self.led_topic = TOPIC_LED_SPOT.format(lot_id=lot_id, spot_id='+')
+        self.legacy_led_topic = legacy_led_topic
         self.led_states = {}  # spot_id -> color
         self.relay_states = {}  # relay_id -> state (on/off)
 
         # MQTT Client
-        self.client = mqtt.Client(client_id=f"led_actuator_{actuator_id}")
+        self.client = client or mqtt.Client(client_id=f"led_actuator_{actuator_id}")
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
 
@@ -46,9 +50,12 @@ class LEDActuator:
         print(f"{Colors.GREEN}✓ Connected to MQTT Broker (RC: {rc}){Colors.RESET}")
 
         # Subscribe to LED and Relay command topics
-        self.client.subscribe(TOPIC_LED_COMMAND)
+        self.client.subscribe(self.led_topic)
         self.client.subscribe(TOPIC_RELAY_COMMAND)
-        print(f"{Colors.GREEN}✓ Subscribed to: {TOPIC_LED_COMMAND}{Colors.RESET}")
+        print(f"{Colors.GREEN}✓ Subscribed to: {self.led_topic}{Colors.RESET}")
+        if self.legacy_led_topic:
+            self.client.subscribe(TOPIC_LED_COMMAND)
+            print(f"{Colors.GREEN}✓ Subscribed to: {TOPIC_LED_COMMAND}{Colors.RESET}")
         print(f"{Colors.GREEN}✓ Subscribed to: {TOPIC_RELAY_COMMAND}{Colors.RESET}")
         print(f"{Colors.YELLOW}{'─' * 50}{Colors.RESET}")
         print(f"{Colors.WHITE}Waiting for commands...{Colors.RESET}\n")
@@ -57,10 +64,10 @@ class LEDActuator:
         try:
             payload = json.loads(msg.payload.decode())
 
-            if msg.topic == TOPIC_LED_COMMAND:
-                self.handle_led_command(payload)
-            elif msg.topic == TOPIC_RELAY_COMMAND:
+            if msg.topic == TOPIC_RELAY_COMMAND:
                 self.handle_relay_command(payload)
+            elif msg.topic == TOPIC_LED_COMMAND or '/led/' in msg.topic:
+                self.handle_led_command(payload)
 
         except Exception as e:
             print(f"{Colors.RED}✗ Error processing message: {e}{Colors.RESET}")
@@ -163,9 +170,17 @@ class LEDActuator:
             print(f"{Colors.YELLOW}Make sure Mosquitto is running!{Colors.RESET}")
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='ParkMate LED/Relay Actuator Emulator')
+    parser.add_argument('--lot', type=str, default='+', help='Parking lot ID to follow (default: all lots)')
+    parser.add_argument('--legacy-led-topic', action='store_true',
+                        help='Also listen for LED commands on the flat parkmate/led/command topic')
+    args = parser.parse_args()
+
     print(f"\n{Colors.BOLD}Starting LED/Relay Actuator Emulator...{Colors.RESET}\n")
 
-    actuator = LEDActuator("001")
+    actuator = LEDActuator("001", lot_id=args.lot, legacy_led_topic=args.legacy_led_topic)
 
     try:
         actuator.run()
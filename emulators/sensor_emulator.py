@@ -6,36 +6,49 @@ import paho.mqtt.client as mqtt
 import json
 import time
 import random
+import os
+import sys
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parkmate.codec import encode_spot_status
+
 # MQTT Configuration
 MQTT_BROKER = "localhost"
 MQTT_PORT = 1883
 TOPIC_SPOT_STATUS = "parkmate/spot/status"
-TOPIC_LED_COMMAND = "parkmate/led/command"
+TOPIC_LED_COMMAND = "parkmate/led/command"  # legacy flat topic (all spots)
+TOPIC_LED_SPOT = "parkmate/{lot_id}/led/{spot_id}"
 
 class ParkingSensorEmulator:
-    def __init__(self, spot_id, lot_id):
+    def __init__(self, spot_id, lot_id, legacy_led_topic=False, binary=False, client=None):
         self.spot_id = spot_id
         self.lot_id = lot_id
         self.occupied = False
         self.distance = 200  # cm - empty spot distance
         self.led_color = "green"
+        self.legacy_led_topic = legacy_led_topic
+        self.binary = binary
+        self.led_topic = TOPIC_LED_SPOT.format(lot_id=lot_id, spot_id=spot_id)
 
         # MQTT Client
-        self.client = mqtt.Client(client_id=f"sensor_{spot_id}")
+        self.client = client or mqtt.Client(client_id=f"sensor_{spot_id}")
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
 
     def on_connect(self, client, userdata, flags, rc):
         print(f"Sensor {self.spot_id} connected to MQTT broker with code {rc}")
-        # Subscribe to LED commands for this spot
-        self.client.subscribe(TOPIC_LED_COMMAND)
+        # Subscribe to LED commands for this spot only
+        self.client.subscribe(self.led_topic)
+        if self.legacy_led_topic:
+            self.client.subscribe(TOPIC_LED_COMMAND)
 
     def on_message(self, client, userdata, msg):
         try:
-            if msg.topic == TOPIC_LED_COMMAND:
+            if msg.topic in (self.led_topic, TOPIC_LED_COMMAND):
                 payload = json.loads(msg.payload.decode())
+                # The legacy topic carries commands for every spot
                 if payload.get('spot_id') == self.spot_id:
                     self.led_color = payload.get('color', 'green')
                     print(f"Sensor {self.spot_id}: LED -> {self.led_color.upper()}")
@@ -64,17 +77,23 @@ class ParkingSensorEmulator:
             return True  # Status changed
         return False  # No change
 
+    def binary_status(self):
+        """Pack the status in the binary layout (None if the ids are not LOTnnn/SPOTnnn)"""
+        return encode_spot_status(self.lot_id, self.spot_id, self.occupied, self.distance, time.time())
+
     def publish_status(self):
         """Publish spot status to MQTT broker"""
-        payload = {
-            'spot_id': self.spot_id,
-            'lot_id': self.lot_id,
-            'occupied': self.occupied,
-            'distance': self.distance,
-            'timestamp': datetime.now().isoformat()
-        }
-
-        self.client.publish(TOPIC_SPOT_STATUS, json.dumps(payload))
+        payload = self.binary_status() if self.binary else None
+        if payload is None:
+            payload = json.dumps({
+                'spot_id': self.spot_id,
+                'lot_id': self.lot_id,
+                'occupied': self.occupied,
+                'distance': self.distance,
+                'timestamp': datetime.now().isoformat()
+            })
+
+        self.client.publish(TOPIC_SPOT_STATUS, payload)
         status = "OCCUPIED" if self.occupied else "AVAILABLE"
         print(f"Sensor {self.spot_id}: {status} (distance: {self.distance}cm)")
 
@@ -101,7 +120,7 @@ class ParkingSensorEmulator:
         self.client.disconnect()
 
 
-def run_simulation(num_spots=20, lot_id="LOT001", update_interval=5):
+def run_simulation(num_spots=20, lot_id="LOT001", update_interval=5, legacy_led_topic=False, binary=False):
     """
     Run the parking sensor simulation
 
@@ -109,6 +128,8 @@ def run_simulation(num_spots=20, lot_id="LOT001", update_interval=5):
         num_spots: Number of parking spots to simulate
         lot_id: Parking lot identifier
         update_interval: Seconds between sensor updates
+        legacy_led_topic: Also listen on the flat parkmate/led/command topic
+        binary: Publish status in the compact binary layout instead of JSON
     """
     print(f"Starting ParkMate Sensor Emulator")
     print(f"Simulating {num_spots} parking spots in {lot_id}")
@@ -120,7 +141,7 @@ def run_simulation(num_spots=20, lot_id="LOT001", update_interval=5):
     sensors = []
     for i in range(1, num_spots + 1):
         spot_id = f"SPOT{i:03d}"
-        sensor = ParkingSensorEmulator(spot_id, lot_id)
+        sensor = ParkingSensorEmulator(spot_id, lot_id, legacy_led_topic, binary)
 
         if sensor.connect():
             sensors.append(sensor)
@@ -164,11 +185,17 @@ if __name__ == "__main__":
     parser.add_argument('--spots', type=int, default=20, help='Number of parking spots (default: 20)')
     parser.add_argument('--lot', type=str, default='LOT001', help='Parking lot ID (default: LOT001)')
     parser.add_argument('--interval', type=int, default=5, help='Update interval in seconds (default: 5)')
+    parser.add_argument('--legacy-led-topic', action='store_true',
+                        help='Also listen for LED commands on the flat parkmate/led/command topic')
+    parser.add_argument('--binary', action='store_true',
+                        help='Publish status as 14-byte binary payloads instead of JSON')
 
     args = parser.parse_args()
 
     run_simulation(
         num_spots=args.spots,
         lot_id=args.lot,
-        update_interval=args.interval
+        update_interval=args.interval,
+        legacy_led_topic=args.legacy_led_topic,
+        binary=args.binary
     )
@@ -0,0 +1,4 @@
+"""
+ParkMate backend components
+Building blocks used by app.py (state engines, buffering, transports)
+"""
@@ -0,0 +1,176 @@
+"""
+Alert Lifecycle
+Turns the alerts DHT sensors repeat on every reading while a condition
+lasts into one incident per (lot_id, sensor_id, alert_type):
+
+    open     - first alert; stored and emitted
+    ongoing  - repeated alerts only count occurrences (emitted again every
+               renotify_interval seconds)
+    resolved - the reading is back past the alert threshold by the rule's
+               band (hysteresis), or nothing was heard for stale_after seconds
+
+Incidents are kept in memory and written to the alerts collection (one
+document per incident, keyed by incident_id) in a batch per flush.
+"""
+import threading
+import time
+import uuid
+from datetime import datetime
+
+
+class AlertTracker:
+    def __init__(self, store, rules=None, renotify_interval=900, stale_after=300, owns=None,
+                 collection='alerts'):
+        """
+        Args:
+            rules: alert_type -> {'field', 'above' or 'below', 'band'}; types without
+                   a rule resolve only when stale
+            owns: Optional callable(lot_id) -> bool; only owned lots are seeded
+        """
+        self.store = store
+        self.rules = rules or {}
+        self.renotify_interval = renotify_interval
+        self.stale_after = stale_after
+        self.owns = owns
+        self.collection = collection
+        self.incidents = {}   # (lot_id, sensor_id, alert_type) -> open incident document
+        self.seen = {}        # same key -> monotonic time of the last alert or reading
+        self.notified = {}    # same key -> monotonic time of the last emit
+        self.dirty = {}       # incident_id -> document to write
+        self.lock = threading.Lock()
+
+        self.alerts = 0
+        self.suppressed = 0
+
+    def seed(self):
+        """Load incidents left open by a previous run (their clocks restart now)"""
+        now = time.monotonic()
+        incidents = {}
+        for incident in self.store.find_records(self.collection, 'state', ['open', 'ongoing']):
+            if self.owns and not self.owns(incident.get('lot_id')):
+                continue
+            incidents[(incident.get('lot_id'), incident.get('sensor_id'), incident.get('alert_type'))] = incident
+        with self.lock:
+            self.incidents = incidents
+            self.seen = {key: now for key in incidents}
+            self.notified = {key: now for key in incidents}
+
+    def report(self, lot_id, sensor_id, alert, now=None):
+        """
+        Record an alert sent by a sensor
+
+        Returns:
+            The incident (a copy) if clients should be notified, else None
+        """
+        now = time.monotonic() if now is None else now
+        key = (lot_id, sensor_id, alert.get('type'))
+        timestamp = datetime.now()
+        with self.lock:
+            self.alerts += 1
+            self.seen[key] = now
+            incident = self.incidents.get(key)
+            if incident is None:
+                incident = self.incidents[key] = {
+                    'incident_id': uuid.uuid4().hex,
+                    'lot_id': lot_id,
+                    'sensor_id': sensor_id,
+                    'alert_type': alert.get('type'),
+                    'state': 'open',
+                    'severity': alert.get('severity'),
+                    'message': alert.get('message'),
+                    'recommendation': alert.get('recommendation'),
+                    'occurrences': 1,
+                    'timestamp': timestamp,
+                    'last_seen': timestamp,
+                    'resolved_at': None
+                }
+                self.notified[key] = now
+                self.dirty[incident['incident_id']] = incident
+                return dict(incident)
+
+            incident['state'] = 'ongoing'
+            incident['occurrences'] += 1
+            incident['last_seen'] = timestamp
+            incident['message'] = alert.get('message', incident['message'])
+            self.dirty[incident['incident_id']] = incident
+            if now - self.notified[key] >= self.renotify_interval:
+                self.notified[key] = now
+                return dict(incident)
+            self.suppressed += 1
+            return None
+
+    def observe(self, lot_id, sensor_id, reading, now=None):
+        """
+        Check a sensor reading against the open incidents of that sensor
+
+        Returns:
+            List of incidents (copies) the reading resolved
+        """
+        now = time.monotonic() if now is None else now
+        resolved = []
+        with self.lock:
+            for key, incident in list(self.incidents.items()):
+                if key[0] != lot_id or key[1] != sensor_id:
+                    continue
+                rule = self.rules.get(key[2])
+                value = reading.get(rule['field']) if rule else None
+                if not isinstance(value, (int, float)):
+                    continue
+                self.seen[key] = now
+                if 'above' in rule:
+                    cleared = value < rule['above'] - rule.get('band', 0)
+                else:
+                    cleared = value > rule['below'] + rule.get('band', 0)
+                if cleared:
+                    resolved.append(self._resolve(key))
+        return resolved
+
+    def expire(self, now=None):
+        """
+        Resolve incidents nothing was heard about for stale_after seconds
+
+        Returns:
+            List of resolved incidents (copies)
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            stale = [key for key in self.incidents if now - self.seen.get(key, now) >= self.stale_after]
+            return [self._resolve(key) for key in stale]
+
+    def _resolve(self, key):
+        incident = self.incidents.pop(key)
+        self.seen.pop(key, None)
+        self.notified.pop(key, None)
+        incident['state'] = 'resolved'
+        incident['resolved_at'] = datetime.now()
+        self.dirty[incident['incident_id']] = incident
+        return dict(incident)
+
+    def flush(self):
+        """Write changed incidents in one batch"""
+        with self.lock:
+            if not self.dirty:
+                return
+            incidents = [dict(incident) for incident in self.dirty.values()]
+            self.dirty = {}
+        try:
+            self.store.upsert_records(self.collection, 'incident_id', incidents)
+        except Exception as e:
+            print(f"Error writing alert incidents: {e}")
+            with self.lock:
+                # Keep newer versions written meanwhile
+                for incident in incidents:
+                    self.dirty.setdefault(incident['incident_id'], incident)
+
+    def open_incidents(self, lot_id=None):
+        with self.lock:
+            return [dict(incident) for key, incident in self.incidents.items() if not lot_id or key[0] == lot_id]
+
+    def stats(self):
+        with self.lock:
+            return {
+                'alerts': self.alerts,
+                'suppressed': self.suppressed,
+                'open': len(self.incidents),
+                'pending_writes': len(self.dirty)
+            }
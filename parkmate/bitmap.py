@@ -0,0 +1,77 @@
+"""
+Lot Occupancy Bitmap
+One bit per spot (set = occupied), indexed by spot ordinal, so a 10,000-spot
+lot fits in 1.25 KB and can be shipped as-is to dashboards and signage
+
+Bit order: ordinal i is bit (i % 8) of byte (i // 8), least significant bit first.
+"""
+
+# Number of set bits of every byte value
+POPCOUNT = bytes(bin(value).count('1') for value in range(256))
+
+
+class LotBitmap:
+    """Occupancy of one lot; not thread-safe (LotStateEngine holds the lock)"""
+
+    def __init__(self, spot_ids=()):
+        self.ordinals = {}    # spot_id -> ordinal
+        self.spot_ids = []    # ordinal -> spot_id
+        self.bits = bytearray()
+        self.occupied = 0     # kept in step with the bits on every set()
+        for spot_id in spot_ids:
+            self.add(spot_id)
+
+    def __len__(self):
+        return len(self.spot_ids)
+
+    def add(self, spot_id):
+        """Give a spot the next ordinal (no-op for known spots); returns its ordinal"""
+        ordinal = self.ordinals.get(spot_id)
+        if ordinal is None:
+            ordinal = len(self.spot_ids)
+            self.ordinals[spot_id] = ordinal
+            self.spot_ids.append(spot_id)
+            if ordinal >> 3 >= len(self.bits):
+                self.bits.append(0)
+        return ordinal
+
+    def get(self, spot_id):
+        """Occupancy of a spot (None if the spot is unknown)"""
+        ordinal = self.ordinals.get(spot_id)
+        if ordinal is None:
+            return None
+        return bool(self.bits[ordinal >> 3] >> (ordinal & 7) & 1)
+
+    def set(self, spot_id, occupied):
+        """Set the occupancy of a spot (adding unknown spots); returns the previous value or None"""
+        previous = self.get(spot_id)
+        ordinal = self.add(spot_id)
+        mask = 1 << (ordinal & 7)
+        if occupied:
+            self.bits[ordinal >> 3] |= mask
+        else:
+            self.bits[ordinal >> 3] &= ~mask & 0xFF
+        self.occupied += int(bool(occupied)) - int(bool(previous))
+        return previous
+
+    def popcount(self):
+        """Count occupied spots from the bits themselves"""
+        return sum(self.bits.translate(POPCOUNT))
+
+    def first_free(self, limit):
+        """spot_ids of the first free spots in ordinal order"""
+        free = []
+        total = len(self.spot_ids)
+        for index, byte in enumerate(self.bits):
+            if byte == 0xFF:
+                continue
+            for bit in range(8):
+                ordinal = (index << 3) + bit
+                if ordinal >= total or len(free) >= limit:
+                    return free
+                if not byte >> bit & 1:
+                    free.append(self.spot_ids[ordinal])
+        return free
+
+    def to_bytes(self):
+        return bytes(self.bits)
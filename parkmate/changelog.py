@@ -0,0 +1,108 @@
+"""
+Spot Change Log
+Numbers every spot mutation with a per-lot, monotonically increasing change
+sequence and remembers which spot each recent number changed, so clients can
+fetch only the spots changed since the last sequence they saw
+
+Writers stamp the sequence on the spot document (change()), so processes
+that do not write spots can answer the same queries from the store.
+"""
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+
+LOT_LOCKS = 64   # changes of lots sharing a lock are serialized
+
+
+class SpotChangeLog:
+    def __init__(self, max_changes=1000):
+        """
+        Args:
+            max_changes: Changes remembered per lot; clients further behind get a full snapshot
+        """
+        self.max_changes = max_changes
+        # Sequences restart with the process and on reset(), so they are only
+        # comparable within one epoch
+        self.instance = f"{int(time.time() * 1000):x}"
+        self.generation = 0
+        self.seqs = {}      # lot_id -> last change sequence
+        self.floors = {}    # lot_id -> sequence the lot was seeded with (older changes unknown)
+        self.changes = {}   # lot_id -> deque of (seq, spot_id), oldest first
+        self.lock = threading.Lock()
+        self.lot_locks = [threading.Lock() for _ in range(LOT_LOCKS)]
+
+    def epoch(self):
+        return f"{self.instance}-{self.generation}"
+
+    def record(self, lot_id, spot_id):
+        """Number a spot change; returns its sequence"""
+        with self.lock:
+            seq = self.seqs.get(lot_id, 0) + 1
+            self.seqs[lot_id] = seq
+            changes = self.changes.get(lot_id)
+            if changes is None:
+                changes = self.changes[lot_id] = deque(maxlen=self.max_changes)
+            changes.append((seq, spot_id))
+            return seq
+
+    @contextmanager
+    def change(self, lot_id, spot_id):
+        """
+        Number a spot change written in the with-block
+
+        Yields the sequence to store with the spot; it is recorded when the
+        block exits without an exception. Changes of a lot are serialized,
+        so current() never reaches a sequence whose write has not finished.
+        """
+        with self.lot_locks[zlib.crc32(str(lot_id).encode()) % LOT_LOCKS]:
+            with self.lock:
+                seq = self.seqs.get(lot_id, 0) + 1
+            yield seq
+            self.record(lot_id, spot_id)
+
+    def current(self, lot_id):
+        """Sequence of the latest change of a lot (0 if none)"""
+        with self.lock:
+            return self.seqs.get(lot_id, 0)
+
+    def since(self, lot_id, seq):
+        """
+        Spots of a lot changed after a sequence
+
+        Returns:
+            List of spot_ids, or None when the changes are no longer known
+            (the caller must send a full snapshot)
+        """
+        with self.lock:
+            current = self.seqs.get(lot_id, 0)
+            if seq > current or seq < self.floors.get(lot_id, 0):
+                return None
+            changes = self.changes.get(lot_id, ())
+            if changes and seq < changes[0][0] - 1:
+                return None
+
+            changed = []
+            seen = set()
+            for change_seq, spot_id in reversed(changes):
+                if change_seq <= seq:
+                    break
+                if spot_id not in seen:
+                    seen.add(spot_id)
+                    changed.append(spot_id)
+            return changed
+
+    def reset(self, seqs=None):
+        """
+        Forget all changes and start a new epoch (at startup, or after all spots were replaced)
+
+        Args:
+            seqs: lot_id -> latest change_seq stored on its spots; sequences
+                  continue from there so stored ones stay comparable
+        """
+        with self.lock:
+            self.generation += 1
+            self.seqs = dict(seqs or {})
+            self.floors = dict(self.seqs)
+            self.changes = {}
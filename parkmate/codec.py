@@ -0,0 +1,96 @@
+"""
+Binary Spot Status Codec
+Fixed-layout alternative to the JSON spot status payload for sensors on
+metered or cellular links (14 bytes instead of ~130).
+
+Binary and JSON devices share parkmate/spot/status: a binary payload starts
+with BINARY_MAGIC, a byte no JSON document can start with. Payloads on other
+topics are never treated as binary.
+
+Layout (big-endian):
+    B  magic (0xB5)
+    H  lot number          LOT007  -> 7
+    H  spot number         SPOT012 -> 12
+    B  flags               bit 0 = occupied
+    H  distance            cm
+    I  timestamp           epoch seconds
+    H  timestamp           milliseconds
+"""
+import re
+import struct
+from datetime import datetime
+
+SPOT_STATUS_TOPIC = "parkmate/spot/status"
+
+BINARY_MAGIC = 0xB5
+SPOT_STATUS = struct.Struct('>BHHBHIH')
+FLAG_OCCUPIED = 0x01
+
+LOT_PREFIX = 'LOT'
+SPOT_PREFIX = 'SPOT'
+NUMBERED_ID = re.compile(r'^([A-Z]+)(\d+)$')
+
+
+def is_binary(topic, payload):
+    """Whether a raw message is a binary spot status"""
+    return topic == SPOT_STATUS_TOPIC and payload[:1] == b'\xb5'
+
+
+def id_number(identifier, prefix):
+    """Number of an identifier like LOT007, or None if it cannot round-trip through the binary format"""
+    match = NUMBERED_ID.match(identifier or '')
+    if not match or match.group(1) != prefix:
+        return None
+    number = int(match.group(2))
+    if number > 0xFFFF or format_id(prefix, number) != identifier:
+        return None
+    return number
+
+
+def format_id(prefix, number):
+    return f"{prefix}{number:03d}"
+
+
+def encode_spot_status(lot_id, spot_id, occupied, distance, timestamp):
+    """
+    Pack a spot status (timestamp in epoch seconds)
+
+    Returns:
+        Payload bytes, or None if the ids are not LOTnnn/SPOTnnn (send JSON instead)
+    """
+    lot_number = id_number(lot_id, LOT_PREFIX)
+    spot_number = id_number(spot_id, SPOT_PREFIX)
+    if lot_number is None or spot_number is None:
+        return None
+    seconds = int(timestamp)
+    return SPOT_STATUS.pack(
+        BINARY_MAGIC, lot_number, spot_number,
+        FLAG_OCCUPIED if occupied else 0,
+        max(0, min(int(distance), 0xFFFF)),
+        seconds, int((timestamp - seconds) * 1000)
+    )
+
+
+def decode_spot_status(payload):
+    """
+    Unpack a binary spot status into the same dict a JSON payload gives
+    (timestamp as a local ISO 8601 string, like the JSON sensors send)
+    """
+    if len(payload) != SPOT_STATUS.size:
+        raise ValueError(f"binary spot status must be {SPOT_STATUS.size} bytes, got {len(payload)}")
+    _, lot_number, spot_number, flags, distance, seconds, millis = SPOT_STATUS.unpack(payload)
+    return {
+        'spot_id': format_id(SPOT_PREFIX, spot_number),
+        'lot_id': format_id(LOT_PREFIX, lot_number),
+        'occupied': bool(flags & FLAG_OCCUPIED),
+        'distance': distance,
+        'timestamp': datetime.fromtimestamp(seconds + millis / 1000).isoformat(timespec='milliseconds')
+    }
+
+
+def binary_lot_key(payload):
+    """lot_id of a binary payload as bytes (ingest partition key) without a full decode; None if truncated"""
+    if len(payload) != SPOT_STATUS.size:
+        return None
+    lot_number, = struct.unpack_from('>H', payload, 1)
+    return format_id(LOT_PREFIX, lot_number).encode()
@@ -0,0 +1,154 @@
+"""
+MongoDB Index Bootstrap
+Creates the index set the API queries rely on, reports missing/unused indexes
+and checks that the hot history queries run as index scans without an
+in-memory sort
+"""
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+# collection -> indexes required by app.py queries
+REQUIRED_INDEXES = {
+    'parking_spots': [
+        # {spot_id, lot_id} lookups/updates and find({'lot_id': ...}) (prefix)
+        {'name': 'lot_spot_unique', 'keys': [('lot_id', ASCENDING), ('spot_id', ASCENDING)], 'unique': True},
+        # Button presses and /api/spots/<spot_id> look spots up by spot_id alone
+        {'name': 'spot_id', 'keys': [('spot_id', ASCENDING)]},
+        # /api/lots/<lot_id>/changes on processes that do not write spots
+        {'name': 'lot_change_seq', 'keys': [('lot_id', ASCENDING), ('change_seq', ASCENDING)]},
+    ],
+    'parking_history': [
+        {'name': 'lot_timestamp', 'keys': [('lot_id', ASCENDING), ('timestamp', DESCENDING)]},
+    ],
+    'environment_data': [
+        {'name': 'lot_timestamp', 'keys': [('lot_id', ASCENDING), ('timestamp', DESCENDING)]},
+    ],
+    'alerts': [
+        {'name': 'lot_timestamp', 'keys': [('lot_id', ASCENDING), ('timestamp', DESCENDING)]},
+        # One document per incident, updated by incident_id
+        {'name': 'incident_id', 'keys': [('incident_id', ASCENDING)]},
+        # Open incidents reloaded at startup, grouped by lot (no standalone index on low-cardinality state)
+        {'name': 'state_lot', 'keys': [('state', ASCENDING), ('lot_id', ASCENDING)]},
+    ],
+    'button_events': [
+        {'name': 'timestamp', 'keys': [('timestamp', DESCENDING)]},
+    ],
+    'environment_rollups': [
+        {'name': 'rollup_bucket_unique', 'unique': True, 'keys': [
+            ('lot_id', ASCENDING), ('resolution', ASCENDING), ('bucket_start', ASCENDING), ('sensor_id', ASCENDING)
+        ]},
+    ],
+    'occupancy_rollups': [
+        {'name': 'rollup_bucket_unique', 'unique': True, 'keys': [
+            ('lot_id', ASCENDING), ('resolution', ASCENDING), ('bucket_start', ASCENDING)
+        ]},
+    ],
+    'parking_lots': [
+        {'name': 'lot_id_unique', 'keys': [('lot_id', ASCENDING)], 'unique': True},
+    ],
+}
+
+# Route queries (lot_id filter, newest first) that must be served by an index
+# scan in timestamp order: (route, collection, limit)
+HOT_QUERIES = [
+    ('/api/stats history', 'parking_history', 100),
+    ('/api/environment history', 'environment_data', 20),
+    ('/api/alerts', 'alerts', 10),
+]
+
+
+def ensure_indexes(db):
+    """
+    Create every required index (no-op for existing ones)
+
+    Returns:
+        List of {collection, index, error} for indexes that could not be built
+    """
+    errors = []
+    for collection, indexes in REQUIRED_INDEXES.items():
+        for index in indexes:
+            try:
+                db[collection].create_index(
+                    index['keys'],
+                    name=index['name'],
+                    unique=index.get('unique', False),
+                    background=True
+                )
+            except OperationFailure as e:
+                # e.g. duplicate (lot_id, spot_id) pairs block the unique index
+                errors.append({'collection': collection, 'index': index['name'], 'error': str(e)})
+    return errors
+
+
+def index_report(db):
+    """Report missing, unused and unexpected indexes per collection"""
+    report = {}
+    for collection, required in REQUIRED_INDEXES.items():
+        existing = db[collection].index_information()
+        existing_keys = {tuple(info['key']): name for name, info in existing.items()}
+        required_keys = {tuple(index['keys']) for index in required}
+
+        try:
+            usage = {stat['name']: stat['accesses']['ops']
+                     for stat in db[collection].aggregate([{'$indexStats': {}}])}
+        except OperationFailure:
+            usage = {}
+
+        report[collection] = {
+            'missing': [index['name'] for index in required
+                        if tuple(index['keys']) not in existing_keys],
+            'unused': sorted(name for name, ops in usage.items()
+                             if ops == 0 and name != '_id_'),
+            'unexpected': sorted(name for keys, name in existing_keys.items()
+                                 if keys not in required_keys and name != '_id_'),
+            'usage': usage
+        }
+    return report
+
+
+def plan_stages(plan):
+    """Flatten the stage names of an explain() plan tree"""
+    stages = [plan.get('stage')]
+    if 'inputStage' in plan:
+        stages += plan_stages(plan['inputStage'])
+    for child in plan.get('inputStages', []):
+        stages += plan_stages(child)
+    return stages
+
+
+def verify_query_plans(db, lot_id):
+    """
+    Explain the hot route queries for a lot
+
+    A query passes when its winning plan is driven by an IXSCAN and has no
+    blocking SORT stage (documents are still FETCHed since full rows are returned)
+    """
+    results = []
+    for route, collection, limit in HOT_QUERIES:
+        explain = (db[collection].find({'lot_id': lot_id}, {'_id': 0})
+                   .sort('timestamp', DESCENDING).limit(limit).explain())
+        stages = plan_stages(explain['queryPlanner']['winningPlan'])
+        results.append({
+            'route': route,
+            'collection': collection,
+            'stages': stages,
+            'ok': 'IXSCAN' in stages and 'SORT' not in stages and 'COLLSCAN' not in stages
+        })
+    return results
+
+
+if __name__ == '__main__':
+    # python -m parkmate.indexes [lot_id]
+    import json
+    import sys
+
+    from pymongo import MongoClient
+    from config import MONGODB_HOST, MONGODB_PORT, MONGODB_DATABASE
+
+    database = MongoClient(MONGODB_HOST, MONGODB_PORT)[MONGODB_DATABASE]
+    print("Ensuring indexes...")
+    for error in ensure_indexes(database):
+        print(f"  ✗ {error['collection']}.{error['index']}: {error['error']}")
+    print(json.dumps(index_report(database), indent=2))
+    lot = sys.argv[1] if len(sys.argv) > 1 else 'LOT001'
+    print(json.dumps(verify_query_plans(database, lot), indent=2))
@@ -0,0 +1,242 @@
+"""
+Ingest Queue
+Decouples MQTT receive from handler execution: the paho callback only
+enqueues the raw message and a pool of workers runs the handlers.
+
+Messages are partitioned by lot_id (falling back to spot_id, then topic) so
+every message of a lot is handled by the same worker, in arrival order.
+
+IngestPartition splits the same keys across several ingest processes: each
+receives every message and keeps only those of the lots it owns.
+"""
+import hashlib
+import queue
+import re
+import threading
+import time
+import zlib
+
+from parkmate.codec import binary_lot_key, is_binary
+
+DROP_POLICIES = ('block', 'drop_newest', 'drop_oldest')
+
+# Cheap key extraction on the raw payload - full JSON parsing happens in the worker
+LOT_ID_PATTERN = re.compile(rb'"lot_id"\s*:\s*"([^"]*)"')
+SPOT_ID_PATTERN = re.compile(rb'"spot_id"\s*:\s*"([^"]*)"')
+
+
+def partition_key(topic, payload):
+    """Get the partitioning key of a raw MQTT message"""
+    if is_binary(topic, payload):
+        # Malformed binary payloads fall through to the topic key and fail in the worker
+        return binary_lot_key(payload) or topic.encode()
+    for pattern in (LOT_ID_PATTERN, SPOT_ID_PATTERN):
+        match = pattern.search(payload)
+        if match:
+            return match.group(1)
+    return topic.encode()
+
+
+class IngestPartition:
+    """Which messages (and lots) one of several ingest processes owns"""
+
+    def __init__(self, index=0, count=1, key_func=partition_key):
+        if not 0 <= index < count:
+            raise ValueError(f"ingest partition {index} out of range for {count} processes")
+        self.index = index
+        self.count = count
+        self.key_func = key_func
+
+    def owner(self, key):
+        # md5 rather than crc32: crc32 % count would correlate with the
+        # crc32 % workers the IngestQueue uses within the process
+        if self.count == 1:
+            return 0
+        return int.from_bytes(hashlib.md5(key).digest()[:4], 'big') % self.count
+
+    def accepts(self, topic, payload):
+        """Whether this process handles a raw message"""
+        return self.count == 1 or self.owner(self.key_func(topic, payload)) == self.index
+
+    def owns(self, lot_id):
+        """Whether this process owns a lot's in-memory state"""
+        return self.count == 1 or self.owner(str(lot_id).encode()) == self.index
+
+
+class IngestQueue:
+    def __init__(self, handler, workers=4, maxsize=10000, policy='block', block_timeout=5.0,
+                 key_func=partition_key):
+        """
+        Args:
+            handler: Callable(topic, payload) run by the workers
+            workers: Number of worker threads (one bounded queue each)
+            maxsize: Capacity of each worker queue
+            policy: What to do when a queue is full:
+                    'block'       - wait up to block_timeout (backpressure on the MQTT loop)
+                    'drop_newest' - discard the incoming message
+                    'drop_oldest' - discard the oldest queued message
+            block_timeout: Seconds to wait under the 'block' policy before dropping
+            key_func: Callable(topic, payload) returning the partition key
+        """
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {policy}")
+
+        self.handler = handler
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.key_func = key_func
+        self.queues = [queue.Queue(maxsize=maxsize) for _ in range(max(1, workers))]
+        self.threads = []
+        self.stopped = False
+        self.lock = threading.Lock()
+        self.paused = False
+        self.busy = 0          # handlers running now
+        self.idle = threading.Condition()
+
+        # Counters (per worker)
+        self.enqueued = [0] * len(self.queues)
+        self.processed = [0] * len(self.queues)
+        self.dropped = [0] * len(self.queues)
+        self.errors = [0] * len(self.queues)
+        self.high_watermark = [0] * len(self.queues)
+
+    def start(self):
+        """Start the worker threads"""
+        self.stopped = False
+        for index in range(len(self.queues)):
+            thread = threading.Thread(target=self._worker, args=(index,),
+                                      name=f"ingest-worker-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, timeout=5.0):
+        """
+        Stop taking messages and let the workers drain their queues for up
+        to timeout seconds in total (workers still busy then are abandoned)
+        """
+        self.stopped = True
+        self.resume()
+        deadline = time.monotonic() + timeout
+        for work_queue in self.queues:
+            try:
+                work_queue.put(None, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                pass
+        for thread in self.threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self.threads = []
+
+    def pause(self, timeout=30.0):
+        """
+        Hold the workers before their next message (messages keep queuing)
+        and wait up to timeout seconds for running handlers to finish
+
+        Returns:
+            True if no handler is running any more
+        """
+        with self.idle:
+            self.paused = True
+            return self.idle.wait_for(lambda: self.busy == 0, timeout)
+
+    def resume(self):
+        """Let paused workers continue"""
+        with self.idle:
+            self.paused = False
+            self.idle.notify_all()
+
+    def partition(self, topic, payload):
+        """Get the worker index responsible for a message"""
+        return zlib.crc32(self.key_func(topic, payload)) % len(self.queues)
+
+    def submit(self, topic, payload):
+        """
+        Enqueue a raw message for processing
+
+        Returns:
+            True if the message was queued, False if it was dropped
+        """
+        index = self.partition(topic, payload)
+        if self.stopped:
+            self._count(self.dropped, index)
+            return False
+        work_queue = self.queues[index]
+        item = (topic, payload)
+
+        try:
+            if self.policy == 'block':
+                work_queue.put(item, timeout=self.block_timeout)
+            else:
+                work_queue.put_nowait(item)
+        except queue.Full:
+            if self.policy != 'drop_oldest':
+                self._count(self.dropped, index)
+                return False
+            try:
+                work_queue.get_nowait()
+                work_queue.task_done()
+                self._count(self.dropped, index)
+            except queue.Empty:
+                pass
+            try:
+                work_queue.put_nowait(item)
+            except queue.Full:
+                self._count(self.dropped, index)
+                return False
+
+        with self.lock:
+            self.enqueued[index] += 1
+            self.high_watermark[index] = max(self.high_watermark[index], work_queue.qsize())
+        return True
+
+    def depth(self):
+        """Number of messages waiting across all workers"""
+        return sum(work_queue.qsize() for work_queue in self.queues)
+
+    def stats(self):
+        """Queue depth and throughput counters"""
+        with self.lock:
+            workers = [{
+                'depth': work_queue.qsize(),
+                'high_watermark': self.high_watermark[index],
+                'enqueued': self.enqueued[index],
+                'processed': self.processed[index],
+                'dropped': self.dropped[index],
+                'errors': self.errors[index]
+            } for index, work_queue in enumerate(self.queues)]
+
+        return {
+            'policy': self.policy,
+            'capacity': self.queues[0].maxsize * len(self.queues),
+            'depth': sum(worker['depth'] for worker in workers),
+            'enqueued': sum(worker['enqueued'] for worker in workers),
+            'processed': sum(worker['processed'] for worker in workers),
+            'dropped': sum(worker['dropped'] for worker in workers),
+            'errors': sum(worker['errors'] for worker in workers),
+            'workers': workers
+        }
+
+    def _count(self, counter, index):
+        with self.lock:
+            counter[index] += 1
+
+    def _worker(self, index):
+        work_queue = self.queues[index]
+        while True:
+            item = work_queue.get()
+            if item is None:
+                work_queue.task_done()
+                return
+            with self.idle:
+                self.idle.wait_for(lambda: not self.paused)
+                self.busy += 1
+            try:
+                self.handler(*item)
+                self._count(self.processed, index)
+            except Exception as e:
+                self._count(self.errors, index)
+                print(f"Error processing MQTT message on {item[0]}: {e}")
+            finally:
+                with self.idle:
+                    self.busy -= 1
+                    self.idle.notify_all()
+                work_queue.task_done()
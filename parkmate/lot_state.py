@@ -0,0 +1,193 @@
+"""
+Lot State Engine
+Keeps per-lot total/occupied counters in memory so spot updates no longer
+re-count the parking_spots collection on every MQTT message.
+Each lot is a LotBitmap (one bit per spot).
+"""
+import base64
+import threading
+from datetime import datetime
+
+from parkmate.bitmap import LotBitmap
+
+
+class LotStateEngine:
+    def __init__(self, store, on_change=None, owns=None, flush_fields=None):
+        """
+        Args:
+            store: Repository the counters are seeded from (spots) and flushed to (lots)
+            on_change: Optional callable(lot_id, occupied, total, arrival) run after
+                       every transition (and once per lot after seeding)
+            owns: Optional callable(lot_id) -> bool; only owned lots are seeded
+                  (and so flushed) when several ingest processes split the lots
+            flush_fields: Optional callable(lot_id) -> dict of fields written
+                          with the counters (read after the counters)
+        """
+        self.store = store
+        self.on_change = on_change
+        self.owns = owns
+        self.flush_fields = flush_fields
+        self.lots = {}       # lot_id -> LotBitmap
+        self.dirty = set()   # lots whose parking_lots document is stale
+        self.lock = threading.Lock()
+
+    def seed(self):
+        """
+        Load the spot states of the owned lots from the store (at startup
+        and after all spots were replaced)
+
+        Returns:
+            Set of lot_ids whose occupancy differs from before
+        """
+        spots = {}
+        for spot in self.store.list_spots():
+            if self.owns and not self.owns(spot.get('lot_id')):
+                continue
+            spots.setdefault(spot.get('lot_id'), {})[spot.get('spot_id')] = bool(spot.get('occupied'))
+
+        lots = {lot_id: build_bitmap(lot_spots) for lot_id, lot_spots in spots.items()}
+
+        with self.lock:
+            previous = self.lots
+            self.lots = lots
+            self.dirty = set(lots)
+        changed = {lot_id for lot_id in set(lots) | set(previous)
+                   if lot_id not in lots or lot_id not in previous
+                   or lots[lot_id].spot_ids != previous[lot_id].spot_ids
+                   or lots[lot_id].bits != previous[lot_id].bits}
+
+        if self.on_change:
+            for lot_id, bitmap in lots.items():
+                self.on_change(lot_id, bitmap.popcount(), len(bitmap), False)
+        return changed
+
+    def load(self, lot_id):
+        """
+        Load one lot from the store (processes that do not own the lot, on
+        demand; forget() it when it changes)
+
+        Returns:
+            False if the lot has no spots
+        """
+        spots = {spot.get('spot_id'): bool(spot.get('occupied')) for spot in self.store.list_spots(lot_id)}
+        if not spots:
+            return False
+        bitmap = build_bitmap(spots)
+        with self.lock:
+            self.lots[lot_id] = bitmap
+        return True
+
+    def forget(self, lot_ids):
+        """Drop lots loaded with load() (they changed in the store)"""
+        with self.lock:
+            for lot_id in lot_ids:
+                self.lots.pop(lot_id, None)
+                self.dirty.discard(lot_id)
+
+    def knows(self, lot_id):
+        with self.lock:
+            return lot_id in self.lots
+
+    def set_spot(self, lot_id, spot_id, occupied):
+        """
+        Record the state of a spot
+
+        Returns:
+            True if this was a real transition (new spot or status change)
+        """
+        occupied = bool(occupied)
+        with self.lock:
+            bitmap = self.lots.get(lot_id)
+            if bitmap is None:
+                bitmap = self.lots[lot_id] = LotBitmap()
+            if bitmap.get(spot_id) == occupied:
+                return False
+
+            bitmap.set(spot_id, occupied)
+            self.dirty.add(lot_id)
+
+            # Called under the lock so listeners see transitions in order
+            if self.on_change:
+                self.on_change(lot_id, bitmap.occupied, len(bitmap), occupied)
+            return True
+
+    def is_occupied(self, lot_id, spot_id):
+        """Occupancy of a spot (None if the spot is unknown)"""
+        with self.lock:
+            bitmap = self.lots.get(lot_id)
+            return bitmap.get(spot_id) if bitmap is not None else None
+
+    def counts(self, lot_id):
+        """Get total/occupied/available counters for a lot"""
+        with self.lock:
+            bitmap = self.lots.get(lot_id)
+            total = len(bitmap) if bitmap else 0
+            occupied = bitmap.occupied if bitmap else 0
+        return {
+            'total_spots': total,
+            'occupied_spots': occupied,
+            'available_spots': total - occupied
+        }
+
+    def overlay(self, lot):
+        """Replace the (possibly stale) stored counters of a lot document with live ones"""
+        if lot and lot.get('lot_id') in self.lots:
+            lot.update(self.counts(lot['lot_id']))
+        return lot
+
+    def first_free(self, lot_id, limit):
+        """spot_ids of the first free spots of a lot (in spot ordinal order)"""
+        with self.lock:
+            bitmap = self.lots.get(lot_id)
+            return bitmap.first_free(limit) if bitmap else []
+
+    def snapshot(self, lot_id, include_spot_ids=False):
+        """
+        Packed occupancy of a lot (None if unknown)
+
+        Returns:
+            Counters plus 'bitmap' (base64, bit i = spot ordinal i, LSB first)
+            and, if requested, 'spot_ids' in ordinal order
+        """
+        with self.lock:
+            bitmap = self.lots.get(lot_id)
+            if bitmap is None:
+                return None
+            snapshot = {
+                'lot_id': lot_id,
+                'total_spots': len(bitmap),
+                'occupied_spots': bitmap.occupied,
+                'available_spots': len(bitmap) - bitmap.occupied,
+                'encoding': 'base64',
+                'bit_order': 'lsb0',
+                'bitmap': base64.b64encode(bitmap.to_bytes()).decode()
+            }
+            if include_spot_ids:
+                snapshot['spot_ids'] = list(bitmap.spot_ids)
+            return snapshot
+
+    def flush(self):
+        """Write counters of changed lots to their parking_lots documents"""
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+
+        for lot_id in dirty:
+            counters = self.counts(lot_id)
+            counters['last_update'] = datetime.now()
+            if self.flush_fields:
+                counters.update(self.flush_fields(lot_id))
+            try:
+                self.store.update_lot(lot_id, counters, upsert=True)
+            except Exception as e:
+                print(f"Error flushing lot state for {lot_id}: {e}")
+                with self.lock:
+                    self.dirty.add(lot_id)
+
+
+def build_bitmap(spots):
+    """LotBitmap of spot_id -> occupied; ordinals follow spot_id order so they are stable across restarts"""
+    bitmap = LotBitmap(sorted(spots))
+    for spot_id, occupied in spots.items():
+        if occupied:
+            bitmap.set(spot_id, True)
+    return bitmap
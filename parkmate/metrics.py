@@ -0,0 +1,170 @@
+"""
+Metrics
+Counters, histograms and gauges rendered in the Prometheus text exposition
+format for the /metrics endpoint (no client library required)
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+# Seconds; suits handlers and database round trips from sub-millisecond to seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def format_help(text):
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}   # label values -> count
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError(f"{self.name} is a counter and can only increase")
+        key = tuple(labels.get(label, '') for label in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{format_labels(self.labels, key)} {format_value(value)}"
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}   # label values -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(label, '') for label in self.labels)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self.lock:
+            values = {key: list(series) for key, series in self.values.items()}
+        for key, series in sorted(values.items()):
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-2] + [series[-1]]):
+                labels = format_labels(self.labels, key, [('le', format_value(float(bound)))])
+                yield f"{self.name}_bucket{labels} {count}"
+            yield f"{self.name}_sum{format_labels(self.labels, key)} {format_value(series[-2])}"
+            yield f"{self.name}_count{format_labels(self.labels, key)} {series[-1]}"
+
+
+class Gauge:
+    """Value read from a callable at scrape time"""
+    type = 'gauge'
+
+    def __init__(self, name, help_text, read):
+        self.name = name
+        self.help = help_text
+        self.read = read
+
+    def samples(self):
+        yield f"{self.name} {format_value(self.read())}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, read):
+        return self._register(Gauge(name, help_text, read))
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text format"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {format_help(metric.help)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            try:
+                lines.extend(metric.samples())
+            except Exception as e:
+                lines.append(f"# error reading {metric.name}: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command by collection and operation (pass in MongoClient event_listeners)"""
+
+    def __init__(self, histogram, failures):
+        self.histogram = histogram
+        self.failures = failures
+        self.collections = {}   # request_id -> collection name
+        self.lock = threading.Lock()
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        with self.lock:
+            self.collections[event.request_id] = collection if isinstance(collection, str) else ''
+
+    def succeeded(self, event):
+        self._observe(event)
+
+    def failed(self, event):
+        collection = self._observe(event)
+        self.failures.inc(collection=collection, op=event.command_name)
+
+    def _observe(self, event):
+        with self.lock:
+            collection = self.collections.pop(event.request_id, '')
+        self.histogram.observe(event.duration_micros / 1e6, collection=collection, op=event.command_name)
+        return collection
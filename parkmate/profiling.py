@@ -0,0 +1,207 @@
+"""
+Profiling
+On-demand sampling profiler and slow operation log for a running backend
+
+The sampler reads the stack of every thread (ingest workers included) at a
+fixed interval, so it can be started and stopped without restarting the
+process; the slow log times the stages of each MQTT handler and REST
+request and keeps the ones above a threshold.
+"""
+import linecache
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# Leaf frames in these modules mean the thread is blocked, not working
+# (poll.py/epolls.py: the eventlet hub waiting for I/O)
+IDLE_MODULES = ('threading.py', 'queue.py', 'selectors.py', 'socket.py', 'ssl.py', 'poll.py', 'epolls.py')
+
+# (module, function) leaf frames that only sleep: socketio.sleep() ends in
+# engineio's Server.sleep (server.py) calling time.sleep under threading,
+# eventlet's sleep and hub waits switch away to the hub
+IDLE_FUNCTIONS = {('server.py', 'sleep'), ('greenthread.py', 'sleep'), ('hub.py', 'switch'), ('hub.py', 'wait')}
+
+
+def os_threading():
+    """threading with real OS threads, even when eventlet has monkey patched it"""
+    try:
+        from eventlet import patcher
+    except ImportError:
+        return threading
+    return patcher.original('threading') if patcher.is_monkey_patched('thread') else threading
+
+
+def is_idle(frame):
+    """Whether a thread's leaf frame is blocked or sleeping rather than working"""
+    code = frame.f_code
+    module = os.path.basename(code.co_filename)
+    if module in IDLE_MODULES or (module, code.co_name) in IDLE_FUNCTIONS:
+        return True
+    # time.sleep() has no Python frame of its own, so its caller is the leaf
+    return 'time.sleep(' in linecache.getline(code.co_filename, frame.f_lineno)
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval=0.005, max_seconds=60):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        # The sampler must be an OS thread: a green thread would only ever
+        # see its own stack, while an OS thread sees whichever green thread
+        # the event loop is running
+        self.threading = os_threading()
+        self.thread = None
+        self.stopping = self.threading.Event()
+        self.lock = self.threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.started_at = None
+        self.duration = 0.0
+        self.samples = 0
+        self.self_counts = Counter()    # function -> samples where it was running
+        self.total_counts = Counter()   # function -> samples where it was on the stack
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, seconds):
+        """Sample for up to seconds (capped at max_seconds); raises RuntimeError if already running"""
+        with self.lock:
+            if self.running:
+                raise RuntimeError("profiler is already running")
+            self._reset()
+            self.stopping.clear()
+            self.started_at = datetime.now()
+            self.thread = self.threading.Thread(target=self._run, args=(min(seconds, self.max_seconds),),
+                                                name='parkmate-profiler', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Stop sampling early (no-op when not running)"""
+        self.stopping.set()
+        thread = self.thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self, seconds):
+        own_thread = self.threading.get_ident()
+        start = time.perf_counter()
+        while not self.stopping.wait(self.interval):
+            elapsed = time.perf_counter() - start
+            if elapsed >= seconds:
+                break
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_thread:
+                    self._sample(frame)
+            self.duration = elapsed
+        self.duration = time.perf_counter() - start
+
+    def _sample(self, frame):
+        if is_idle(frame):
+            return
+        labels = []
+        while frame is not None:
+            labels.append(frame_label(frame.f_code))
+            frame = frame.f_back
+        with self.lock:
+            self.samples += 1
+            self.self_counts[labels[0]] += 1
+            # Recursive functions count once per sample
+            self.total_counts.update(set(labels))
+
+    def report(self, limit=25):
+        """Top functions by samples where they were running (self) and on the stack (total)"""
+        with self.lock:
+            samples = self.samples
+            self_counts = self.self_counts.copy()
+            total_counts = self.total_counts.copy()
+
+        def percent(count):
+            return round(100.0 * count / samples, 1) if samples else 0.0
+
+        return {
+            'running': self.running,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'duration': round(self.duration, 2),
+            'interval_ms': self.interval * 1000,
+            'samples': samples,
+            'top_self': [{'function': name, 'samples': count, 'percent': percent(count)}
+                         for name, count in self_counts.most_common(limit)],
+            'top_total': [{'function': name, 'samples': count, 'percent': percent(count)}
+                          for name, count in total_counts.most_common(limit)]
+        }
+
+
+class SlowOperationLog:
+    """
+    Per-stage timings of MQTT handlers and REST requests
+
+    begin() starts a trace for the current thread, stage() adds the time of a
+    with-block to it (no-op outside a trace) and end() logs the trace if it
+    ran longer than its kind's threshold.
+    """
+
+    def __init__(self, thresholds, max_entries=100):
+        """
+        Args:
+            thresholds: Milliseconds per kind, e.g. {'mqtt': 50, 'http': 200}
+        """
+        self.thresholds = thresholds
+        self.entries = deque(maxlen=max_entries)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.slow_count = 0
+
+    def begin(self, kind, name):
+        self.local.trace = (kind, name, time.perf_counter(), {})
+
+    @contextmanager
+    def stage(self, stage_name):
+        trace = getattr(self.local, 'trace', None)
+        if trace is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stages = trace[3]
+            stages[stage_name] = stages.get(stage_name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def end(self):
+        trace = getattr(self.local, 'trace', None)
+        if trace is None:
+            return
+        self.local.trace = None
+        kind, name, start, stages = trace
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms < self.thresholds.get(kind, float('inf')):
+            return
+
+        breakdown = {stage_name: round(ms, 2) for stage_name, ms in stages.items()}
+        entry = {
+            'kind': kind,
+            'name': name,
+            'elapsed_ms': round(elapsed_ms, 2),
+            'stages_ms': breakdown,
+            'timestamp': datetime.now().isoformat()
+        }
+        with self.lock:
+            self.slow_count += 1
+            self.entries.append(entry)
+        details = ', '.join(f"{stage_name} {ms}" for stage_name, ms in breakdown.items())
+        print(f"Slow {kind} {name}: {elapsed_ms:.1f} ms" + (f" ({details})" if details else ""))
+
+    def recent(self):
+        """Slow operations, newest first"""
+        with self.lock:
+            return list(reversed(self.entries))
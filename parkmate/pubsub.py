@@ -0,0 +1,72 @@
+"""
+MQTT Socket.IO Message Queue
+Socket.IO client manager that relays emits between processes through the
+MQTT broker ParkMate already runs, so ingest processes and API workers on
+one box need no Redis (PARKMATE_MESSAGE_QUEUE=mqtt://localhost:1883)
+
+Messages are JSON, not pickle like the Redis/Kombu managers: devices share
+this broker and must not be able to make a backend unpickle their payloads.
+"""
+import json
+import queue
+import threading
+from urllib.parse import urlparse
+
+import paho.mqtt.client as mqtt
+import socketio
+
+TOPIC_PREFIX = "parkmate/socketio/"
+
+
+class MQTTPubSubManager(socketio.PubSubManager):
+    name = 'mqtt'
+
+    def __init__(self, url='mqtt://localhost:1883', channel='socketio', write_only=False, logger=None):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 1883
+        self.topic = TOPIC_PREFIX + channel
+        self.messages = queue.Queue()
+        self.listening = False
+        self.connected = False
+        self.connect_lock = threading.Lock()
+
+        self.client = mqtt.Client()
+        self.client.on_connect = self._on_connect
+        self.client.on_message = lambda client, userdata, msg: self.messages.put(msg.payload.decode())
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def initialize(self):
+        # Called by the server before its first client connects; processes
+        # without Socket.IO clients (ingest) only ever publish
+        super().initialize()
+        if not self.write_only:
+            self.listening = True
+            self._connect()
+            self.client.subscribe(self.topic, qos=1)
+
+    def _connect(self):
+        with self.connect_lock:
+            if self.connected:
+                return
+            self.client.connect(self.host, self.port, 60)
+            self.server.start_background_task(self.client.loop_forever)
+            self.connected = True
+
+    def _on_connect(self, client, userdata, flags, rc):
+        # Resubscribe after reconnects
+        if self.listening:
+            client.subscribe(self.topic, qos=1)
+
+    def _publish(self, data):
+        try:
+            self._connect()
+        except Exception as e:
+            print(f"Could not connect to the Socket.IO message queue: {e}")
+            return
+        self.client.publish(self.topic, json.dumps(data, default=str), qos=1)
+
+    def _listen(self):
+        # str (not bytes) so the base class decodes it as JSON and never unpickles
+        while True:
+            yield self.messages.get()
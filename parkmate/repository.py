@@ -0,0 +1,399 @@
+"""
+Storage Repositories
+Every read and write of app.py goes through a repository instead of raw
+pymongo collections, so handler costs can be measured without MongoDB and
+edge gateways can run from memory.
+
+    MongoRepository  - the MongoDB collections ParkMate has always used
+    MemoryRepository - indexed in-process collections (nothing persisted)
+
+Collections:
+    parking_spots, parking_lots      - current state (spot/lot documents)
+    parking_history, environment_data,
+    alerts, button_events            - records, read newest first (append-only,
+                                       except alert incidents upserted by incident_id)
+    environment_rollups,
+    occupancy_rollups                - time buckets (see rollups.py)
+"""
+import copy
+import os
+import threading
+from collections import deque
+
+from pymongo import UpdateOne
+
+from parkmate.indexes import ensure_indexes
+
+RECORD_COLLECTIONS = ('parking_history', 'environment_data', 'alerts', 'button_events')
+
+
+class MongoRepository:
+    """Repository backed by a MongoDB database"""
+
+    def __init__(self, db=None, connect=None):
+        """
+        Args:
+            db: pymongo Database to use
+            connect: Callable returning the Database instead; run on first use
+                     in each process, so importing opens no connection and
+                     forked workers never share their parent's connection pool
+        """
+        self.connect = connect
+        self._db = db
+        self.pid = os.getpid() if db is not None else None
+        self.lock = threading.Lock()
+
+    @property
+    def db(self):
+        if self.connect is not None and self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self._db = self.connect()
+                    self.pid = os.getpid()
+        return self._db
+
+    @property
+    def parking_spots(self):
+        return self.db['parking_spots']
+
+    @property
+    def parking_lots(self):
+        return self.db['parking_lots']
+
+    def ensure_indexes(self):
+        return ensure_indexes(self.db)
+
+    # Spots
+
+    def find_spot(self, spot_id, lot_id=None):
+        query = {'spot_id': spot_id}
+        if lot_id:
+            query['lot_id'] = lot_id
+        return self.parking_spots.find_one(query, {'_id': 0})
+
+    def list_spots(self, lot_id=None):
+        query = {'lot_id': lot_id} if lot_id else {}
+        return list(self.parking_spots.find(query, {'_id': 0}))
+
+    def find_spots(self, lot_id, spot_ids):
+        """Spots of a lot with the given spot_ids"""
+        query = {'lot_id': lot_id, 'spot_id': {'$in': list(spot_ids)}}
+        return list(self.parking_spots.find(query, {'_id': 0}))
+
+    def spots_changed_since(self, lot_id, seq):
+        """Spots of a lot whose change_seq is above seq"""
+        query = {'lot_id': lot_id, 'change_seq': {'$gt': seq}}
+        return list(self.parking_spots.find(query, {'_id': 0}))
+
+    def change_seqs(self):
+        """lot_id -> highest change_seq stored on the lot's spots"""
+        pipeline = [
+            {'$match': {'change_seq': {'$exists': True}}},
+            {'$group': {'_id': '$lot_id', 'seq': {'$max': '$change_seq'}}}
+        ]
+        return {group['_id']: group['seq'] for group in self.parking_spots.aggregate(pipeline)}
+
+    def upsert_spot(self, lot_id, spot_id, fields):
+        """Set fields on a spot, creating it if needed"""
+        self.parking_spots.update_one({'spot_id': spot_id, 'lot_id': lot_id}, {'$set': fields}, upsert=True)
+
+    def update_spot(self, spot_id, fields, lot_id=None):
+        """Set fields on an existing spot; returns True if the spot exists"""
+        query = {'spot_id': spot_id}
+        if lot_id:
+            query['lot_id'] = lot_id
+        return self.parking_spots.update_one(query, {'$set': fields}).matched_count > 0
+
+    def insert_spots(self, spots):
+        if spots:
+            self.parking_spots.insert_many([dict(spot) for spot in spots])
+
+    # Lots
+
+    def find_lot(self, lot_id):
+        return self.parking_lots.find_one({'lot_id': lot_id}, {'_id': 0})
+
+    def list_lots(self):
+        return list(self.parking_lots.find({}, {'_id': 0}))
+
+    def update_lot(self, lot_id, fields, upsert=False):
+        self.parking_lots.update_one({'lot_id': lot_id}, {'$set': fields}, upsert=upsert)
+
+    def insert_lot(self, lot):
+        self.parking_lots.insert_one(dict(lot))
+
+    def insert_lots(self, lots):
+        if lots:
+            self.parking_lots.insert_many([dict(lot) for lot in lots])
+
+    def clear_lots(self, drop_indexes=False):
+        """
+        Delete every lot and spot
+
+        Args:
+            drop_indexes: Drop the collections instead (instant for large ones, and
+                          bulk loads skip index maintenance); run ensure_indexes() after
+        """
+        if drop_indexes:
+            self.parking_spots.drop()
+            self.parking_lots.drop()
+            return
+        self.parking_spots.delete_many({})
+        self.parking_lots.delete_many({})
+
+    # Records
+
+    def insert_records(self, collection, records):
+        """Insert records (raises pymongo's BulkWriteError on partial failure)"""
+        self.db[collection].insert_many(records, ordered=False)
+
+    def recent_records(self, collection, lot_id=None, limit=20):
+        """Newest records first, optionally for one lot"""
+        query = {'lot_id': lot_id} if lot_id else {}
+        return list(self.db[collection].find(query, {'_id': 0}).sort('timestamp', -1).limit(limit))
+
+    def latest_record(self, collection, lot_id=None):
+        records = self.recent_records(collection, lot_id, limit=1)
+        return records[0] if records else None
+
+    def find_records(self, collection, field, values):
+        """Records whose field is one of values"""
+        return list(self.db[collection].find({field: {'$in': list(values)}}, {'_id': 0}))
+
+    def upsert_records(self, collection, key_field, records):
+        """Replace the fields of records identified by key_field, inserting new ones"""
+        requests = [UpdateOne({key_field: record[key_field]}, {'$set': record}, upsert=True) for record in records]
+        if requests:
+            self.db[collection].bulk_write(requests, ordered=False)
+
+    # Time buckets
+
+    def update_buckets(self, collection, updates):
+        """
+        Apply bucket changes as upserts
+
+        Args:
+            updates: List of (key dict, {'$inc'|'$min'|'$max'|'$set': {field: value}})
+        """
+        requests = [UpdateOne(key, ops, upsert=True) for key, ops in updates]
+        if requests:
+            self.db[collection].bulk_write(requests, ordered=False)
+
+    def find_buckets(self, collection, lot_id, resolution, start, end, sensor_id=None):
+        """Buckets of one resolution with start <= bucket_start < end, oldest first"""
+        query = {
+            'lot_id': lot_id,
+            'resolution': resolution,
+            'bucket_start': {'$gte': start, '$lt': end}
+        }
+        if sensor_id:
+            query['sensor_id'] = sensor_id
+        return list(self.db[collection].find(query, {'_id': 0}).sort('bucket_start', 1))
+
+
+def apply_update(document, ops):
+    """Apply $inc/$min/$max/$set (dotted field names allowed) to a dict in place"""
+    for op, fields in ops.items():
+        for path, value in fields.items():
+            target = document
+            *parents, field = path.split('.')
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            current = target.get(field)
+            if op == '$inc':
+                target[field] = (current or 0) + value
+            elif op == '$min':
+                target[field] = value if current is None else min(current, value)
+            elif op == '$max':
+                target[field] = value if current is None else max(current, value)
+            else:
+                target[field] = value
+
+
+class MemoryRepository:
+    """
+    Repository keeping every collection in process memory
+
+    Spots are indexed by (lot_id, spot_id), by lot and by spot_id; records are
+    kept per lot in arrival order (newest last), capped at max_records per lot
+    and collection; buckets are indexed by (lot_id, resolution).
+    Documents are copied in and out so callers cannot modify stored state.
+    """
+
+    db = None
+
+    def __init__(self, max_records=10000):
+        self.max_records = max_records
+        self.spots = {}           # (lot_id, spot_id) -> spot
+        self.spots_by_lot = {}    # lot_id -> {spot_id: spot}
+        self.spots_by_id = {}     # spot_id -> {lot_id: spot}
+        self.lots = {}            # lot_id -> lot
+        self.records = {name: {} for name in RECORD_COLLECTIONS}   # collection -> lot_id -> deque
+        self.all_records = {name: deque(maxlen=max_records) for name in RECORD_COLLECTIONS}
+        self.buckets = {}         # collection -> (lot_id, resolution) -> {(bucket_start, sensor_id): bucket}
+        self.lock = threading.Lock()
+
+    def ensure_indexes(self):
+        return []
+
+    # Spots
+
+    def find_spot(self, spot_id, lot_id=None):
+        with self.lock:
+            if lot_id:
+                spot = self.spots.get((lot_id, spot_id))
+            else:
+                spot = next(iter(self.spots_by_id.get(spot_id, {}).values()), None)
+            return dict(spot) if spot else None
+
+    def list_spots(self, lot_id=None):
+        with self.lock:
+            if lot_id:
+                return [dict(spot) for spot in self.spots_by_lot.get(lot_id, {}).values()]
+            return [dict(spot) for spot in self.spots.values()]
+
+    def find_spots(self, lot_id, spot_ids):
+        with self.lock:
+            lot_spots = self.spots_by_lot.get(lot_id, {})
+            return [dict(lot_spots[spot_id]) for spot_id in spot_ids if spot_id in lot_spots]
+
+    def spots_changed_since(self, lot_id, seq):
+        with self.lock:
+            return [dict(spot) for spot in self.spots_by_lot.get(lot_id, {}).values()
+                    if spot.get('change_seq', 0) > seq]
+
+    def change_seqs(self):
+        with self.lock:
+            seqs = {}
+            for (lot_id, _), spot in self.spots.items():
+                if 'change_seq' in spot:
+                    seqs[lot_id] = max(seqs.get(lot_id, 0), spot['change_seq'])
+            return seqs
+
+    def upsert_spot(self, lot_id, spot_id, fields):
+        with self.lock:
+            spot = self.spots.get((lot_id, spot_id))
+            if spot is None:
+                self._add_spot({'spot_id': spot_id, 'lot_id': lot_id, **fields})
+            else:
+                spot.update(fields)
+
+    def update_spot(self, spot_id, fields, lot_id=None):
+        with self.lock:
+            if lot_id:
+                spot = self.spots.get((lot_id, spot_id))
+            else:
+                spot = next(iter(self.spots_by_id.get(spot_id, {}).values()), None)
+            if spot is None:
+                return False
+            spot.update(fields)
+            return True
+
+    def insert_spots(self, spots):
+        with self.lock:
+            for spot in spots:
+                self._add_spot(dict(spot))
+
+    def _add_spot(self, spot):
+        lot_id, spot_id = spot.get('lot_id'), spot.get('spot_id')
+        self.spots[(lot_id, spot_id)] = spot
+        self.spots_by_lot.setdefault(lot_id, {})[spot_id] = spot
+        self.spots_by_id.setdefault(spot_id, {})[lot_id] = spot
+
+    # Lots
+
+    def find_lot(self, lot_id):
+        with self.lock:
+            lot = self.lots.get(lot_id)
+            return dict(lot) if lot else None
+
+    def list_lots(self):
+        with self.lock:
+            return [dict(lot) for lot in self.lots.values()]
+
+    def update_lot(self, lot_id, fields, upsert=False):
+        with self.lock:
+            lot = self.lots.get(lot_id)
+            if lot is not None:
+                lot.update(fields)
+            elif upsert:
+                self.lots[lot_id] = {'lot_id': lot_id, **fields}
+
+    def insert_lot(self, lot):
+        with self.lock:
+            self.lots[lot['lot_id']] = dict(lot)
+
+    def insert_lots(self, lots):
+        with self.lock:
+            for lot in lots:
+                self.lots[lot['lot_id']] = dict(lot)
+
+    def clear_lots(self, drop_indexes=False):
+        with self.lock:
+            self.spots, self.spots_by_lot, self.spots_by_id, self.lots = {}, {}, {}, {}
+
+    # Records
+
+    def insert_records(self, collection, records):
+        with self.lock:
+            by_lot = self.records[collection]
+            for record in records:
+                record = dict(record)
+                self.all_records[collection].append(record)
+                lot_records = by_lot.get(record.get('lot_id'))
+                if lot_records is None:
+                    lot_records = by_lot[record.get('lot_id')] = deque(maxlen=self.max_records)
+                lot_records.append(record)
+
+    def recent_records(self, collection, lot_id=None, limit=20):
+        with self.lock:
+            records = self.records[collection].get(lot_id, ()) if lot_id else self.all_records[collection]
+            newest = []
+            for record in reversed(records):
+                if len(newest) >= limit:
+                    break
+                newest.append(dict(record))
+            return newest
+
+    def latest_record(self, collection, lot_id=None):
+        records = self.recent_records(collection, lot_id, limit=1)
+        return records[0] if records else None
+
+    def find_records(self, collection, field, values):
+        with self.lock:
+            return [dict(record) for record in self.all_records[collection] if record.get(field) in values]
+
+    def upsert_records(self, collection, key_field, records):
+        new_records = []
+        with self.lock:
+            for record in records:
+                # Records are shared by the per-lot and all-records deques, so
+                # updating one in place updates both
+                lot_records = self.records[collection].get(record.get('lot_id'), ())
+                stored = next((stored for stored in reversed(lot_records)
+                               if stored.get(key_field) == record[key_field]), None)
+                if stored is None:
+                    new_records.append(record)
+                else:
+                    stored.update(record)
+        self.insert_records(collection, new_records)
+
+    # Time buckets
+
+    def update_buckets(self, collection, updates):
+        with self.lock:
+            index = self.buckets.setdefault(collection, {})
+            for key, ops in updates:
+                lot_buckets = index.setdefault((key['lot_id'], key['resolution']), {})
+                bucket_key = (key['bucket_start'], key.get('sensor_id'))
+                bucket = lot_buckets.get(bucket_key)
+                if bucket is None:
+                    bucket = lot_buckets[bucket_key] = dict(key)
+                apply_update(bucket, ops)
+
+    def find_buckets(self, collection, lot_id, resolution, start, end, sensor_id=None):
+        with self.lock:
+            lot_buckets = self.buckets.get(collection, {}).get((lot_id, resolution), {})
+            found = [copy.deepcopy(bucket) for (bucket_start, bucket_sensor), bucket in lot_buckets.items()
+                     if start <= bucket_start < end and (not sensor_id or bucket_sensor == sensor_id)]
+        return sorted(found, key=lambda bucket: bucket['bucket_start'])
@@ -0,0 +1,81 @@
+"""
+Conditional GET Support
+Per-lot version counters bumped on every spot/lot mutation drive the ETags of
+the lot and spot endpoints; serialized responses are cached per URL and
+reused until the version they were built from changes
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LotVersions:
+    """Monotonic change counters per lot"""
+
+    def __init__(self):
+        # Distinguishes ETags of this process from those of a previous run
+        self.instance = f"{int(time.time() * 1000):x}"
+        self.versions = {}   # lot_id -> counter
+        self.epoch = 0       # bumped when every lot changes at once (e.g. /api/init)
+        self.total = 0       # bumped on any change
+        self.lock = threading.Lock()
+
+    def bump(self, lot_id=None):
+        """Record a change to a lot (or to every lot when lot_id is None)"""
+        with self.lock:
+            if lot_id is None:
+                self.epoch += 1
+            else:
+                self.versions[lot_id] = self.versions.get(lot_id, 0) + 1
+            self.total += 1
+
+    def etag(self, lot_id=None):
+        """ETag value for one lot, or for all lots when lot_id is None"""
+        with self.lock:
+            counter = self.total if lot_id is None else self.versions.get(lot_id, 0)
+        return f"{self.instance}-{self.epoch}-{counter}"
+
+
+class ResponseCache:
+    """Serialized response bodies keyed by request, each valid for a single ETag"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()   # key -> (etag, body)
+        self.lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key, etag):
+        """Cached body built for this ETag, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == etag:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key, etag, body):
+        with self.lock:
+            self.entries[key] = (etag, body)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def record_not_modified(self):
+        with self.lock:
+            self.not_modified += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified
+            }
@@ -0,0 +1,347 @@
+"""
+Time-Series Rollups
+Pre-aggregates readings into 1-minute, 1-hour and 1-day buckets as they
+arrive, so charts over a day or a week read a few hundred bucket documents
+instead of every raw reading
+"""
+import threading
+from datetime import datetime, timedelta
+
+from pymongo.errors import BulkWriteError
+
+# Stored bucket sizes (seconds), finest first
+RESOLUTIONS = {'minute': 60, 'hour': 3600, 'day': 86400}
+RESOLUTION_NAMES = {seconds: name for name, seconds in RESOLUTIONS.items()}
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def bucket_start(timestamp, seconds):
+    """Start of the bucket of the given size containing a timestamp"""
+    offset = (timestamp - EPOCH).total_seconds() % seconds
+    return timestamp - timedelta(seconds=offset)
+
+
+def bucket_spans(since, until, seconds):
+    """Yield (bucket start, seconds covered) for each bucket of a size the interval [since, until) falls into"""
+    cursor = since
+    while cursor < until:
+        start = bucket_start(cursor, seconds)
+        end = min(start + timedelta(seconds=seconds), until)
+        yield start, (end - cursor).total_seconds()
+        cursor = end
+
+
+def parse_timestamp(value, name):
+    """
+    Parse an ISO 8601 query parameter into a naive local datetime
+
+    Readings are stamped with naive local time, so timestamps carrying an
+    offset ('Z', '+00:00', ...) are converted to local time and made naive.
+    """
+    try:
+        parsed = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith(('Z', 'z')) else value)
+    except ValueError:
+        raise ValueError(f"'{name}' must be an ISO 8601 timestamp, got {value!r}") from None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def parse_resolution(value):
+    """Parse a resolution parameter ('minute', 'hour', 'day' or seconds); None if not given"""
+    if value in (None, ''):
+        return None
+    if value in RESOLUTIONS:
+        return RESOLUTIONS[value]
+    try:
+        seconds = int(value)
+    except ValueError:
+        seconds = 0
+    if seconds <= 0:
+        raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)} or a positive number of seconds, "
+                         f"got {value!r}")
+    return seconds
+
+
+def choose_resolution(start, end, requested=None, max_points=500):
+    """
+    Pick the stored bucket size to read and the step of the returned series
+
+    With a requested step, read the coarsest stored bucket that fits into it;
+    otherwise use the finest stored bucket giving at most max_points points.
+
+    Returns:
+        (stored bucket seconds, series step seconds)
+    """
+    if requested:
+        fitting = [seconds for seconds in RESOLUTIONS.values()
+                   if seconds <= requested and requested % seconds == 0]
+        stored = max(fitting) if fitting else RESOLUTIONS['minute']
+        return stored, max(requested, stored)
+
+    span = max((end - start).total_seconds(), 1)
+    for seconds in RESOLUTIONS.values():
+        if span / seconds <= max_points:
+            return seconds, seconds
+    day = RESOLUTIONS['day']
+    step = day * -(-int(span) // (day * max_points))
+    return day, step
+
+
+class RollupBuffer:
+    """Merges bucket updates in memory and upserts them in one batch per flush"""
+
+    def __init__(self, store, collection):
+        self.store = store
+        self.collection = collection
+        self.pending = {}   # bucket key -> {'$inc': {}, '$min': {}, '$max': {}, '$set': {}}
+        self.lock = threading.Lock()
+
+    def update(self, key, inc=None, minimum=None, maximum=None, values=None):
+        """Queue changes for the bucket document identified by key (a dict)"""
+        with self.lock:
+            self._merge(tuple(key.items()), inc, minimum, maximum, values)
+
+    def _merge(self, key, inc=None, minimum=None, maximum=None, values=None, keep_values=False):
+        ops = self.pending.setdefault(key, {
+            '$inc': {}, '$min': {}, '$max': {}, '$set': {}
+        })
+        for field, value in (inc or {}).items():
+            ops['$inc'][field] = ops['$inc'].get(field, 0) + value
+        for field, value in (minimum or {}).items():
+            current = ops['$min'].get(field)
+            ops['$min'][field] = value if current is None else min(current, value)
+        for field, value in (maximum or {}).items():
+            current = ops['$max'].get(field)
+            ops['$max'][field] = value if current is None else max(current, value)
+        for field, value in (values or {}).items():
+            if keep_values:
+                ops['$set'].setdefault(field, value)
+            else:
+                ops['$set'][field] = value
+
+    def flush(self):
+        """Write all pending bucket changes"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+
+        pending_keys = list(pending)
+        updates = [
+            (dict(key), {op: fields for op, fields in pending[key].items() if fields})
+            for key in pending_keys
+        ]
+        try:
+            self.store.update_buckets(self.collection, updates)
+            return
+        except BulkWriteError as e:
+            failed = [pending_keys[error['index']] for error in e.details.get('writeErrors', [])]
+            print(f"Error writing {self.collection} rollups: {len(failed)} buckets failed")
+        except Exception as e:
+            failed = pending_keys
+            print(f"Error writing {self.collection} rollups: {e}")
+
+        # Merge the failed changes back for the next flush (keeping $set values queued meanwhile)
+        with self.lock:
+            for key in failed:
+                ops = pending[key]
+                self._merge(key, ops['$inc'], ops['$min'], ops['$max'], ops['$set'], keep_values=True)
+
+
+class EnvironmentRollup:
+    """Per-sensor min/max/avg buckets of temperature, humidity and heat index"""
+
+    METRICS = ('temperature', 'humidity', 'heat_index')
+
+    def __init__(self, store, collection):
+        self.store = store
+        self.collection = collection
+        self.buffer = RollupBuffer(store, collection)
+
+    def add(self, lot_id, sensor_id, reading, timestamp):
+        """Fold one reading into its minute, hour and day buckets"""
+        values = {metric: reading.get(metric) for metric in self.METRICS
+                  if isinstance(reading.get(metric), (int, float))}
+        if not values:
+            return
+
+        inc = {}
+        for metric, value in values.items():
+            inc[f"{metric}.sum"] = value
+            inc[f"{metric}.count"] = 1
+
+        for seconds in RESOLUTIONS.values():
+            self.buffer.update(
+                {
+                    'lot_id': lot_id,
+                    'resolution': seconds,
+                    'bucket_start': bucket_start(timestamp, seconds),
+                    'sensor_id': sensor_id
+                },
+                inc=inc,
+                minimum={f"{metric}.min": value for metric, value in values.items()},
+                maximum={f"{metric}.max": value for metric, value in values.items()}
+            )
+
+    def flush(self):
+        self.buffer.flush()
+
+    def query(self, lot_id, start, end, stored, step, sensor_id=None):
+        """
+        Read buckets of size stored in [start, end) and merge them into steps
+
+        Returns:
+            List of {timestamp, <metric>: {min, max, avg, count}} ordered by time
+        """
+        series = {}
+        buckets = self.store.find_buckets(self.collection, lot_id, stored,
+                                          bucket_start(start, stored), end, sensor_id)
+        for bucket in buckets:
+            point = series.setdefault(bucket_start(bucket['bucket_start'], step), {})
+            for metric in self.METRICS:
+                stats = bucket.get(metric)
+                if not stats:
+                    continue
+                merged = point.setdefault(metric, {'min': stats['min'], 'max': stats['max'],
+                                                   'sum': 0, 'count': 0})
+                merged['min'] = min(merged['min'], stats['min'])
+                merged['max'] = max(merged['max'], stats['max'])
+                merged['sum'] += stats['sum']
+                merged['count'] += stats['count']
+
+        points = []
+        for timestamp in sorted(series):
+            point = {'timestamp': timestamp}
+            for metric, merged in series[timestamp].items():
+                point[metric] = {
+                    'min': merged['min'],
+                    'max': merged['max'],
+                    'avg': round(merged['sum'] / merged['count'], 2),
+                    'count': merged['count']
+                }
+            points.append(point)
+        return points
+
+
+class OccupancyRollup:
+    """
+    Per-lot occupancy buckets maintained from spot transitions
+
+    Each bucket holds the occupied count at its end, the peak, the
+    time-weighted occupancy (occupied_seconds / covered_seconds) and the
+    turnover (number of arrivals).
+    """
+
+    def __init__(self, store, collection):
+        self.store = store
+        self.collection = collection
+        self.buffer = RollupBuffer(store, collection)
+        self.levels = {}    # lot_id -> [since, occupied, total]
+        self.changed = set()  # lots with a transition since the last tick
+        self.lock = threading.Lock()
+
+    def record(self, lot_id, occupied, total, arrival=False, timestamp=None):
+        """Record the occupancy of a lot after a transition (or at seeding)"""
+        now = timestamp or datetime.now()
+        with self.lock:
+            self._accumulate(lot_id, now)
+            self.levels[lot_id] = [now, occupied, total]
+            self.changed.add(lot_id)
+            for seconds in RESOLUTIONS.values():
+                self.buffer.update(
+                    self._key(lot_id, now, seconds),
+                    inc={'turnover': 1 if arrival else 0},
+                    maximum={'peak': occupied},
+                    values={'occupied': occupied, 'total': total}
+                )
+
+    def tick(self, now=None):
+        """
+        Carry the current level of lots that changed since the last tick up to now
+
+        Quiet lots are carried once per finest bucket (when a minute boundary
+        passed since they were last carried), so every closed bucket is stored
+        for processes that do not hold the levels (API workers); query() extends
+        the still open minute from the in-memory level.
+        """
+        now = now or datetime.now()
+        finest = min(RESOLUTIONS.values())
+        boundary = bucket_start(now, finest)
+        with self.lock:
+            due = [lot_id for lot_id, level in self.levels.items()
+                   if lot_id in self.changed or level[0] < boundary]
+            self.changed = set()
+            for lot_id in due:
+                self._accumulate(lot_id, now)
+                self.levels[lot_id][0] = now
+
+    def flush(self):
+        self.tick()
+        self.buffer.flush()
+
+    def query(self, lot_id, start, end, stored, step):
+        """
+        Read buckets of size stored in [start, end) and merge them into steps
+
+        Returns:
+            List of {timestamp, occupied, peak, avg, turnover, total} ordered by time
+        """
+        series = {}
+        buckets = list(self.store.find_buckets(self.collection, lot_id, stored, bucket_start(start, stored), end))
+        buckets.extend(self._open_buckets(lot_id, stored, start, end))
+        for bucket in sorted(buckets, key=lambda bucket: bucket['bucket_start']):
+            point = series.setdefault(bucket_start(bucket['bucket_start'], step), {
+                'peak': 0, 'turnover': 0, 'occupied_seconds': 0.0, 'covered_seconds': 0.0
+            })
+            point['occupied'] = bucket.get('occupied', 0)
+            point['total'] = bucket.get('total', 0)
+            point['peak'] = max(point['peak'], bucket.get('peak', 0))
+            point['turnover'] += bucket.get('turnover', 0)
+            point['occupied_seconds'] += bucket.get('occupied_seconds', 0.0)
+            point['covered_seconds'] += bucket.get('covered_seconds', 0.0)
+
+        points = []
+        for timestamp in sorted(series):
+            point = series[timestamp]
+            covered = point.pop('covered_seconds')
+            occupied_seconds = point.pop('occupied_seconds')
+            point['avg'] = round(occupied_seconds / covered, 2) if covered else point['occupied']
+            point['timestamp'] = timestamp
+            points.append(point)
+        return points
+
+    def _key(self, lot_id, timestamp, seconds):
+        return {'lot_id': lot_id, 'resolution': seconds, 'bucket_start': bucket_start(timestamp, seconds)}
+
+    def _open_buckets(self, lot_id, seconds, start, end):
+        """Buckets covering the time at the current level not carried by tick() yet"""
+        with self.lock:
+            level = self.levels.get(lot_id)
+            if not level:
+                return []
+            since, occupied, total = level
+        since = max(since, bucket_start(start, seconds))
+        return [
+            {
+                'bucket_start': bucket, 'occupied': occupied, 'total': total, 'peak': occupied,
+                'turnover': 0, 'occupied_seconds': occupied * covered, 'covered_seconds': covered
+            }
+            for bucket, covered in bucket_spans(since, min(datetime.now(), end), seconds)
+        ]
+
+    def _accumulate(self, lot_id, now):
+        """Add the time spent at the previous level to every bucket it covered"""
+        level = self.levels.get(lot_id)
+        if not level:
+            return
+        since, occupied, total = level
+        for seconds in RESOLUTIONS.values():
+            for start, covered in bucket_spans(since, now, seconds):
+                self.buffer.update(
+                    self._key(lot_id, start, seconds),
+                    inc={'occupied_seconds': occupied * covered, 'covered_seconds': covered},
+                    maximum={'peak': occupied},
+                    values={'occupied': occupied, 'total': total}
+                )
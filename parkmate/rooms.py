@@ -0,0 +1,50 @@
+"""
+Lot Rooms
+Socket.IO clients join a room per parking lot so server events are only
+delivered to the dashboards viewing that lot
+"""
+import threading
+
+
+def lot_room(lot_id):
+    """Get the Socket.IO room name of a parking lot"""
+    return f"lot:{lot_id}"
+
+
+class LotRoomRegistry:
+    def __init__(self):
+        self.lot_by_sid = {}   # Socket.IO session id -> lot_id
+        self.sids_by_lot = {}  # lot_id -> set of session ids
+        self.lock = threading.Lock()
+
+    def join(self, sid, lot_id):
+        """
+        Move a client to a lot
+
+        Returns:
+            The lot the client was previously subscribed to (or None)
+        """
+        with self.lock:
+            previous = self._remove(sid)
+            self.lot_by_sid[sid] = lot_id
+            self.sids_by_lot.setdefault(lot_id, set()).add(sid)
+            return previous
+
+    def leave(self, sid):
+        """Forget a client (disconnect); returns its lot (or None)"""
+        with self.lock:
+            return self._remove(sid)
+
+    def subscriber_counts(self):
+        """Number of clients per lot room"""
+        with self.lock:
+            return {lot_id: len(sids) for lot_id, sids in self.sids_by_lot.items()}
+
+    def _remove(self, sid):
+        lot_id = self.lot_by_sid.pop(sid, None)
+        if lot_id is not None:
+            sids = self.sids_by_lot.get(lot_id)
+            sids.discard(sid)
+            if not sids:
+                del self.sids_by_lot[lot_id]
+        return lot_id
@@ -0,0 +1,210 @@
+"""
+Bulk Seeding
+Generates N lots x M spots (optionally split into floors and zones, with
+prices, coordinates and an initial occupancy) and loads them in chunked
+bulk inserts, building indexes only after the load.
+
+Used by POST /api/admin/seed and from the command line:
+
+    python -m parkmate.seeding --lots 1000 --spots 1000 --floors 4 --zones 5
+"""
+import argparse
+import math
+import random
+import string
+import sys
+import time
+from datetime import datetime
+
+from config import EMPTY_DISTANCE, MAX_CAR_DISTANCE, MIN_CAR_DISTANCE, SEED_CHUNK_SIZE
+
+DEFAULT_CENTER = (40.7128, -74.0060)   # lat, lng lots are scattered around
+RESEED_TOPIC = "parkmate/control/reseed"   # app.TOPIC_RESEED
+
+
+def lot_documents(lots, spots_per_lot, floors=1, zones=1, price_range=(2.0, 2.0),
+                  center=DEFAULT_CENTER, radius_km=5.0, rng=None):
+    """Lot documents LOT001..LOTnnn (counters assume every spot is free)"""
+    rng = rng or random.Random()
+    now = datetime.now()
+    for number in range(1, lots + 1):
+        # Uniform over the disc around center (1 degree of latitude ~ 111 km)
+        distance = radius_km * math.sqrt(rng.random()) / 111.0
+        angle = rng.uniform(0, 2 * math.pi)
+        yield {
+            'lot_id': f"LOT{number:03d}",
+            'name': f"Parking Lot {number}",
+            'address': f"{number} Seed Street",
+            'total_spots': spots_per_lot,
+            'occupied_spots': 0,
+            'available_spots': spots_per_lot,
+            'price_per_hour': round(rng.uniform(*price_range), 2),
+            'floors': floors,
+            'zones': zones,
+            'location': {
+                'lat': round(center[0] + distance * math.sin(angle), 6),
+                'lng': round(center[1] + distance * math.cos(angle) / math.cos(math.radians(center[0])), 6)
+            },
+            'last_update': now
+        }
+
+
+def spot_documents(lot_id, spots_per_lot, floors=1, zones=1, occupancy=0.0, rng=None):
+    """Spot documents SPOT001..SPOTmmm of a lot, numbered floor by floor and zone by zone"""
+    rng = rng or random.Random()
+    now = datetime.now()
+    per_floor = math.ceil(spots_per_lot / floors)
+    per_zone = math.ceil(per_floor / zones)
+    for index in range(spots_per_lot):
+        occupied = rng.random() < occupancy
+        spot = {
+            'spot_id': f"SPOT{index + 1:03d}",
+            'lot_id': lot_id,
+            'occupied': occupied,
+            'distance': rng.randint(MIN_CAR_DISTANCE, MAX_CAR_DISTANCE) if occupied else EMPTY_DISTANCE,
+            'last_update': now
+        }
+        if floors > 1:
+            spot['floor'] = index // per_floor + 1
+        if zones > 1:
+            spot['zone'] = zone_name(index % per_floor // per_zone)
+        yield spot
+
+
+def zone_name(index):
+    """A, B, ..., Z, AA, AB, ..."""
+    name = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        name = string.ascii_uppercase[remainder] + name
+    return name
+
+
+def seed_store(store, lots, spots_per_lot, floors=1, zones=1, price_range=(2.0, 2.0),
+               center=DEFAULT_CENTER, radius_km=5.0, occupancy=0.0, chunk_size=SEED_CHUNK_SIZE, seed=None,
+               progress=None):
+    """
+    Replace every lot and spot with generated ones
+
+    Args:
+        progress: Optional callable(stage, done, total) run at each stage and
+                  after every inserted chunk (stages: clear, insert, index)
+
+    Returns:
+        Counts and seconds spent clearing, inserting and indexing
+    """
+    rng = random.Random(seed)
+    timings = {}
+    total_spots = lots * spots_per_lot
+    progress = progress or (lambda stage, done, total: None)
+
+    progress('clear', 0, total_spots)
+    start = time.perf_counter()
+    # Dropping the collections drops their indexes too, so the load does no index maintenance
+    store.clear_lots(drop_indexes=True)
+    timings['clear'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    lot_docs = list(lot_documents(lots, spots_per_lot, floors, zones, price_range, center, radius_km, rng))
+    occupied_total = 0
+    inserted = 0
+    progress('insert', inserted, total_spots)
+    chunk = []
+    for lot in lot_docs:
+        occupied = 0
+        for spot in spot_documents(lot['lot_id'], spots_per_lot, floors, zones, occupancy, rng):
+            occupied += spot['occupied']
+            chunk.append(spot)
+            if len(chunk) >= chunk_size:
+                store.insert_spots(chunk)
+                inserted += len(chunk)
+                progress('insert', inserted, total_spots)
+                chunk = []
+        lot['occupied_spots'] = occupied
+        lot['available_spots'] = spots_per_lot - occupied
+        occupied_total += occupied
+    store.insert_spots(chunk)
+    for offset in range(0, len(lot_docs), chunk_size):
+        store.insert_lots(lot_docs[offset:offset + chunk_size])
+    timings['insert'] = time.perf_counter() - start
+
+    progress('index', total_spots, total_spots)
+    start = time.perf_counter()
+    index_errors = store.ensure_indexes()
+    timings['index'] = time.perf_counter() - start
+
+    return {
+        'lots': lots,
+        'spots': total_spots,
+        'occupied_spots': occupied_total,
+        'index_errors': index_errors,
+        'seconds': {name: round(seconds, 2) for name, seconds in timings.items()}
+    }
+
+
+def main():
+    from pymongo import MongoClient
+    from config import MONGODB_HOST, MONGODB_PORT, MONGODB_DATABASE, MQTT_BROKER, MQTT_PORT
+    from parkmate.repository import MongoRepository
+
+    parser = argparse.ArgumentParser(description='ParkMate Bulk Seeding (replaces every lot and spot)')
+    parser.add_argument('--lots', type=int, default=100, help='Number of lots (default: 100)')
+    parser.add_argument('--spots', type=int, default=100, help='Spots per lot (default: 100)')
+    parser.add_argument('--floors', type=int, default=1, help='Floors per lot (default: 1)')
+    parser.add_argument('--zones', type=int, default=1, help='Zones per floor (default: 1)')
+    parser.add_argument('--price-min', type=float, default=2.0, help='Lowest hourly price (default: 2.0)')
+    parser.add_argument('--price-max', type=float, default=2.0, help='Highest hourly price (default: 2.0)')
+    parser.add_argument('--lat', type=float, default=DEFAULT_CENTER[0], help='Latitude lots are scattered around')
+    parser.add_argument('--lng', type=float, default=DEFAULT_CENTER[1], help='Longitude lots are scattered around')
+    parser.add_argument('--radius', type=float, default=5.0, help='Scatter radius in km (default: 5)')
+    parser.add_argument('--occupancy', type=float, default=0.0, help='Share of spots initially occupied (default: 0)')
+    parser.add_argument('--chunk-size', type=int, default=SEED_CHUNK_SIZE,
+                        help=f'Documents per insert_many (default: {SEED_CHUNK_SIZE})')
+    parser.add_argument('--seed', type=int, help='Random seed for a reproducible dataset')
+    parser.add_argument('--no-notify', action='store_true',
+                        help='Do not tell running ingest processes to pause and reload their lots over MQTT')
+    args = parser.parse_args()
+
+    notifier = None
+    if not args.no_notify:
+        import paho.mqtt.client as mqtt
+        try:
+            notifier = mqtt.Client()
+            notifier.connect(MQTT_BROKER, MQTT_PORT, 60)
+            notifier.loop_start()
+            notifier.publish(RESEED_TOPIC, '{"source": "seeding", "phase": "start"}', qos=1).wait_for_publish(5)
+            print("✓ Ingest processes told to pause")
+        except Exception as e:
+            notifier = None
+            print(f"Could not notify ingest processes (stop them while seeding, restart them after): {e}")
+
+    client = MongoClient(MONGODB_HOST, MONGODB_PORT)
+    store = MongoRepository(client[MONGODB_DATABASE])
+    print(f"Seeding {args.lots} lots x {args.spots} spots into {MONGODB_DATABASE}...")
+    try:
+        result = seed_store(
+            store, args.lots, args.spots,
+            floors=args.floors, zones=args.zones,
+            price_range=(args.price_min, args.price_max),
+            center=(args.lat, args.lng), radius_km=args.radius,
+            occupancy=args.occupancy, chunk_size=args.chunk_size, seed=args.seed
+        )
+    finally:
+        if notifier:
+            # Resume (and reload) the ingest processes even if seeding failed
+            notifier.publish(RESEED_TOPIC, '{"source": "seeding", "phase": "done"}', qos=1).wait_for_publish(5)
+            notifier.loop_stop()
+            notifier.disconnect()
+            print("✓ Ingest processes told to reload their lots")
+    seconds = result['seconds']
+    print(f"✓ {result['spots']} spots in {result['lots']} lots "
+          f"(clear {seconds['clear']}s, insert {seconds['insert']}s, index {seconds['index']}s)")
+    for index_error in result['index_errors']:
+        print(f"✗ Could not create index {index_error['collection']}.{index_error['index']}: {index_error['error']}")
+    if result['index_errors']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
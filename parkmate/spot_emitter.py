@@ -0,0 +1,76 @@
+"""
+Coalescing Spot Update Emitter
+Gathers spot changes per lot over a short window and emits them as a single
+'spot_updates' Socket.IO event, keeping only the latest state of each spot
+
+Updates carrying a change sequence ('seq') produce batches with 'seq' (the
+newest change included) and 'base_seq' (the 'seq' of the previous batch of the
+lot), so a client whose last seen sequence differs from base_seq knows it
+missed changes
+"""
+import threading
+
+
+class SpotUpdateCoalescer:
+    def __init__(self, emit, window=0.15, epoch=None):
+        """
+        Args:
+            emit: Callable(event, data, lot_id) used to send the batched event
+            window: Seconds to gather changes before emitting
+            epoch: Optional callable returning the epoch the sequences belong to
+        """
+        self.emit = emit
+        self.window = window
+        self.epoch = epoch
+        self.pending = {}   # lot_id -> {spot_id: update}
+        self.last_seq = {}  # lot_id -> 'seq' of the last emitted batch
+        self.last_epoch = None
+        self.lock = threading.Lock()
+
+        # Counters
+        self.updates_received = 0
+        self.updates_emitted = 0
+        self.batches_emitted = 0
+
+    def push(self, lot_id, update):
+        """Queue a spot update (replaces any pending update of the same spot)"""
+        with self.lock:
+            self.pending.setdefault(lot_id, {})[update['spot_id']] = update
+            self.updates_received += 1
+
+    def flush(self):
+        """Emit one 'spot_updates' event per lot with pending changes"""
+        epoch = self.epoch() if self.epoch else None
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            if epoch != self.last_epoch:
+                self.last_epoch = epoch
+                self.last_seq = {}
+
+        for lot_id, updates in pending.items():
+            batch = {
+                'lot_id': lot_id,
+                'updates': list(updates.values())
+            }
+            seqs = [update['seq'] for update in batch['updates'] if update.get('seq') is not None]
+            if seqs:
+                with self.lock:
+                    base_seq = self.last_seq.get(lot_id, 0)
+                    seq = max(max(seqs), base_seq)
+                    self.last_seq[lot_id] = seq
+                batch.update({'seq': seq, 'base_seq': base_seq, 'epoch': epoch})
+            self.emit('spot_updates', batch, lot_id)
+            with self.lock:
+                self.updates_emitted += len(updates)
+                self.batches_emitted += 1
+
+    def stats(self):
+        """Coalescing counters"""
+        with self.lock:
+            return {
+                'window_ms': int(self.window * 1000),
+                'pending': sum(len(updates) for updates in self.pending.values()),
+                'updates_received': self.updates_received,
+                'updates_emitted': self.updates_emitted,
+                'batches_emitted': self.batches_emitted
+            }
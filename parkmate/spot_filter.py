@@ -0,0 +1,160 @@
+"""
+Spot Signal Filter
+Turns raw ultrasonic distance readings into spot transitions, so repeated
+readings of an unchanged spot (distance jitter, periodic re-sends) cause no
+writes, LED commands or Socket.IO events.
+
+    hysteresis - an occupied spot frees only above threshold + hysteresis and
+                 a free spot fills only below threshold - hysteresis
+    dwell      - a new state must hold for dwell seconds before it is accepted;
+                 sensors that only publish on change are completed by due()
+                 (claims the transition) and settle() (accepts it, on the
+                 lot's ingest worker)
+    window     - occupancy is decided on the median of the last window distances
+                 (1 disables the median; keep it at 1 for change-only sensors)
+
+The accepted state of every spot is read from the caller (the lot state
+engine), so button presses and manual overrides are seen by the filter.
+"""
+import statistics
+import threading
+import time
+from collections import deque
+
+
+class SpotSignalFilter:
+    def __init__(self, threshold, hysteresis=0, dwell=0.0, window=1, current=None):
+        """
+        Args:
+            threshold: Distance (cm) below which a spot is occupied
+            current: Callable(lot_id, spot_id) -> accepted occupancy, or None if unknown
+        """
+        self.threshold = threshold
+        self.hysteresis = hysteresis
+        self.dwell = dwell
+        self.window = max(1, window)
+        self.current = current or (lambda lot_id, spot_id: None)
+        self.signals = {}   # (lot_id, spot_id) -> signal state
+        self.lock = threading.Lock()
+
+        self.readings = 0
+        self.transitions = 0
+        self.suppressed = 0
+
+    def _signal(self, key):
+        signal = self.signals.get(key)
+        if signal is None:
+            signal = self.signals[key] = {
+                'distances': deque(maxlen=self.window),
+                'pending': None,     # candidate state waiting out the dwell time
+                'since': None,
+                'claimed': False,    # handed out by due(), waiting for settle()
+                'distance': None
+            }
+        return signal
+
+    def _observe(self, signal, distance, occupied, current):
+        """State the reading points to, with hysteresis around the current state"""
+        if not isinstance(distance, (int, float)) or distance <= 0:
+            return bool(occupied)
+        signal['distances'].append(distance)
+        level = statistics.median(signal['distances'])
+        if current is None:
+            return level < self.threshold
+        if current:
+            return level <= self.threshold + self.hysteresis
+        return level < self.threshold - self.hysteresis
+
+    def update(self, lot_id, spot_id, distance, occupied, now=None):
+        """
+        Filter one sensor reading
+
+        Returns:
+            The new occupancy when the reading completes a transition, else None
+        """
+        now = time.monotonic() if now is None else now
+        current = self.current(lot_id, spot_id)
+        with self.lock:
+            self.readings += 1
+            signal = self._signal((lot_id, spot_id))
+            signal['distance'] = distance
+            observed = self._observe(signal, distance, occupied, current)
+
+            if observed == current:
+                signal['pending'], signal['claimed'] = None, False
+                self.suppressed += 1
+                return None
+
+            # Unknown spots are accepted at once
+            if current is not None and self.dwell > 0:
+                if signal['pending'] != observed:
+                    signal['pending'], signal['since'], signal['claimed'] = observed, now, False
+                if now - signal['since'] < self.dwell:
+                    self.suppressed += 1
+                    return None
+
+            signal['pending'], signal['claimed'] = None, False
+            self.transitions += 1
+            return observed
+
+    def due(self, now=None):
+        """
+        Claim pending transitions whose dwell time has passed (for sensors
+        that do not publish again)
+
+        Claimed transitions are only applied through settle(), which must run
+        where the spot's readings are handled so it cannot race update().
+
+        Returns:
+            List of (lot_id, spot_id, occupied, distance)
+        """
+        now = time.monotonic() if now is None else now
+        ready = []
+        with self.lock:
+            for (lot_id, spot_id), signal in self.signals.items():
+                if signal['pending'] is not None and not signal['claimed'] and now - signal['since'] >= self.dwell:
+                    ready.append((lot_id, spot_id, signal['pending'], signal['distance']))
+                    signal['claimed'] = True
+        return ready
+
+    def release(self, lot_id, spot_id):
+        """Give back a claimed transition that could not be handed on (due() offers it again)"""
+        with self.lock:
+            signal = self.signals.get((lot_id, spot_id))
+            if signal:
+                signal['claimed'] = False
+
+    def settle(self, lot_id, spot_id, now=None):
+        """
+        Accept a transition claimed by due() if it still stands
+
+        Returns:
+            The new occupancy, or None if a later reading, button press or
+            override got there first
+        """
+        now = time.monotonic() if now is None else now
+        current = self.current(lot_id, spot_id)
+        with self.lock:
+            signal = self.signals.get((lot_id, spot_id))
+            if not signal or not signal['claimed']:
+                return None
+            observed = signal['pending']
+            signal['pending'], signal['claimed'] = None, False
+            if observed is None or observed == current or now - signal['since'] < self.dwell:
+                return None
+            self.transitions += 1
+            return observed
+
+    def reset(self):
+        """Forget every spot (all spots were replaced)"""
+        with self.lock:
+            self.signals = {}
+
+    def stats(self):
+        with self.lock:
+            return {
+                'readings': self.readings,
+                'transitions': self.transitions,
+                'suppressed': self.suppressed,
+                'pending': sum(1 for signal in self.signals.values() if signal['pending'] is not None)
+            }
@@ -0,0 +1,211 @@
+"""
+Transports
+Pluggable stand-ins for the two ways the backend talks to the outside world:
+MQTT (paho client) and Socket.IO emits.
+
+The in-memory implementations let app.py, the emulators and the benchmarks
+run the whole sensor -> backend -> LED loop inside one process, without
+Mosquitto or connected browsers, so perf tests are deterministic.
+"""
+import threading
+from collections import deque
+
+
+def topic_matches(topic_filter, topic):
+    """Check an MQTT topic against a subscription filter (supports + and #)"""
+    filter_levels = topic_filter.split('/')
+    topic_levels = topic.split('/')
+    for index, level in enumerate(filter_levels):
+        if level == '#':
+            return True
+        if index >= len(topic_levels):
+            return False
+        if level != '+' and level != topic_levels[index]:
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+class InMemoryMessage:
+    """Same attributes as paho's MQTTMessage"""
+
+    def __init__(self, topic, payload, qos=0, retain=False):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+
+
+class PublishResult:
+    """Same attributes as paho's MQTTMessageInfo"""
+    rc = 0
+    mid = 0
+
+    def wait_for_publish(self, timeout=None):
+        return True
+
+    def is_published(self):
+        return True
+
+
+class InMemoryBroker:
+    """
+    Process-local MQTT broker
+
+    Messages are delivered synchronously on the publishing thread, once per
+    subscribed client, in subscription order.
+    """
+
+    def __init__(self):
+        self.subscriptions = []   # (topic filter, client)
+        self.lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+
+    def client(self, client_id=""):
+        """Create a paho-compatible client connected to this broker"""
+        return InMemoryMQTTClient(self, client_id)
+
+    def subscribe(self, client, topic_filter):
+        with self.lock:
+            if (topic_filter, client) not in self.subscriptions:
+                self.subscriptions.append((topic_filter, client))
+
+    def unsubscribe(self, client, topic_filter=None):
+        with self.lock:
+            self.subscriptions = [
+                (subscribed, subscriber) for subscribed, subscriber in self.subscriptions
+                if subscriber is not client or (topic_filter is not None and subscribed != topic_filter)
+            ]
+
+    def publish(self, topic, payload):
+        with self.lock:
+            self.published += 1
+            receivers = []
+            for topic_filter, client in self.subscriptions:
+                if client not in receivers and topic_matches(topic_filter, topic):
+                    receivers.append(client)
+
+        for client in receivers:
+            client.deliver(InMemoryMessage(topic, payload))
+            with self.lock:
+                self.delivered += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'subscriptions': len(self.subscriptions),
+                'published': self.published,
+                'delivered': self.delivered
+            }
+
+
+class InMemoryMQTTClient:
+    """Drop-in replacement for the parts of paho.mqtt.client.Client ParkMate uses"""
+
+    def __init__(self, broker, client_id=""):
+        self.broker = broker
+        self.client_id = client_id
+        self.userdata = None
+        self.on_connect = None
+        self.on_message = None
+        self.on_disconnect = None
+        self.connected = False
+        self.stopped = threading.Event()
+
+    def user_data_set(self, userdata):
+        self.userdata = userdata
+
+    def max_queued_messages_set(self, queue_size):
+        return self
+
+    def connect(self, host=None, port=1883, keepalive=60, *args, **kwargs):
+        self.connected = True
+        self.stopped.clear()
+        if self.on_connect:
+            self.on_connect(self, self.userdata, {}, 0)
+        return 0
+
+    def disconnect(self, *args, **kwargs):
+        self.connected = False
+        self.broker.unsubscribe(self)
+        self.stopped.set()
+        if self.on_disconnect:
+            self.on_disconnect(self, self.userdata, 0)
+        return 0
+
+    def subscribe(self, topic, qos=0, *args, **kwargs):
+        self.broker.subscribe(self, topic)
+        return 0, 0
+
+    def unsubscribe(self, topic, *args, **kwargs):
+        self.broker.unsubscribe(self, topic)
+        return 0, 0
+
+    def publish(self, topic, payload=None, qos=0, retain=False, *args, **kwargs):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        self.broker.publish(topic, payload if payload is not None else b'')
+        return PublishResult()
+
+    def deliver(self, message):
+        if self.on_message:
+            self.on_message(self, self.userdata, message)
+
+    def loop_start(self):
+        return 0
+
+    def loop_stop(self, *args, **kwargs):
+        return 0
+
+    def loop(self, timeout=1.0, *args, **kwargs):
+        return 0
+
+    def loop_forever(self, *args, **kwargs):
+        self.stopped.wait()
+        return 0
+
+
+class SocketIOEmitter:
+    """Emits events through a Flask-SocketIO server"""
+
+    def __init__(self, socketio):
+        self.socketio = socketio
+
+    def emit(self, event, data, to=None):
+        if to:
+            self.socketio.emit(event, data, to=to)
+        else:
+            self.socketio.emit(event, data)
+
+
+class RecordingEmitter:
+    """
+    Keeps emitted events in memory and calls registered listeners
+
+    Args:
+        forward: Optional emitter that also receives every event
+        history: Number of recent events kept for inspection
+    """
+
+    def __init__(self, forward=None, history=1000):
+        self.forward = forward
+        self.events = deque(maxlen=history)
+        self.listeners = {}   # event -> list of callables(data, to)
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def on(self, event, listener):
+        """Register a listener for an event ('*' for every event)"""
+        with self.lock:
+            self.listeners.setdefault(event, []).append(listener)
+
+    def emit(self, event, data, to=None):
+        with self.lock:
+            self.events.append((event, data, to))
+            self.counts[event] = self.counts.get(event, 0) + 1
+            listeners = self.listeners.get(event, []) + self.listeners.get('*', [])
+
+        for listener in listeners:
+            listener(event, data, to)
+        if self.forward:
+            self.forward.emit(event, data, to)
@@ -0,0 +1,143 @@
+"""
+Write-Behind Buffer
+Collects append-only records (history, environment readings, button events)
+and writes them with insert_many instead of one insert_one per message
+"""
+import threading
+import time
+
+from pymongo.errors import BulkWriteError
+
+
+class WriteBehindBuffer:
+    def __init__(self, store, max_batch=500, max_age=1.0, max_pending=50000):
+        """
+        Args:
+            store: Repository the records are written to
+            max_batch: Flush a collection as soon as this many records are queued
+            max_age: Flush records that have waited longer than this (seconds)
+            max_pending: Records kept per collection while the store is failing
+                (the oldest are dropped beyond this)
+        """
+        self.store = store
+        self.max_batch = max_batch
+        self.max_age = max_age
+        self.max_pending = max_pending
+        self.pending = {}   # collection name -> list of documents
+        self.oldest = {}    # collection name -> monotonic time of first queued document
+        self.retry_at = {}  # collection name -> monotonic time before which a failed write is not retried
+        self.lock = threading.Lock()
+        self.closed = False
+
+        # Counters
+        self.records_queued = 0
+        self.records_written = 0
+        self.records_requeued = 0
+        self.write_errors = 0
+        self.flush_count = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def add(self, collection, document):
+        """Queue a document for insertion into a collection"""
+        with self.lock:
+            if self.closed:
+                batch = [document]
+            else:
+                queue = self.pending.setdefault(collection, [])
+                if not queue:
+                    self.oldest[collection] = time.monotonic()
+                queue.append(document)
+                self.records_queued += 1
+                if len(queue) < self.max_batch or time.monotonic() < self.retry_at.get(collection, 0):
+                    return
+                batch = self.pending.pop(collection)
+                self.oldest.pop(collection, None)
+
+        self._write(collection, batch)
+
+    def flush(self, force=False):
+        """Write out every collection whose oldest record exceeded max_age (or all if force)"""
+        now = time.monotonic()
+        with self.lock:
+            due = [name for name, since in self.oldest.items()
+                   if force or (now - since >= self.max_age and now >= self.retry_at.get(name, 0))]
+            batches = [(name, self.pending.pop(name)) for name in due]
+            for name in due:
+                self.oldest.pop(name, None)
+
+        for collection, batch in batches:
+            self._write(collection, batch)
+
+    def close(self):
+        """Flush everything and write any later records directly (shutdown)"""
+        with self.lock:
+            self.closed = True
+        self.flush(force=True)
+
+    def depth(self):
+        """Number of records waiting to be written"""
+        with self.lock:
+            return sum(len(queue) for queue in self.pending.values())
+
+    def stats(self):
+        """Buffer depth and flush latency counters"""
+        with self.lock:
+            depth = {name: len(queue) for name, queue in self.pending.items()}
+        return {
+            'depth': sum(depth.values()),
+            'depth_by_collection': depth,
+            'records_queued': self.records_queued,
+            'records_written': self.records_written,
+            'records_requeued': self.records_requeued,
+            'write_errors': self.write_errors,
+            'flush_count': self.flush_count,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'max_flush_ms': round(self.max_flush_ms, 2),
+            'avg_flush_ms': round(self.total_flush_ms / self.flush_count, 2) if self.flush_count else 0.0
+        }
+
+    def _write(self, collection, batch):
+        start = time.perf_counter()
+        written = len(batch)
+        requeue = False
+        try:
+            self.store.insert_records(collection, batch)
+        except BulkWriteError as e:
+            # Rejected documents (duplicate keys, validation) would fail again
+            written = e.details.get('nInserted', 0)
+            print(f"Error writing {collection} batch: {len(batch) - written} records failed")
+        except Exception as e:
+            # Store unreachable: nothing was written, keep the batch for the next flush
+            written = 0
+            requeue = True
+            print(f"Error writing {collection} batch: {e}")
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self.lock:
+            if requeue and not self.closed:
+                self._requeue(collection, batch)
+            else:
+                self.write_errors += len(batch) - written
+                if written:
+                    self.retry_at.pop(collection, None)
+            self.records_written += written
+            self.flush_count += 1
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+            self.total_flush_ms += elapsed_ms
+
+    def _requeue(self, collection, batch):
+        """Put a failed batch back ahead of newer records (call with the lock held)"""
+        queue = batch + self.pending.get(collection, [])
+        overflow = len(queue) - self.max_pending
+        if overflow > 0:
+            del queue[:overflow]
+            self.write_errors += overflow
+            print(f"Write buffer full: dropped {overflow} {collection} records")
+        self.pending[collection] = queue
+        now = time.monotonic()
+        self.oldest[collection] = now
+        self.retry_at[collection] = now + self.max_age
+        self.records_requeued += len(batch)
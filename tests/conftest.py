@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+
+# app.py, config.py and parkmate/ live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tests importing app.py run it against the in-memory store and broker
+# (no MongoDB or mosquitto) with OS threads; set before config is imported
+os.environ.setdefault('PARKMATE_STORAGE', 'memory')
+os.environ.setdefault('PARKMATE_TRANSPORT', 'memory')
+os.environ.setdefault('PARKMATE_ASYNC_MODE', 'threading')
+
+from parkmate.repository import MemoryRepository
+
+
+class FailingStore(MemoryRepository):
+    """Memory store whose given methods raise ConnectionError while fail is set"""
+
+    def __init__(self, *methods):
+        super().__init__()
+        self.fail = True
+        for name in methods:
+            setattr(self, name, self._failing(getattr(self, name)))
+
+    def _failing(self, method):
+        def call(*args, **kwargs):
+            if self.fail:
+                raise ConnectionError('down')
+            return method(*args, **kwargs)
+        return call
+
+
+@pytest.fixture(scope='session')
+def backend():
+    """app.py started in the combined role with the sample lot (/api/init)"""
+    import app
+    app.create_app('combined')
+    app.app.test_client().post('/api/init')
+    return app
+
+
+@pytest.fixture
+def failing_store():
+    """Factory of memory stores: failing_store('update_buckets') fails until store.fail is cleared"""
+    return FailingStore
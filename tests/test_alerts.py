@@ -0,0 +1,94 @@
+from parkmate.alerts import AlertTracker
+from parkmate.repository import MemoryRepository
+
+RULES = {
+    'HIGH_TEMPERATURE': {'field': 'temperature', 'above': 35.0, 'band': 1.0},
+    'LOW_HUMIDITY': {'field': 'humidity', 'below': 20.0, 'band': 5.0},
+}
+HOT = {'type': 'HIGH_TEMPERATURE', 'severity': 'WARNING', 'message': 'Too hot'}
+
+
+def make_tracker(store=None, **options):
+    return AlertTracker(store or MemoryRepository(), RULES, renotify_interval=60, stale_after=30, **options)
+
+
+def test_repeats_are_counted_and_renotified_per_interval():
+    tracker = make_tracker()
+    first = tracker.report('LOT001', 'DHT001', HOT, now=0)
+    assert first['state'] == 'open'
+    assert tracker.report('LOT001', 'DHT001', HOT, now=10) is None
+    assert tracker.report('LOT001', 'DHT001', HOT, now=59) is None
+    renotified = tracker.report('LOT001', 'DHT001', HOT, now=60)
+    assert renotified['state'] == 'ongoing'
+    assert renotified['occurrences'] == 4
+    assert renotified['incident_id'] == first['incident_id']
+    assert tracker.stats() == {'alerts': 4, 'suppressed': 2, 'open': 1, 'pending_writes': 1}
+
+
+def test_incidents_are_kept_per_sensor_and_type():
+    tracker = make_tracker()
+    tracker.report('LOT001', 'DHT001', HOT, now=0)
+    tracker.report('LOT001', 'DHT002', HOT, now=0)
+    tracker.report('LOT001', 'DHT001', {'type': 'LOW_HUMIDITY'}, now=0)
+    tracker.report('LOT002', 'DHT001', HOT, now=0)
+    assert len(tracker.open_incidents()) == 4
+    assert len(tracker.open_incidents('LOT001')) == 3
+
+
+def test_readings_resolve_past_the_hysteresis_band():
+    tracker = make_tracker()
+    tracker.report('LOT001', 'DHT001', HOT, now=0)
+    tracker.report('LOT001', 'DHT001', {'type': 'LOW_HUMIDITY'}, now=0)
+    assert tracker.observe('LOT001', 'DHT001', {'temperature': 34.5, 'humidity': 24}, now=5) == []
+    [resolved] = tracker.observe('LOT001', 'DHT001', {'temperature': 33.9, 'humidity': 24}, now=6)
+    assert resolved['alert_type'] == 'HIGH_TEMPERATURE'
+    assert resolved['state'] == 'resolved'
+    assert resolved['resolved_at'] is not None
+    [resolved] = tracker.observe('LOT001', 'DHT001', {'humidity': 25.5}, now=7)
+    assert resolved['alert_type'] == 'LOW_HUMIDITY'
+    assert tracker.open_incidents() == []
+
+
+def test_readings_keep_incidents_alive_and_silence_expires_them():
+    tracker = make_tracker()
+    tracker.report('LOT001', 'DHT001', HOT, now=0)
+    tracker.report('LOT001', 'DHT002', {'type': 'SENSOR_FAULT'}, now=0)    # no rule: only expires
+    tracker.observe('LOT001', 'DHT001', {'temperature': 36}, now=25)
+    [expired] = tracker.expire(now=30)
+    assert expired['alert_type'] == 'SENSOR_FAULT'
+    assert tracker.expire(now=50) == []
+    assert [incident['alert_type'] for incident in tracker.expire(now=55)] == ['HIGH_TEMPERATURE']
+
+
+def test_flush_writes_one_document_per_incident_and_seed_reloads_open_ones():
+    store = MemoryRepository()
+    tracker = make_tracker(store)
+    tracker.report('LOT001', 'DHT001', HOT, now=0)
+    tracker.report('LOT001', 'DHT001', HOT, now=1)
+    tracker.report('LOT002', 'DHT001', HOT, now=1)
+    tracker.report('LOT003', 'DHT001', HOT, now=1)
+    tracker.flush()
+    tracker.observe('LOT002', 'DHT001', {'temperature': 20}, now=2)
+    tracker.flush()
+
+    documents = store.recent_records('alerts')
+    assert sorted((doc['lot_id'], doc['state'], doc['occurrences']) for doc in documents) == [
+        ('LOT001', 'ongoing', 2), ('LOT002', 'resolved', 1), ('LOT003', 'open', 1)
+    ]
+
+    restarted = make_tracker(store, owns=lambda lot_id: lot_id != 'LOT003')
+    restarted.seed()
+    assert [incident['lot_id'] for incident in restarted.open_incidents()] == ['LOT001']
+    assert restarted.report('LOT001', 'DHT001', HOT, now=2) is None    # still the same incident
+
+
+def test_failed_flush_keeps_incidents_for_the_next_one(failing_store):
+    store = failing_store('upsert_records')
+    tracker = make_tracker(store)
+    tracker.report('LOT001', 'DHT001', HOT, now=0)
+    tracker.flush()
+    assert tracker.stats()['pending_writes'] == 1
+    store.fail = False
+    tracker.flush()
+    assert tracker.stats()['pending_writes'] == 0
+    assert len(store.recent_records('alerts', 'LOT001')) == 1
@@ -0,0 +1,64 @@
+import base64
+
+from parkmate.bitmap import LotBitmap
+from parkmate.lot_state import LotStateEngine, build_bitmap
+from parkmate.repository import MemoryRepository
+
+
+def spot_ids(count):
+    return [f"SPOT{number:03d}" for number in range(1, count + 1)]
+
+
+def test_set_tracks_bits_and_count():
+    bitmap = LotBitmap(spot_ids(10))
+    assert len(bitmap) == 10 and bitmap.to_bytes() == b'\x00\x00'
+    assert bitmap.set('SPOT001', True) is False
+    assert bitmap.set('SPOT009', True) is False
+    assert bitmap.set('SPOT009', True) is True
+    assert bitmap.to_bytes() == b'\x01\x01'      # ordinal 0 and 8, LSB first
+    assert bitmap.occupied == bitmap.popcount() == 2
+    bitmap.set('SPOT001', False)
+    assert bitmap.get('SPOT001') is False
+    assert bitmap.occupied == bitmap.popcount() == 1
+    assert bitmap.get('SPOT999') is None
+
+
+def test_unknown_spots_get_the_next_ordinal():
+    bitmap = LotBitmap(spot_ids(8))
+    assert bitmap.set('SPOT042', True) is None
+    assert bitmap.ordinals['SPOT042'] == 8
+    assert len(bitmap) == 9 and bitmap.to_bytes() == b'\x00\x01'
+
+
+def test_first_free_skips_full_bytes_and_stops_at_the_end():
+    bitmap = LotBitmap(spot_ids(12))
+    for spot_id in spot_ids(9):
+        bitmap.set(spot_id, True)
+    assert bitmap.first_free(2) == ['SPOT010', 'SPOT011']
+    assert bitmap.first_free(10) == ['SPOT010', 'SPOT011', 'SPOT012']
+    for spot_id in spot_ids(12):
+        bitmap.set(spot_id, True)
+    assert bitmap.first_free(5) == []
+
+
+def test_build_bitmap_orders_ordinals_by_spot_id():
+    bitmap = build_bitmap({'SPOT003': True, 'SPOT001': False, 'SPOT002': True})
+    assert bitmap.spot_ids == ['SPOT001', 'SPOT002', 'SPOT003']
+    assert bitmap.to_bytes() == b'\x06'
+
+
+def test_snapshot_encodes_the_bitmap():
+    store = MemoryRepository()
+    store.insert_spots([{'lot_id': 'LOT001', 'spot_id': spot_id, 'occupied': spot_id == 'SPOT002'}
+                        for spot_id in spot_ids(3)])
+    changes = []
+    engine = LotStateEngine(store, on_change=lambda *args: changes.append(args))
+    engine.seed()
+    engine.set_spot('LOT001', 'SPOT003', True)
+
+    snapshot = engine.snapshot('LOT001', include_spot_ids=True)
+    assert base64.b64decode(snapshot['bitmap']) == b'\x06'
+    assert snapshot['occupied_spots'] == 2 and snapshot['available_spots'] == 1
+    assert snapshot['spot_ids'] == spot_ids(3)
+    assert changes == [('LOT001', 1, 3, False), ('LOT001', 2, 3, True)]
+    assert engine.snapshot('LOT999') is None
@@ -0,0 +1,49 @@
+import pytest
+
+from parkmate.changelog import SpotChangeLog
+
+
+def test_since_returns_changed_spots_newest_first():
+    log = SpotChangeLog()
+    for spot_id in ('SPOT001', 'SPOT002', 'SPOT001', 'SPOT003'):
+        log.record('LOT001', spot_id)
+    assert log.current('LOT001') == 4
+    assert log.since('LOT001', 1) == ['SPOT003', 'SPOT001', 'SPOT002']
+    assert log.since('LOT001', 4) == []
+    assert log.since('LOT002', 0) == []
+
+
+def test_since_unknown_sequences_need_a_snapshot():
+    log = SpotChangeLog(max_changes=2)
+    for index in range(5):
+        log.record('LOT001', f"SPOT00{index}")
+    assert log.since('LOT001', 6) is None      # ahead of the log
+    assert log.since('LOT001', 1) is None      # older than the remembered changes
+    assert log.since('LOT001', 3) == ['SPOT004', 'SPOT003']
+
+
+def test_reset_starts_a_new_epoch_from_stored_sequences():
+    log = SpotChangeLog()
+    log.record('LOT001', 'SPOT001')
+    epoch = log.epoch()
+    log.reset({'LOT001': 7})
+    assert log.epoch() != epoch
+    assert log.current('LOT001') == 7
+    assert log.since('LOT001', 3) is None      # changes before the reset are unknown
+    assert log.since('LOT001', 7) == []
+    assert log.record('LOT001', 'SPOT002') == 8
+
+
+def test_change_records_only_completed_writes():
+    log = SpotChangeLog()
+    with log.change('LOT001', 'SPOT001') as seq:
+        assert seq == 1
+        assert log.current('LOT001') == 0      # not visible before the write finished
+    assert log.current('LOT001') == 1
+
+    with pytest.raises(RuntimeError):
+        with log.change('LOT001', 'SPOT002'):
+            raise RuntimeError("write failed")
+    assert log.current('LOT001') == 1
+    with log.change('LOT001', 'SPOT002') as seq:
+        assert seq == 2
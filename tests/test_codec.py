@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import pytest
+
+from parkmate.codec import (SPOT_STATUS, SPOT_STATUS_TOPIC, binary_lot_key, decode_spot_status,
+                            encode_spot_status, is_binary)
+from parkmate.ingest_queue import partition_key
+
+
+def test_round_trip():
+    payload = encode_spot_status('LOT007', 'SPOT012', True, 35, 1700000000.25)
+    assert len(payload) == SPOT_STATUS.size
+    assert is_binary(SPOT_STATUS_TOPIC, payload)
+    decoded = decode_spot_status(payload)
+    assert decoded['lot_id'] == 'LOT007'
+    assert decoded['spot_id'] == 'SPOT012'
+    assert decoded['occupied'] is True
+    assert decoded['distance'] == 35
+
+
+def test_timestamp_matches_json_payloads():
+    decoded = decode_spot_status(encode_spot_status('LOT001', 'SPOT001', False, 200, 1700000000.25))
+    # JSON sensors send datetime.now().isoformat()
+    assert isinstance(decoded['timestamp'], str)
+    assert datetime.fromisoformat(decoded['timestamp']) == datetime.fromtimestamp(1700000000.25)
+
+
+def test_ids_that_cannot_round_trip_are_not_encoded():
+    assert encode_spot_status('LOT7', 'SPOT012', True, 35, 0) is None
+    assert encode_spot_status('LOT001', 'A12', True, 35, 0) is None
+
+
+def test_binary_only_on_spot_status_topic():
+    payload = encode_spot_status('LOT001', 'SPOT001', False, 200, 0)
+    assert not is_binary('parkmate/alerts', payload)
+    assert not is_binary(SPOT_STATUS_TOPIC, b'{"lot_id": "LOT001"}')
+
+
+@pytest.mark.parametrize('payload', [b'\xb5', b'\xb5\x00', b'\xb5' + b'\x00' * 20])
+def test_malformed_binary_payloads(payload):
+    assert binary_lot_key(payload) is None
+    assert partition_key(SPOT_STATUS_TOPIC, payload) == SPOT_STATUS_TOPIC.encode()
+    assert partition_key('parkmate/alerts', payload) == b'parkmate/alerts'
+    with pytest.raises(ValueError):
+        decode_spot_status(payload)
+
+
+def test_partition_key():
+    payload = encode_spot_status('LOT042', 'SPOT001', False, 200, 0)
+    assert partition_key(SPOT_STATUS_TOPIC, payload) == b'LOT042'
+    assert partition_key('parkmate/environment', b'{"sensor_id": "DHT1", "lot_id": "LOT002"}') == b'LOT002'
+    assert partition_key('parkmate/button/press', b'{"spot_id": "SPOT003"}') == b'SPOT003'
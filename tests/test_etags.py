@@ -0,0 +1,27 @@
+def test_get_during_a_spot_write_is_not_cached_under_the_new_etag(backend, monkeypatch):
+    client = backend.app.test_client()
+    client.post('/api/lots/LOT001/override', json={'spot_id': 'SPOT005', 'occupied': False})
+    before = client.get('/api/lots/LOT001')
+
+    # A request served between the spot write and the count update
+    mid_write = []
+    set_spot = backend.lot_state.set_spot
+
+    def set_spot_after_a_get(lot_id, spot_id, occupied):
+        mid_write.append(client.get('/api/lots/LOT001'))
+        return set_spot(lot_id, spot_id, occupied)
+
+    monkeypatch.setattr(backend.lot_state, 'set_spot', set_spot_after_a_get)
+    assert client.post('/api/lots/LOT001/override', json={'spot_id': 'SPOT005', 'occupied': True}).status_code == 200
+    monkeypatch.undo()
+
+    [response] = mid_write
+    after = client.get('/api/lots/LOT001')
+    live = backend.lot_state.counts('LOT001')['occupied_spots']
+    assert response.headers['ETag'] == before.headers['ETag']
+    assert after.headers['ETag'] != response.headers['ETag']
+    assert after.json['occupied_spots'] == live == before.json['occupied_spots'] + 1
+    assert client.get('/api/lots/LOT001', headers={'If-None-Match': response.headers['ETag']}).status_code == 200
+
+    lots = client.get('/api/lots').json
+    assert next(lot for lot in lots if lot['lot_id'] == 'LOT001')['occupied_spots'] == live
@@ -0,0 +1,56 @@
+import threading
+import time
+
+from parkmate.ingest_queue import IngestQueue
+
+
+def test_stop_drains_queued_messages():
+    handled = []
+    ingest = IngestQueue(lambda topic, payload: handled.append(payload), workers=2)
+    ingest.start()
+    for number in range(20):
+        ingest.submit('parkmate/spot/status', b'{"lot_id": "LOT%03d"}' % number)
+    ingest.stop()
+    assert len(handled) == 20
+    assert not ingest.submit('parkmate/spot/status', b'{"lot_id": "LOT001"}')
+    assert ingest.stats()['dropped'] == 1
+
+
+def test_stop_gives_up_on_a_stuck_worker():
+    release = threading.Event()
+    ingest = IngestQueue(lambda topic, payload: release.wait(), workers=1, maxsize=1)
+    ingest.start()
+    ingest.submit('parkmate/spot/status', b'{"lot_id": "LOT001"}')
+    time.sleep(0.05)
+    ingest.submit('parkmate/spot/status', b'{"lot_id": "LOT001"}')    # fills the queue
+
+    start = time.monotonic()
+    ingest.stop(timeout=0.2)
+    assert time.monotonic() - start < 1
+    release.set()
+
+
+def test_pause_waits_for_running_handlers_and_holds_the_rest():
+    started, release = threading.Event(), threading.Event()
+    handled = []
+
+    def handler(topic, payload):
+        if payload == b'slow':
+            started.set()
+            release.wait()
+        handled.append(payload)
+
+    ingest = IngestQueue(handler, workers=1)
+    ingest.start()
+    ingest.submit('parkmate/spot/status', b'slow')
+    started.wait(1)
+    assert not ingest.pause(timeout=0.05)       # still running
+    release.set()
+    assert ingest.pause(timeout=1)
+
+    ingest.submit('parkmate/spot/status', b'held')
+    time.sleep(0.05)
+    assert handled == [b'slow']
+    ingest.resume()
+    ingest.stop()
+    assert handled == [b'slow', b'held']
@@ -0,0 +1,93 @@
+import re
+
+import pytest
+
+from parkmate.metrics import MetricsRegistry
+
+# name{labels} value, with label values quoted and escaped
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\\n]|\\[\\"n])*",?)*\})? \S+$')
+
+
+def sample_values(text, name):
+    """Value of every sample line of a metric, by the text before the value"""
+    return {line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+            for line in text.splitlines() if line.startswith(name) and not line.startswith('#')}
+
+
+def test_help_and_type_precede_each_metric():
+    registry = MetricsRegistry()
+    registry.counter('jobs_total', 'Jobs run', ['queue']).inc(queue='fast')
+    registry.histogram('job_seconds', 'Job time', buckets=(0.1, 1.0)).observe(0.5)
+    registry.gauge('queue_depth', 'Queued jobs', lambda: 3)
+    lines = registry.render().splitlines()
+
+    assert lines[:3] == ['# HELP jobs_total Jobs run', '# TYPE jobs_total counter', 'jobs_total{queue="fast"} 1']
+    assert lines[3:5] == ['# HELP job_seconds Job time', '# TYPE job_seconds histogram']
+    assert lines[5:10] == [
+        'job_seconds_bucket{le="0.1"} 0',
+        'job_seconds_bucket{le="1.0"} 1',
+        'job_seconds_bucket{le="+Inf"} 1',
+        'job_seconds_sum 0.5',
+        'job_seconds_count 1',
+    ]
+    assert lines[10:] == ['# HELP queue_depth Queued jobs', '# TYPE queue_depth gauge', 'queue_depth 3']
+
+
+def test_label_values_and_help_text_are_escaped():
+    registry = MetricsRegistry()
+    counter = registry.counter('events_total', 'Events by path\\name\nsecond line', ['path'])
+    counter.inc(path='C:\\spots\\"LOT001"\nnext')
+    text = registry.render()
+
+    assert '# HELP events_total Events by path\\\\name\\nsecond line\n' in text
+    assert 'events_total{path="C:\\\\spots\\\\\\"LOT001\\"\\nnext"} 1\n' in text
+    assert all(SAMPLE.match(line) for line in text.splitlines() if not line.startswith('#'))
+
+
+def test_counters_only_increase():
+    registry = MetricsRegistry()
+    counter = registry.counter('requests_total', 'Requests', ['status'])
+    counter.inc(status=200)
+    first = sample_values(registry.render(), 'requests_total')
+    counter.inc(status=200)
+    counter.inc(2, status=500)
+    second = sample_values(registry.render(), 'requests_total')
+
+    assert first == {'requests_total{status="200"}': 1}
+    assert second == {'requests_total{status="200"}': 2, 'requests_total{status="500"}': 2}
+    with pytest.raises(ValueError):
+        counter.inc(-1, status=200)
+    assert sample_values(registry.render(), 'requests_total') == second
+
+
+def test_a_failing_gauge_does_not_break_the_scrape():
+    registry = MetricsRegistry()
+    registry.gauge('broken', 'Broken gauge', lambda: 1 / 0)
+    registry.gauge('working', 'Working gauge', lambda: 1.5)
+    lines = registry.render().splitlines()
+    assert lines[2].startswith('# error reading broken')
+    assert lines[-1] == 'working 1.5'
+
+
+def test_metrics_endpoint(backend):
+    client = backend.app.test_client()
+    client.get('/api/lots')
+    first = client.get('/metrics')
+    assert first.status_code == 200
+    assert first.mimetype == 'text/plain'
+    text = first.get_data(as_text=True)
+
+    lines = text.splitlines()
+    for index, line in enumerate(lines):
+        if line.startswith('# HELP '):
+            name = line.split()[2]
+            assert re.match(rf'# TYPE {name} (counter|histogram|gauge)$', lines[index + 1])
+        elif not line.startswith('#'):
+            assert SAMPLE.match(line), line
+    assert '# TYPE parkmate_http_requests_total counter' in lines
+
+    client.get('/api/lots')
+    before = sample_values(text, 'parkmate_http_requests_total')
+    after = sample_values(client.get('/metrics').get_data(as_text=True), 'parkmate_http_requests_total')
+    assert all(after[series] >= value for series, value in before.items())
+    assert sum(after.values()) > sum(before.values())
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import socketio
+
+from parkmate.profiling import SamplingProfiler, SlowOperationLog
+
+
+def busy_work(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def sleeping_loop(stop):
+    while not stop.is_set():
+        time.sleep(0.01)
+
+
+def test_idle_background_tasks_are_not_sampled():
+    stop = threading.Event()
+    server = socketio.Server(async_mode='threading')
+
+    def background_task():
+        # Like the app's flush loops: parked in socketio.sleep() between runs
+        while not stop.is_set():
+            server.sleep(0.01)
+
+    threads = [threading.Thread(target=target, args=args, daemon=True)
+               for target, args in ((busy_work, (stop,)), (sleeping_loop, (stop,)), (background_task, ()))]
+    for thread in threads:
+        thread.start()
+
+    profiler = SamplingProfiler(interval=0.002)
+    profiler.start(0.3)
+    profiler.thread.join()
+    stop.set()
+
+    report = profiler.report()
+    functions = [entry['function'] for entry in report['top_self']]
+    assert report['samples'] > 0
+    assert any(name.startswith('busy_work') for name in functions[:3])
+    assert not any(name.startswith(('sleep ', 'sleeping_loop', 'background_task')) for name in functions)
+
+
+def test_slow_operations_are_counted_across_threads():
+    slow_ops = SlowOperationLog({'mqtt': 0}, max_entries=10)
+
+    def run():
+        for _ in range(50):
+            slow_ops.begin('mqtt', 'handle_spot_status')
+            with slow_ops.stage('parse'):
+                pass
+            slow_ops.end()
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert slow_ops.slow_count == 200
+    recent = slow_ops.recent()
+    assert len(recent) == 10
+    assert recent[0]['name'] == 'handle_spot_status' and 'parse' in recent[0]['stages_ms']
@@ -0,0 +1,134 @@
+from datetime import datetime
+
+import pytest
+
+from parkmate.repository import MemoryRepository, MongoRepository
+
+
+@pytest.fixture(params=['memory', 'mongo'])
+def store(request):
+    """Each repository; MongoRepository runs against mongomock"""
+    if request.param == 'memory':
+        return MemoryRepository()
+    mongomock = pytest.importorskip('mongomock')
+    return MongoRepository(db=mongomock.MongoClient().parkmate)
+
+
+def test_upsert_spot_creates_then_updates(store):
+    store.upsert_spot('LOT001', 'SPOT001', {'occupied': False, 'distance': 200})
+    store.upsert_spot('LOT001', 'SPOT001', {'occupied': True})
+    assert store.find_spot('SPOT001', 'LOT001') == {
+        'spot_id': 'SPOT001', 'lot_id': 'LOT001', 'occupied': True, 'distance': 200
+    }
+    assert len(store.list_spots('LOT001')) == 1
+
+
+def test_find_spot_is_scoped_by_lot(store):
+    store.insert_spots([
+        {'spot_id': 'SPOT001', 'lot_id': 'LOT001', 'occupied': False},
+        {'spot_id': 'SPOT001', 'lot_id': 'LOT002', 'occupied': True},
+    ])
+    assert store.find_spot('SPOT001', 'LOT002')['occupied'] is True
+    assert store.find_spot('SPOT001', 'LOT003') is None
+    assert store.find_spot('SPOT001')['spot_id'] == 'SPOT001'
+    assert [spot['lot_id'] for spot in store.find_spots('LOT001', ['SPOT001', 'SPOT009'])] == ['LOT001']
+
+
+def test_update_spot_only_touches_existing_spots(store):
+    assert not store.update_spot('SPOT001', {'occupied': True}, 'LOT001')
+    assert store.find_spot('SPOT001', 'LOT001') is None
+
+    store.upsert_spot('LOT001', 'SPOT001', {'occupied': False})
+    assert store.update_spot('SPOT001', {'occupied': True}, 'LOT001')
+    assert store.find_spot('SPOT001', 'LOT001')['occupied'] is True
+
+
+def test_returned_documents_are_copies(store):
+    store.upsert_spot('LOT001', 'SPOT001', {'occupied': False})
+    store.find_spot('SPOT001', 'LOT001')['occupied'] = True
+    store.list_spots('LOT001')[0]['occupied'] = True
+    assert store.find_spot('SPOT001', 'LOT001')['occupied'] is False
+
+
+def test_change_seqs_and_spots_changed_since(store):
+    store.upsert_spot('LOT001', 'SPOT001', {'change_seq': 3})
+    store.upsert_spot('LOT001', 'SPOT002', {'change_seq': 7})
+    store.upsert_spot('LOT002', 'SPOT001', {'change_seq': 1})
+    store.upsert_spot('LOT003', 'SPOT001', {'occupied': False})
+    assert store.change_seqs() == {'LOT001': 7, 'LOT002': 1}
+    assert [spot['spot_id'] for spot in store.spots_changed_since('LOT001', 3)] == ['SPOT002']
+    assert store.spots_changed_since('LOT001', 7) == []
+
+
+def test_update_lot_upserts_only_when_asked(store):
+    store.update_lot('LOT001', {'name': 'Main'})
+    assert store.find_lot('LOT001') is None
+    store.update_lot('LOT001', {'name': 'Main'}, upsert=True)
+    store.update_lot('LOT001', {'available_spots': 4})
+    assert store.find_lot('LOT001') == {'lot_id': 'LOT001', 'name': 'Main', 'available_spots': 4}
+
+
+def test_clear_lots_removes_lots_and_spots_but_not_records(store):
+    store.insert_lots([{'lot_id': 'LOT001'}, {'lot_id': 'LOT002'}])
+    store.insert_spots([{'spot_id': 'SPOT001', 'lot_id': 'LOT001'}])
+    store.insert_records('parking_history', [{'lot_id': 'LOT001', 'timestamp': datetime(2024, 1, 1)}])
+    store.clear_lots()
+    assert store.list_lots() == []
+    assert store.list_spots() == []
+    assert store.find_spot('SPOT001', 'LOT001') is None
+    assert len(store.recent_records('parking_history')) == 1
+
+    # Usable again after a clear
+    store.upsert_spot('LOT001', 'SPOT001', {'occupied': True})
+    assert store.find_spot('SPOT001')['occupied'] is True
+
+
+def test_recent_records_newest_first_per_lot(store):
+    store.insert_records('parking_history', [
+        {'lot_id': 'LOT001', 'n': n, 'timestamp': datetime(2024, 1, 1, 0, n)} for n in range(3)
+    ] + [{'lot_id': 'LOT002', 'n': 9, 'timestamp': datetime(2024, 1, 1, 0, 9)}])
+    assert [record['n'] for record in store.recent_records('parking_history', 'LOT001')] == [2, 1, 0]
+    assert [record['n'] for record in store.recent_records('parking_history', limit=2)] == [9, 2]
+    assert store.latest_record('parking_history', 'LOT002')['n'] == 9
+    assert store.latest_record('parking_history', 'LOT003') is None
+
+
+def test_upsert_records_replaces_by_key(store):
+    store.upsert_records('alerts', 'incident_id', [
+        {'incident_id': 'a', 'lot_id': 'LOT001', 'state': 'open', 'timestamp': datetime(2024, 1, 1)},
+    ])
+    store.upsert_records('alerts', 'incident_id', [
+        {'incident_id': 'a', 'lot_id': 'LOT001', 'state': 'resolved'},
+        {'incident_id': 'b', 'lot_id': 'LOT001', 'state': 'open', 'timestamp': datetime(2024, 1, 2)},
+    ])
+    records = store.find_records('alerts', 'incident_id', ['a', 'b'])
+    assert sorted((record['incident_id'], record['state']) for record in records) == [('a', 'resolved'), ('b', 'open')]
+    assert len(store.recent_records('alerts', 'LOT001')) == 2
+
+
+def test_update_buckets_applies_operators(store):
+    key = {'lot_id': 'LOT001', 'resolution': 60, 'bucket_start': datetime(2024, 1, 1), 'sensor_id': 'S1'}
+    store.update_buckets('environment_rollups', [
+        (key, {'$inc': {'temperature.count': 1}, '$min': {'temperature.min': 20}, '$max': {'temperature.max': 20}}),
+    ])
+    store.update_buckets('environment_rollups', [
+        (key, {'$inc': {'temperature.count': 1}, '$min': {'temperature.min': 18}, '$max': {'temperature.max': 19},
+               '$set': {'label': 'x'}}),
+        ({**key, 'bucket_start': datetime(2024, 1, 1, 0, 1)}, {'$inc': {'temperature.count': 1}}),
+    ])
+    buckets = store.find_buckets('environment_rollups', 'LOT001', 60, datetime(2024, 1, 1), datetime(2024, 1, 2), 'S1')
+    assert [bucket['bucket_start'] for bucket in buckets] == [datetime(2024, 1, 1), datetime(2024, 1, 1, 0, 1)]
+    assert buckets[0]['temperature'] == {'count': 2, 'min': 18, 'max': 20}
+    assert buckets[0]['label'] == 'x'
+    assert store.find_buckets('environment_rollups', 'LOT001', 60, datetime(2024, 1, 1, 0, 1),
+                              datetime(2024, 1, 2), 'S2') == []
+
+
+def test_memory_store_caps_records_per_lot():
+    store = MemoryRepository(max_records=3)
+    store.insert_records('parking_history', [{'lot_id': 'LOT001', 'n': n} for n in range(5)])
+    store.insert_records('parking_history', [{'lot_id': 'LOT002', 'n': 9}])
+    assert [record['n'] for record in store.recent_records('parking_history', 'LOT001', limit=10)] == [4, 3, 2]
+    assert [record['n'] for record in store.recent_records('parking_history', 'LOT002')] == [9]
+    # The collection-wide view keeps the newest max_records across lots
+    assert [record['n'] for record in store.recent_records('parking_history', limit=10)] == [9, 4, 3]
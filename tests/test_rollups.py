@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from parkmate.repository import MemoryRepository
+from parkmate.rollups import (
+    OccupancyRollup, RollupBuffer, bucket_spans, bucket_start, choose_resolution, parse_resolution,
+    parse_timestamp
+)
+
+
+def test_parse_timestamp_keeps_naive_values():
+    assert parse_timestamp('2024-01-01T12:30:00', 'from') == datetime(2024, 1, 1, 12, 30)
+
+
+@pytest.mark.parametrize('value', ['2024-01-01T00:00:00Z', '2024-01-01T00:00:00+00:00'])
+def test_parse_timestamp_converts_offsets_to_naive_local(value):
+    expected = datetime(2024, 1, 1, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    parsed = parse_timestamp(value, 'from')
+    assert parsed.tzinfo is None
+    assert parsed == expected
+    assert parsed < datetime.now()
+
+
+def test_parse_timestamp_rejects_garbage():
+    with pytest.raises(ValueError, match="'to' must be an ISO 8601 timestamp"):
+        parse_timestamp('yesterday', 'to')
+
+
+def test_parse_resolution_accepts_names_and_seconds():
+    assert parse_resolution(None) is None
+    assert parse_resolution('hour') == 3600
+    assert parse_resolution('300') == 300
+
+
+@pytest.mark.parametrize('value', ['1h', '0', '-60'])
+def test_parse_resolution_lists_allowed_values(value):
+    with pytest.raises(ValueError, match='minute, hour, day or a positive number of seconds'):
+        parse_resolution(value)
+
+
+def test_bucket_start_and_spans():
+    timestamp = datetime(2024, 1, 1, 10, 59, 30)
+    assert bucket_start(timestamp, 60) == datetime(2024, 1, 1, 10, 59)
+    assert bucket_start(timestamp, 3600) == datetime(2024, 1, 1, 10)
+    assert bucket_start(timestamp, 86400) == datetime(2024, 1, 1)
+    assert list(bucket_spans(timestamp, datetime(2024, 1, 1, 11, 1, 15), 60)) == [
+        (datetime(2024, 1, 1, 10, 59), 30.0),
+        (datetime(2024, 1, 1, 11, 0), 60.0),
+        (datetime(2024, 1, 1, 11, 1), 15.0)
+    ]
+
+
+def test_choose_resolution():
+    start = datetime(2024, 1, 1)
+    assert choose_resolution(start, start + timedelta(hours=1)) == (60, 60)
+    assert choose_resolution(start, start + timedelta(days=7)) == (3600, 3600)
+    assert choose_resolution(start, start + timedelta(hours=1), requested=300) == (60, 300)
+    assert choose_resolution(start, start + timedelta(days=7), requested=7200) == (3600, 7200)
+
+
+def test_occupancy_tick_carries_quiet_lots_once_per_minute():
+    store = MemoryRepository()
+    rollup = OccupancyRollup(store, 'occupancy_rollups')
+    start = datetime(2024, 1, 1, 10)
+    rollup.record('LOT001', 2, 10, arrival=True, timestamp=start)
+    rollup.record('LOT002', 5, 10, timestamp=start)
+    rollup.tick(now=start + timedelta(seconds=5))
+    rollup.buffer.flush()
+
+    # Same minute: only the lot with a transition is carried
+    rollup.record('LOT001', 3, 10, arrival=True, timestamp=start + timedelta(seconds=10))
+    rollup.tick(now=start + timedelta(seconds=15))
+    assert {key[0][1] for key in rollup.buffer.pending} == {'LOT001'}
+    assert rollup.levels['LOT002'][0] == start + timedelta(seconds=5)
+
+    # Next minute: the quiet lot too
+    rollup.tick(now=start + timedelta(seconds=65))
+    assert rollup.levels['LOT002'][0] == start + timedelta(seconds=65)
+    rollup.tick(now=start + timedelta(seconds=70))
+    assert rollup.levels['LOT002'][0] == start + timedelta(seconds=65)
+
+
+def test_readers_without_levels_see_every_closed_minute_of_a_quiet_lot():
+    store = MemoryRepository()
+    ingest = OccupancyRollup(store, 'occupancy_rollups')
+    start = datetime(2024, 1, 1, 10)
+    ingest.record('LOT001', 4, 10, arrival=True, timestamp=start)
+    for second in range(5, 30 * 60 + 1, 5):
+        ingest.tick(now=start + timedelta(seconds=second))
+    ingest.buffer.flush()
+
+    api = OccupancyRollup(store, 'occupancy_rollups')
+    points = api.query('LOT001', start, start + timedelta(minutes=30), 60, 60)
+    assert len(points) == 30
+    assert all(point['occupied'] == 4 and point['avg'] == 4 for point in points)
+
+
+def test_occupancy_query_extends_open_buckets():
+    store = MemoryRepository()
+    rollup = OccupancyRollup(store, 'occupancy_rollups')
+    start = datetime.now() - timedelta(minutes=30)
+    rollup.record('LOT001', 4, 10, arrival=True, timestamp=start)
+    rollup.record('LOT001', 6, 10, arrival=True, timestamp=start + timedelta(minutes=10))
+    rollup.buffer.flush()
+
+    points = rollup.query('LOT001', start - timedelta(hours=1), datetime.now(), 60, 3600)
+    assert sum(point['turnover'] for point in points) == 2
+    covered = sum(bucket['covered_seconds']
+                  for bucket in rollup._open_buckets('LOT001', 60, start, datetime.now()))
+    assert 19 * 60 <= covered <= 20 * 60 + 1
+
+    points = rollup.query('LOT001', start - timedelta(hours=1), datetime.now(), 3600, 3600)
+    assert sum(point['turnover'] for point in points) == 2
+    assert points[-1]['occupied'] == 6
+    assert 4 <= points[-1]['avg'] <= 6
+    assert max(point['peak'] for point in points) == 6
+
+
+def test_rollup_buffer_keeps_changes_of_a_failed_flush(failing_store):
+    store = failing_store('update_buckets')
+    buffer = RollupBuffer(store, 'environment_rollups')
+    key = {'lot_id': 'LOT001', 'resolution': 60, 'bucket_start': datetime(2024, 1, 1), 'sensor_id': 'S1'}
+    buffer.update(key, inc={'temperature.count': 1}, minimum={'temperature.min': 20}, values={'label': 'old'})
+    buffer.flush()
+    buffer.update(key, inc={'temperature.count': 1}, minimum={'temperature.min': 18}, values={'label': 'new'})
+
+    store.fail = False
+    buffer.flush()
+    assert buffer.pending == {}
+    [bucket] = store.find_buckets('environment_rollups', 'LOT001', 60, datetime(2024, 1, 1), datetime(2024, 1, 2))
+    assert bucket['temperature'] == {'count': 2, 'min': 18}
+    assert bucket['label'] == 'new'
@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+from parkmate.repository import MemoryRepository
+from parkmate.seeding import seed_store, zone_name
+
+
+def test_zone_names():
+    assert [zone_name(index) for index in (0, 1, 25, 26, 27, 701, 702)] == ['A', 'B', 'Z', 'AA', 'AB', 'ZZ', 'AAA']
+
+
+def test_seed_store_replaces_lots_and_spots_in_chunks():
+    store = MemoryRepository()
+    store.insert_spots([{'lot_id': 'OLD', 'spot_id': 'SPOT001', 'occupied': True}])
+    calls = []
+    result = seed_store(store, 3, 10, floors=2, zones=2, occupancy=0.5, chunk_size=4, seed=7,
+                        progress=lambda stage, done, total: calls.append((stage, done, total)))
+
+    assert result['spots'] == 30 and result['index_errors'] == []
+    assert store.list_spots('OLD') == []
+    lots = {lot['lot_id']: lot for lot in store.list_lots()}
+    assert sorted(lots) == ['LOT001', 'LOT002', 'LOT003']
+    spots = store.list_spots('LOT002')
+    assert len(spots) == 10
+    assert lots['LOT002']['occupied_spots'] == sum(spot['occupied'] for spot in spots)
+    assert {(spot['floor'], spot['zone']) for spot in spots} == {(1, 'A'), (1, 'B'), (2, 'A'), (2, 'B')}
+    assert sum(lot['occupied_spots'] for lot in lots.values()) == result['occupied_spots']
+
+    assert calls[0] == ('clear', 0, 30) and calls[-1] == ('index', 30, 30)
+    assert [done for stage, done, total in calls if stage == 'insert'] == [0, 4, 8, 12, 16, 20, 24, 28]
+
+
+def test_seed_store_is_reproducible():
+    first, second = MemoryRepository(), MemoryRepository()
+    seed_store(first, 2, 5, occupancy=0.5, price_range=(1, 4), seed=3)
+    seed_store(second, 2, 5, occupancy=0.5, price_range=(1, 4), seed=3)
+    strip = lambda documents: [{key: value for key, value in document.items() if key != 'last_update'}
+                               for document in documents]
+    assert strip(first.list_spots('LOT001')) == strip(second.list_spots('LOT001'))
+    assert strip(first.list_lots()) == strip(second.list_lots())
+
+
+ADMIN = {'X-Admin-Token': 'test-token'}
+
+
+def wait_for_seed(client):
+    for _ in range(200):
+        job = client.get('/api/admin/seed', headers=ADMIN).json
+        if job['state'] != 'running':
+            return job
+        time.sleep(0.02)
+    raise AssertionError('seed did not finish')
+
+
+@pytest.fixture
+def admin(backend, monkeypatch):
+    monkeypatch.setattr(backend, 'ADMIN_TOKEN', 'test-token')
+    yield backend.app.test_client()
+    # Leave the sample lot for other tests
+    backend.app.test_client().post('/api/init')
+
+
+def test_seed_job_holds_ingest_and_flushes_while_it_runs(backend, admin, monkeypatch):
+    observed = []
+    seed = backend.seed_store
+
+    def seed_and_observe(store, **options):
+        def progress(stage, done, total):
+            observed.append((backend.ingest_queue.paused, backend.flushes_paused.is_set()))
+            options_progress(stage, done, total)
+        options_progress = options.pop('progress')
+        return seed(store, progress=progress, **options)
+
+    monkeypatch.setattr(backend, 'seed_store', seed_and_observe)
+    response = admin.post('/api/admin/seed', json={'lots': 2, 'spots': 5}, headers=ADMIN)
+    assert response.status_code == 202
+    job = wait_for_seed(admin)
+
+    assert job['state'] == 'done' and job['result']['spots'] == 10
+    assert observed and all(observed_state == (True, True) for observed_state in observed)
+    assert not backend.ingest_queue.paused and not backend.flushes_paused.is_set()
+    assert backend.lot_state.counts('LOT002')['total_spots'] == 5
+
+
+def test_seed_job_fails_when_indexes_cannot_be_built(backend, admin, monkeypatch):
+    monkeypatch.setattr(backend.store, 'ensure_indexes', lambda: [
+        {'collection': 'parking_spots', 'index': 'lot_spot_unique', 'error': 'duplicate key'}
+    ])
+    admin.post('/api/admin/seed', json={'lots': 1, 'spots': 3}, headers=ADMIN)
+    job = wait_for_seed(admin)
+
+    assert job['state'] == 'failed'
+    assert 'parking_spots.lot_spot_unique' in job['error']
+    assert job['result']['index_errors']
+    assert not backend.ingest_queue.paused
@@ -0,0 +1,88 @@
+import pytest
+
+from parkmate.spot_filter import SpotSignalFilter
+
+
+@pytest.fixture
+def spots():
+    return {}
+
+
+def make_filter(spots, **options):
+    return SpotSignalFilter(threshold=50, current=lambda lot_id, spot_id: spots.get((lot_id, spot_id)), **options)
+
+
+def accept(spots, lot_id, spot_id, occupied):
+    if occupied is not None:
+        spots[(lot_id, spot_id)] = occupied
+    return occupied
+
+
+def test_unknown_spots_are_accepted_at_once(spots):
+    spot_filter = make_filter(spots, hysteresis=10, dwell=5)
+    assert spot_filter.update('LOT001', 'SPOT001', 30, True, now=0) is True
+
+
+def test_hysteresis_ignores_jitter_around_the_threshold(spots):
+    spot_filter = make_filter(spots, hysteresis=10)
+    spots[('LOT001', 'SPOT001')] = False
+    for distance in (55, 45, 41, 59):
+        assert spot_filter.update('LOT001', 'SPOT001', distance, None, now=0) is None
+    assert accept(spots, 'LOT001', 'SPOT001', spot_filter.update('LOT001', 'SPOT001', 39, None, now=0)) is True
+    for distance in (45, 55, 60):
+        assert spot_filter.update('LOT001', 'SPOT001', distance, None, now=0) is None
+    assert spot_filter.update('LOT001', 'SPOT001', 61, None, now=0) is False
+    assert spot_filter.stats()['transitions'] == 2
+
+
+def test_dwell_holds_transitions_until_they_last(spots):
+    spot_filter = make_filter(spots, dwell=2)
+    spots[('LOT001', 'SPOT001')] = False
+    assert spot_filter.update('LOT001', 'SPOT001', 20, None, now=0) is None
+    assert spot_filter.update('LOT001', 'SPOT001', 200, None, now=1) is None   # flapped back
+    assert spot_filter.update('LOT001', 'SPOT001', 20, None, now=1.5) is None
+    assert spot_filter.update('LOT001', 'SPOT001', 20, None, now=3) is None
+    assert spot_filter.update('LOT001', 'SPOT001', 20, None, now=3.5) is True
+
+
+def test_due_claims_and_settle_applies(spots):
+    spot_filter = make_filter(spots, dwell=2)
+    spots[('LOT001', 'SPOT001')] = False
+    spot_filter.update('LOT001', 'SPOT001', 20, None, now=0)
+    assert spot_filter.due(now=1) == []
+    assert spot_filter.due(now=2) == [('LOT001', 'SPOT001', True, 20)]
+    assert spot_filter.due(now=3) == []     # claimed once
+    assert spot_filter.settle('LOT001', 'SPOT001', now=3) is True
+    assert spot_filter.settle('LOT001', 'SPOT001', now=3) is None
+    assert spot_filter.stats() == {'readings': 1, 'transitions': 1, 'suppressed': 1, 'pending': 0}
+
+
+def test_settle_skips_transitions_overtaken_before_the_worker_ran(spots):
+    spot_filter = make_filter(spots, dwell=2)
+    spots[('LOT001', 'SPOT001')] = False
+    spot_filter.update('LOT001', 'SPOT001', 20, None, now=0)
+    assert spot_filter.due(now=2)
+    # A reading handled first by the lot's worker moves the spot back
+    assert spot_filter.update('LOT001', 'SPOT001', 200, None, now=2.5) is None
+    assert spot_filter.settle('LOT001', 'SPOT001', now=3) is None
+
+    spot_filter.update('LOT001', 'SPOT001', 20, None, now=4)
+    assert spot_filter.due(now=6)
+    spots[('LOT001', 'SPOT001')] = True     # button press or override
+    assert spot_filter.settle('LOT001', 'SPOT001', now=6) is None
+
+
+def test_release_offers_a_claim_again(spots):
+    spot_filter = make_filter(spots, dwell=2)
+    spots[('LOT001', 'SPOT001')] = False
+    spot_filter.update('LOT001', 'SPOT001', 20, None, now=0)
+    assert spot_filter.due(now=2)
+    spot_filter.release('LOT001', 'SPOT001')
+    assert spot_filter.due(now=2) == [('LOT001', 'SPOT001', True, 20)]
+
+
+def test_median_window_ignores_single_outliers(spots):
+    spot_filter = make_filter(spots, window=3)
+    spots[('LOT001', 'SPOT001')] = False
+    for distance in (200, 200, 10, 200):
+        assert spot_filter.update('LOT001', 'SPOT001', distance, None, now=0) is None
@@ -0,0 +1,82 @@
+import time
+
+from parkmate.repository import MemoryRepository
+from parkmate.write_buffer import WriteBehindBuffer
+
+
+def history(store):
+    return store.recent_records('parking_history', limit=100)
+
+
+def test_flushes_when_the_batch_is_full():
+    store = MemoryRepository()
+    buffer = WriteBehindBuffer(store, max_batch=3, max_age=60)
+    for number in range(3):
+        buffer.add('parking_history', {'lot_id': 'LOT001', 'n': number})
+    assert len(history(store)) == 3
+    assert buffer.depth() == 0
+
+    buffer.add('parking_history', {'lot_id': 'LOT001', 'n': 3})
+    assert len(history(store)) == 3
+    assert buffer.depth() == 1
+
+
+def test_flushes_records_that_reached_max_age():
+    store = MemoryRepository()
+    buffer = WriteBehindBuffer(store, max_batch=100, max_age=0.05)
+    buffer.add('parking_history', {'lot_id': 'LOT001'})
+    buffer.flush()
+    assert history(store) == []     # not old enough yet
+
+    time.sleep(0.06)
+    buffer.flush()
+    assert len(history(store)) == 1
+    assert buffer.stats()['records_written'] == 1
+
+
+def test_close_flushes_everything_and_writes_later_records_directly():
+    store = MemoryRepository()
+    buffer = WriteBehindBuffer(store, max_batch=100, max_age=60)
+    buffer.add('parking_history', {'lot_id': 'LOT001'})
+    buffer.add('environment_data', {'lot_id': 'LOT001'})
+    buffer.close()
+    assert len(history(store)) == 1
+    assert len(store.recent_records('environment_data')) == 1
+    assert buffer.depth() == 0
+
+    buffer.add('parking_history', {'lot_id': 'LOT002'})
+    assert len(history(store)) == 2
+
+
+def test_requeues_a_batch_after_a_store_failure(failing_store):
+    store = failing_store('insert_records')
+    buffer = WriteBehindBuffer(store, max_batch=2, max_age=0.05)
+    buffer.add('parking_history', {'lot_id': 'LOT001', 'n': 0})
+    buffer.add('parking_history', {'lot_id': 'LOT001', 'n': 1})
+    assert buffer.depth() == 2
+    assert buffer.stats()['records_requeued'] == 2
+    assert buffer.stats()['write_errors'] == 0
+
+    # Full again, but the failed collection is not retried before the backoff
+    buffer.add('parking_history', {'lot_id': 'LOT001', 'n': 2})
+    assert buffer.depth() == 3
+
+    store.fail = False
+    time.sleep(0.06)
+    buffer.flush()
+    assert buffer.depth() == 0
+    assert [record['n'] for record in history(store)] == [2, 1, 0]
+
+
+def test_drops_the_oldest_records_beyond_max_pending(failing_store):
+    store = failing_store('insert_records')
+    buffer = WriteBehindBuffer(store, max_batch=2, max_age=0, max_pending=3)
+    for number in range(5):
+        buffer.add('parking_history', {'lot_id': 'LOT001', 'n': number})
+        buffer.flush()
+    assert buffer.depth() == 3
+    assert buffer.stats()['write_errors'] == 2
+
+    store.fail = False
+    buffer.flush()
+    assert sorted(record['n'] for record in history(store)) == [2, 3, 4]